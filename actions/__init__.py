@@ -16,6 +16,9 @@ from .guidance.safety_instructions import (
 )
 from .guidance.handle_greet import ActionHandleGreet
 
+from .utils.metrics import instrument_action
+from .utils.tracing_hooks import trace_action
+
 __all__ = [
     'ActionSessionStart',
     'ActionAssessStatus',
@@ -29,3 +32,7 @@ __all__ = [
     'ActionProvideEarthquakeInstructionsImmediate',
     'ActionHandleGreet',
 ]
+
+# Metrics for every action the server registers, and a span per action when turns are traced
+for _name in __all__:
+    instrument_action(trace_action(globals()[_name]))
@@ -9,7 +9,7 @@ class ActionHandleGreet(Action):
     def name(self) -> Text:
         return "action_handle_greet"
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         dispatcher.utter_message(response="utter_ask_emergency_type")
@@ -5,7 +5,9 @@ from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet
 
 from ..utils.emergency_helpers import get_emergency_type
-from ..utils.constants import EMERGENCY_DATA
+from ..utils.constants import get_data_version
+from ..utils.delays import add_long_delay
+from ..utils.metrics import record_exception
 from ..templates.messages import (
     format_safety_instructions,
     format_earthquake_instructions_immediate,
@@ -18,7 +20,7 @@ class ActionProvideSafetyInstructions(Action):
     def name(self) -> Text:
         return "action_provide_safety_instructions"
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
         emergency_type = get_emergency_type(tracker)
@@ -38,7 +40,7 @@ class ActionProvideSafetyInstructions(Action):
         #     return []
         
         message = format_safety_instructions(emergency_type, district)
-        dispatcher.utter_message(text=message)
+        dispatcher.utter_message(text=message, data_version=get_data_version())
         
         # Show buttons if this is an independent request (not part of main emergency flow)
         # In the main flow, shelters will be shown next with buttons, so we skip buttons here
@@ -49,6 +51,7 @@ class ActionProvideSafetyInstructions(Action):
         # Only show buttons if this is likely an independent request
         # (location not recently validated, or shelters already shown)
         if not location_validated or shelters_shown:
+            add_long_delay(dispatcher)
             dispatcher.utter_message(text="**What would you like to do next?**", buttons=get_safe_user_buttons())
         
         events = [SlotSet("instructions_provided", True)]
@@ -61,7 +64,7 @@ class ActionProvideEarthquakeInstructionsImmediate(Action):
     def name(self) -> Text:
         return "action_provide_earthquake_instructions_immediate"
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
         try:
@@ -70,13 +73,14 @@ class ActionProvideEarthquakeInstructionsImmediate(Action):
                 return []
             
             message = format_earthquake_instructions_immediate()
-            dispatcher.utter_message(text=message)
+            dispatcher.utter_message(text=message, data_version=get_data_version())
             
             return [
                 SlotSet("instructions_provided", True),
                 SlotSet("emergency_type", "earthquake")
             ]
         except Exception as e:
+            record_exception(e)
             dispatcher.utter_message(text="🏗️ **EARTHQUAKE EMERGENCY**\n\n🚨 **IMMEDIATE ACTIONS:**\n1. Drop, Cover, and Hold On\n2. Stay away from windows\n3. If outdoors, move to open area\n4. If in vehicle, pull over and stay inside\n\n**📋 AFTER:**\n1. Check for injuries\n2. Be prepared for aftershocks\n3. Listen to emergency broadcasts")
             return [
                 SlotSet("instructions_provided", True),
@@ -0,0 +1,343 @@
+"""
+Resilient reverse-geocoding client for Nominatim.
+Wraps the upstream call with a TTL+LRU cache keyed on geohash cells,
+coalescing of concurrent lookups for the same cell, a global token bucket
+(Nominatim allows 1 request/second) and a circuit breaker that fails fast
+to the offline district resolver.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional
+
+import aiohttp
+
+from ..utils.concurrency import get_http_session
+from ..utils.constants import STANDARD_DISTRICTS
+from ..utils.district_resolver import DISTRICT_RESOLVER
+from ..utils.emergency_helpers import fuzzy_match_district_async
+from ..utils.metrics import record_exception, timed
+from ..utils.postcodes import lookup_postcode
+
+NOMINATIM_URL = os.environ.get('NOMINATIM_URL', 'https://nominatim.openstreetmap.org')
+
+# Geohash precision 7 is a ~150 m x 150 m cell - far finer than a district
+GEOHASH_PRECISION = 7
+CACHE_TTL_SECONDS = 24 * 60 * 60
+CACHE_MAX_ENTRIES = 10000
+
+REQUEST_TIMEOUT_SECONDS = 5.0
+# Nominatim's public usage policy; raise it for a self-hosted instance
+RATE_LIMIT_PER_SECOND = float(os.environ.get('NOMINATIM_RATE_LIMIT', '1.0'))
+# Longest a lookup waits for a rate-limit token before using the fallback
+MAX_TOKEN_WAIT_SECONDS = 0.25
+
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RESET_SECONDS = 30.0
+# Calls slower than this count as failures even if they succeed
+BREAKER_SLOW_CALL_SECONDS = 2.0
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Standard base32 geohash of (lat, lng)."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        target, value = (lng_range, lng) if even else (lat_range, lat)
+        middle = (target[0] + target[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            target[0] = middle
+        else:
+            bits <<= 1
+            target[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+class GeocodeResult(NamedTuple):
+    district: Optional[str]
+    # None when the fallback cannot tell (no upstream answer and the point is near the city outline)
+    inside_berlin: Optional[bool]
+    source: str  # 'nominatim', 'cache' or 'fallback'
+
+
+class TTLCache:
+    """LRU cache whose entries also expire after ttl seconds."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TokenBucket:
+    """Token bucket shared by every lookup in the process."""
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    async def acquire(self, max_wait: float = MAX_TOKEN_WAIT_SECONDS) -> bool:
+        """Take a token, waiting up to max_wait seconds; False if none became available."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            now = self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            wait = (1.0 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures or slow calls; half-open probe after a cool-down."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_count = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            # Let exactly one request probe the upstream
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened_count += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+
+async def district_from_address(address: Dict[str, Any]) -> Optional[str]:
+    """Map a Nominatim address block to one of STANDARD_DISTRICTS."""
+    suburb = address.get('suburb') or address.get('neighbourhood') or address.get('city_district') or ''
+    if suburb:
+        matched_district, conf, _ = await fuzzy_match_district_async(suburb)
+        if matched_district and conf >= 0.6:
+            return matched_district
+        suburb_lower = suburb.lower()
+        for std_district in STANDARD_DISTRICTS:
+            if suburb_lower in std_district.lower() or std_district.lower() in suburb_lower:
+                return std_district
+
+    postcode_info = lookup_postcode(address.get('postcode', ''))
+    return postcode_info.district if postcode_info else None
+
+
+class ReverseGeocodeClient:
+
+    def __init__(self, base_url: str = NOMINATIM_URL, timeout: float = REQUEST_TIMEOUT_SECONDS,
+                 cache: Optional[TTLCache] = None, bucket: Optional[TokenBucket] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cache = cache or TTLCache()
+        self.bucket = bucket or TokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+        self._in_flight: Dict[str, 'asyncio.Future[GeocodeResult]'] = {}
+        self.counters = {
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'coalesced': 0,
+            'upstream_calls': 0,
+            'upstream_errors': 0,
+            'slow_calls': 0,
+            'rate_limited': 0,
+            'breaker_rejections': 0,
+            'fallbacks': 0,
+            'no_result': 0,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus cache size and circuit breaker state."""
+        stats = dict(self.counters)
+        stats['cache_size'] = len(self.cache)
+        stats['breaker_state'] = self.breaker.state
+        stats['breaker_opened'] = self.breaker.opened_count
+        return stats
+
+    async def reverse(self, lat: float, lng: float) -> GeocodeResult:
+        """District for (lat, lng); never raises and never waits longer than the upstream timeout."""
+        key = geohash(lat, lng)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.counters['cache_hits'] += 1
+            return cached._replace(source='cache')
+        self.counters['cache_misses'] += 1
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            # Another turn is already asking about this cell - share its answer
+            self.counters['coalesced'] += 1
+            return await asyncio.shield(in_flight)
+
+        in_flight = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = in_flight
+        try:
+            try:
+                result = await self._lookup(lat, lng)
+            except Exception as e:
+                record_exception(e)
+                result = self._fallback(lat, lng)
+            if result.source == 'nominatim':
+                self.cache.set(key, result)
+            in_flight.set_result(result)
+        finally:
+            self._in_flight.pop(key, None)
+            if not in_flight.done():
+                # Our lookup was cancelled (CancelledError is not an Exception): the turns
+                # coalesced onto it get the offline answer instead of waiting forever
+                in_flight.set_result(self._fallback(lat, lng))
+        return result
+
+    async def _lookup(self, lat: float, lng: float) -> GeocodeResult:
+        if not self.breaker.allow():
+            self.counters['breaker_rejections'] += 1
+            return self._fallback(lat, lng)
+        try:
+            return await self._ask_upstream(lat, lng)
+        finally:
+            # Outcomes are recorded below; if none was (the turn was cancelled), a half-open probe
+            # must still not stay in flight and shut the upstream out for good
+            self.breaker.release_probe()
+
+    async def _ask_upstream(self, lat: float, lng: float) -> GeocodeResult:
+        if not await self.bucket.acquire():
+            self.counters['rate_limited'] += 1
+            # Not the upstream's fault - hand a half-open probe back without tripping the breaker
+            self.breaker.release_probe()
+            return self._fallback(lat, lng)
+
+        self.counters['upstream_calls'] += 1
+        started = time.monotonic()
+        try:
+            session = get_http_session()
+            with timed('nominatim'):
+                async with session.get(
+                    f"{self.base_url}/reverse",
+                    params={'format': 'json', 'lat': str(lat), 'lon': str(lng), 'addressdetails': '1',
+                            'accept-language': 'en'},
+                    timeout=aiohttp.ClientTimeout(total=self.timeout),
+                ) as response:
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+            if not isinstance(data, dict):
+                raise ValueError(f"Expected a JSON object from Nominatim, got {type(data).__name__}")
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            self.counters['upstream_errors'] += 1
+            self.breaker.record_failure()
+            return self._fallback(lat, lng)
+        except Exception:
+            # Unexpected, but still a failed call: reverse() logs it and falls back
+            self.counters['upstream_errors'] += 1
+            self.breaker.record_failure()
+            raise
+
+        if time.monotonic() - started > BREAKER_SLOW_CALL_SECONDS:
+            self.counters['slow_calls'] += 1
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        if 'error' in data:
+            # e.g. "Unable to geocode" for a point with no address nearby: no answer, so nothing is cached
+            self.counters['no_result'] += 1
+            return self._fallback(lat, lng)
+
+        address = data.get('address') or {}
+        city = address.get('city') or address.get('town') or ''
+        if 'berlin' not in city.lower():
+            return GeocodeResult(None, False, 'nominatim')
+
+        district = await district_from_address(address)
+        if not district and DISTRICT_RESOLVER:
+            district = DISTRICT_RESOLVER.nearest_district(lat, lng)
+        return GeocodeResult(district, True, 'nominatim')
+
+    def _fallback(self, lat: float, lng: float) -> GeocodeResult:
+        """Offline answer from the bundled boundaries; inside_berlin is None where they cannot tell."""
+        self.counters['fallbacks'] += 1
+        if not DISTRICT_RESOLVER:
+            return GeocodeResult(None, None, 'fallback')
+        match = DISTRICT_RESOLVER.resolve(lat, lng)
+        if match.inside_berlin:
+            return GeocodeResult(match.district, True, 'fallback')
+        if not DISTRICT_RESOLVER.is_near_berlin(lat, lng):
+            return GeocodeResult(None, False, 'fallback')
+        # Outside the simplified outline but close to it: may still be inside the real city limits
+        return GeocodeResult(None, None, 'fallback')
+
+
+REVERSE_GEOCODER = ReverseGeocodeClient()
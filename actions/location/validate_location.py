@@ -1,14 +1,19 @@
 import re
-import requests
 from typing import Any, Dict, List, Text, Optional, Tuple
 
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet, FollowupAction
 
-from ..utils.constants import BERLIN_DISTRICTS, BERLIN_POSTCODES, EMERGENCY_DATA, STANDARD_DISTRICTS
-from ..utils.emergency_helpers import fuzzy_match_district, get_emergency_type
+from ..utils.constants import BERLIN_DISTRICTS, STANDARD_DISTRICTS
+from ..utils.conversation_summary import get_conversation_summary
+from ..utils.emergency_helpers import fuzzy_match_district_async, get_emergency_type
+from ..utils.district_resolver import DISTRICT_RESOLVER
+from ..utils.metrics import record_exception, record_outcome
+from ..utils.phrase_matcher import PHRASE_MATCHER
+from ..utils.postcodes import lookup_postcode
 from ..templates.messages import format_emergency_contacts
+from .reverse_geocoder import REVERSE_GEOCODER
 
 
 class ActionValidateLocation(Action):
@@ -16,7 +21,7 @@ class ActionValidateLocation(Action):
     def name(self) -> Text:
         return "action_validate_location"
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         events = []
@@ -28,39 +33,18 @@ class ActionValidateLocation(Action):
             location_validated = tracker.get_slot('location_validated')
             district = tracker.get_slot('district')
             
-            location_just_validated = False
-            for event in reversed(tracker.events[-10:]):
-                if event.get('event') == 'slot':
-                    if event.get('name') == 'location_validated' and event.get('value') is True:
-                        location_just_validated = True
-                        break
-                elif event.get('event') == 'bot':
-                    text = event.get('text', '')
-                    if 'Location confirmed' in text or 'location confirmed' in text.lower():
-                        location_just_validated = True
-                        break
+            summary = get_conversation_summary(tracker)
+            location_just_validated = summary.location_just_validated()
             
             if (location_validated and district) or location_just_validated:
                 return []
             
             latest_message_lower = tracker.latest_message.get('text', '').strip().lower()
             status_was_asked = tracker.get_slot('status_asked')
-            location_was_asked = False
+            location_was_asked = summary.location_asked()
             entities = tracker.latest_message.get('entities', [])
             has_location_entity = any(e.get('entity') in ['district', 'postcode'] for e in entities)
             
-            # Check more events to catch location requests (increase from 15 to 25)
-            for event in reversed(tracker.events[-25:]):
-                if event.get('event') == 'action':
-                    if event.get('name', '') in ['utter_ask_location', 'utter_ask_location_critical']:
-                        location_was_asked = True
-                        break
-                elif event.get('event') == 'bot':
-                    text = event.get('text', '').lower()
-                    if any(phrase in text for phrase in ['which area', 'which district', 'your location', 'where are you', 'berlin district', 'postcode', 'select your district', 'i need to know your location', 'i need your location to help emergency services', 'i need your location', 'please provide', 'or your postcode', 'berlin district (e.g.']):
-                        location_was_asked = True
-                        break
-            
             # If location was asked, try to extract location even if intent is not inform_location
             # This handles cases where NLU doesn't classify simple district names correctly
             # Also handle nlu_fallback when location was asked (user might have typed a district name)
@@ -82,27 +66,20 @@ class ActionValidateLocation(Action):
             # Removed: escalation_required check that was blocking location validation
             
             latest_message_lower = tracker.latest_message.get('text', '').strip().lower()
-            status_indicators = ['i\'m safe', 'i am safe', 'we are safe', 'everyone is safe', 'i\'m injured', 'i am injured', 'i\'m trapped', 'i am trapped', 'i\'m okay', 'i\'m fine', 'we\'re safe', 'not injured', 'not hurt', 'no injuries']
+            phrases = PHRASE_MATCHER.scan(latest_message_lower)
             
-            if status_was_asked and any(indicator in latest_message_lower for indicator in status_indicators):
+            if status_was_asked and phrases.has('status_report'):
                 return []
             
-            acknowledgment_words = ['ok', 'okay', 'got it', 'understood', 'i understand', 'alright', 'all right', 'fine', 'sure', 'yes', 'yeah']
-            if any(word == latest_message_lower for word in acknowledgment_words):
+            if phrases.is_exactly('acknowledgment'):
                 return []
             
             # Only skip processing if location was NOT asked AND no entity AND doesn't look like location
             if not location_was_asked and not has_location_entity:
-                if any(indicator in latest_message_lower for indicator in status_indicators):
+                if phrases.has('status_report'):
                     return []
                 
-                non_location_phrases = [
-                    'help', 'what should i do', 'what do i do', 'i need help',
-                    'i don\'t know', 'not sure', 'maybe', 'i think',
-                    'how are you', 'are you there', 'hello', 'hi',
-                    'thanks', 'thank you', 'appreciate it'
-                ]
-                if any(phrase in latest_message_lower for phrase in non_location_phrases):
+                if phrases.has('non_location'):
                     return []
                 
                 # If location was asked, don't return early - let extraction logic handle it
@@ -122,39 +99,42 @@ class ActionValidateLocation(Action):
             # Always try to extract location if location was asked, regardless of intent
             # This handles cases where simple district names aren't classified as inform_location
             if location_was_asked:
-                extracted_district = self._process_gps_coordinates(tracker, dispatcher, latest_intent)
+                extracted_district = await self._process_gps_coordinates(tracker, dispatcher, latest_intent)
                 
                 if not extracted_district:
-                    extracted_district, postcode = self._extract_location_from_message(tracker, latest_message, entities)
+                    extracted_district, postcode = await self._extract_location_from_message(tracker, latest_message, entities)
                 else:
                     postcode = None
             else:
                 # Only process if intent matches or has entity
                 if latest_intent in ['inform_location', 'share_gps_location'] or has_location_entity:
-                    extracted_district = self._process_gps_coordinates(tracker, dispatcher, latest_intent)
+                    extracted_district = await self._process_gps_coordinates(tracker, dispatcher, latest_intent)
                     
                     if not extracted_district:
-                        extracted_district, postcode = self._extract_location_from_message(tracker, latest_message, entities)
+                        extracted_district, postcode = await self._extract_location_from_message(tracker, latest_message, entities)
                     else:
                         postcode = None
                 else:
                     extracted_district = None
                     postcode = None
             
-            if postcode and not extracted_district:
-                extracted_district = BERLIN_POSTCODES.get(postcode)
+            postcode_info = lookup_postcode(postcode) if postcode else None
+            if postcode_info and not extracted_district:
+                extracted_district = postcode_info.district
             
             if location_validated and district and extracted_district:
                 if extracted_district.lower() == district.lower():
                     return []
             
             # If no district extracted but location was asked, try direct fuzzy match on message text
+            used_suggestion = False
             if not extracted_district and location_was_asked:
-                matched_district, confidence, suggestions = fuzzy_match_district(latest_message)
+                matched_district, confidence, suggestions = await fuzzy_match_district_async(latest_message)
                 if matched_district and confidence >= 0.6:
                     extracted_district = matched_district
                 elif suggestions:
                     extracted_district = suggestions[0]
+                    used_suggestion = True
                 else:
                     # Try direct lookup in BERLIN_DISTRICTS
                     latest_lower = latest_message.lower().strip()
@@ -168,14 +148,24 @@ class ActionValidateLocation(Action):
                                 break
             
             if extracted_district:
-                validated_district, confidence = self._validate_and_fuzzy_match(extracted_district, dispatcher)
+                validated_district, confidence = await self._validate_and_fuzzy_match(extracted_district, dispatcher)
                 if not validated_district:
                     return self._handle_invalid_location(dispatcher, tracker, events)
                 
                 events.append(SlotSet("location_retry_count", 0))
                 events.append(SlotSet("district", validated_district))
                 events.append(SlotSet("location_validated", True))
+                # Keep coordinates only when they belong to this location, for distance ranking;
+                # a postcode's centroid stands in when no GPS fix was shared
+                location_coords = self._get_gps_coords(tracker, latest_intent)
+                if not location_coords and postcode_info and validated_district in postcode_info.districts:
+                    location_coords = postcode_info.coords
+                events.append(SlotSet("location_coords", location_coords))
                 
+                if used_suggestion:
+                    record_outcome('fallback_district')
+                else:
+                    record_outcome('validated' if confidence >= 0.9 else 'validated_fuzzy')
                 confidence_emoji = "✅" if confidence >= 0.9 else "🤔"
                 dispatcher.utter_message(text=f"{confidence_emoji} Location confirmed: **{validated_district}**")
                 
@@ -186,6 +176,7 @@ class ActionValidateLocation(Action):
                 return self._handle_invalid_location(dispatcher, tracker, events)
                 
         except Exception as e:
+            record_exception(e)
             dispatcher.utter_message(text="⚠️ There was an error processing your location. Please try again with a Berlin district name or postcode.")
             events.append(SlotSet("location_validated", False))
         
@@ -194,8 +185,8 @@ class ActionValidateLocation(Action):
         
         return events
     
-    def _process_gps_coordinates(self, tracker: Tracker, dispatcher: CollectingDispatcher, latest_intent: str):
-        """Process GPS coordinates from metadata."""
+    def _get_gps_coords(self, tracker: Tracker, latest_intent: str) -> Optional[Dict[str, float]]:
+        """GPS coordinates from the latest message metadata, if the user shared them."""
         if latest_intent != 'share_gps_location':
             return None
         
@@ -210,50 +201,49 @@ class ActionValidateLocation(Action):
             lng = location_coords.get('lng')
             if not lat or not lng:
                 return None
-            
-            nominatim_url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={lat}&lon={lng}&addressdetails=1&accept-language=en"
-            headers = {'User-Agent': 'Berlin-Emergency-Chatbot/1.0'}
-            response = requests.get(nominatim_url, headers=headers, timeout=5)
-            
-            if response.status_code != 200:
-                return None
-            
-            data = response.json()
-            address = data.get('address', {})
-            city = address.get('city') or address.get('town') or ''
-            
-            if 'berlin' not in city.lower():
-                dispatcher.utter_message(text="⚠️ Your GPS location appears to be outside Berlin. Please provide a Berlin district manually.")
-                return None
-            
-            suburb = address.get('suburb') or address.get('neighbourhood') or address.get('city_district') or ''
-            district = None
-            
-            if suburb:
-                matched_district, conf, _ = fuzzy_match_district(suburb)
-                if matched_district and conf >= 0.6:
-                    district = matched_district
-                else:
-                    suburb_lower = suburb.lower()
-                    for std_district in STANDARD_DISTRICTS:
-                        if suburb_lower in std_district.lower() or std_district.lower() in suburb_lower:
-                            district = std_district
-                            break
-            
-            if not district:
-                postcode_str = address.get('postcode', '')
-                if postcode_str and len(postcode_str) == 5:
-                    district = BERLIN_POSTCODES.get(postcode_str)
-            
-            if not district:
-                district = 'Mitte'
-            
-            return district
+            return {'lat': float(lat), 'lng': float(lng)}
+        except (AttributeError, TypeError, ValueError):
+            return None
+    
+    async def _process_gps_coordinates(self, tracker: Tracker, dispatcher: CollectingDispatcher, latest_intent: str):
+        """Process GPS coordinates from metadata."""
+        location_coords = self._get_gps_coords(tracker, latest_intent)
+        if not location_coords:
+            return None
+        
+        try:
+            lat = location_coords['lat']
+            lng = location_coords['lng']
+            
+            # Resolve locally first - GPS turns must not depend on a rate-limited public service
+            if DISTRICT_RESOLVER:
+                match = DISTRICT_RESOLVER.resolve(lat, lng)
+                if match.inside_berlin and not match.near_border:
+                    return match.district
+                if not match.inside_berlin and not DISTRICT_RESOLVER.is_near_berlin(lat, lng):
+                    dispatcher.utter_message(text="⚠️ Your GPS location appears to be outside Berlin. Please provide a Berlin district manually.")
+                    return None
+            
+            # Close to a district border or the city outline, where the bundled polygons are
+            # only approximate: confirm with Nominatim
+            return await self._reverse_geocode(lat, lng, dispatcher)
             
         except Exception as e:
+            record_exception(e)
+            return None
+    
+    async def _reverse_geocode(self, lat: float, lng: float, dispatcher: CollectingDispatcher):
+        """Look up the district with Nominatim for points near a district border or the Berlin border."""
+        result = await REVERSE_GEOCODER.reverse(lat, lng)
+        if result.inside_berlin is None:
+            dispatcher.utter_message(text="⚠️ I couldn't confirm whether your GPS location is inside Berlin. Please provide your Berlin district or postcode manually.")
+            return None
+        if not result.inside_berlin:
+            dispatcher.utter_message(text="⚠️ Your GPS location appears to be outside Berlin. Please provide a Berlin district manually.")
             return None
+        return result.district
     
-    def _extract_location_from_message(self, tracker: Tracker, latest_message: str, entities: List[Dict]):
+    async def _extract_location_from_message(self, tracker: Tracker, latest_message: str, entities: List[Dict]):
         """Extract district and postcode from message."""
         district = None
         postcode = None
@@ -274,7 +264,7 @@ class ActionValidateLocation(Action):
             if postcode_match:
                 postcode = postcode_match.group(1)
             else:
-                matched_district, confidence, suggestions = fuzzy_match_district(latest_message)
+                matched_district, confidence, suggestions = await fuzzy_match_district_async(latest_message)
                 if matched_district and confidence >= 0.6:
                     district = matched_district
                 elif suggestions:
@@ -291,9 +281,9 @@ class ActionValidateLocation(Action):
         
         return district, postcode
     
-    def _validate_and_fuzzy_match(self, district: str, dispatcher: CollectingDispatcher):
+    async def _validate_and_fuzzy_match(self, district: str, dispatcher: CollectingDispatcher):
         """Validate and fuzzy match district name."""
-        matched_district, conf, suggestions = fuzzy_match_district(district)
+        matched_district, conf, suggestions = await fuzzy_match_district_async(district)
         
         if matched_district and conf >= 0.8:
             return matched_district, conf
@@ -313,6 +303,7 @@ class ActionValidateLocation(Action):
         max_retries = 3
         
         if retry_count >= max_retries:
+            record_outcome('retries_exhausted')
             events.append(SlotSet("location_validated", False))
             events.append(SlotSet("location_retry_count", 0))
             
@@ -328,6 +319,7 @@ class ActionValidateLocation(Action):
             dispatcher.utter_message(text=message)
             return events
         else:
+            record_outcome('retry')
             new_retry_count = retry_count + 1
             events.append(SlotSet("location_retry_count", new_retry_count))
             events.append(SlotSet("location_validated", False))
@@ -0,0 +1,183 @@
+"""
+Pre-fork worker processes for the action server.
+The master binds the port, builds everything the actions need (data, indexes,
+warmed caches) and freezes the garbage collector, then forks the workers, so
+those pages stay shared copy-on-write instead of being loaded once per
+worker. It restarts workers that exit, and retires a worker whose private
+memory (pages it no longer shares with the master) grows by more than a limit
+after its first check: a replacement is forked first, then the old worker
+gets SIGTERM and finishes its in-flight requests.
+"""
+
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+WORKER_MAX_GROWTH_MB = float(os.environ.get('ACTIONS_WORKER_MAX_GROWTH_MB', '256'))
+MEMORY_CHECK_SECONDS = float(os.environ.get('ACTIONS_WORKER_MEMORY_CHECK_SECONDS', '10'))
+
+POLL_SECONDS = 0.5
+# Longer than Sanic's graceful shutdown timeout (15 s)
+STOP_TIMEOUT_SECONDS = 20.0
+# A worker that dies sooner than this after its start is respawned with backoff
+MIN_UPTIME_SECONDS = 5.0
+BACKOFF_INITIAL_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(socket.SOMAXCONN)
+    sock.set_inheritable(True)
+    return sock
+
+
+def private_memory_mb(pid: int) -> Optional[float]:
+    """Memory pid does not share with other processes, or None where /proc/<pid>/smaps_rollup is unavailable."""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            kb = sum(int(line.split()[1]) for line in f if line.startswith(('Private_Clean:', 'Private_Dirty:')))
+    except (OSError, ValueError, IndexError):
+        return None
+    return kb / 1024
+
+
+class PreforkMaster:
+
+    def __init__(self, serve: Callable[[socket.socket], None], sock: socket.socket, workers: int,
+                 max_growth_mb: float = WORKER_MAX_GROWTH_MB, memory_check_seconds: float = MEMORY_CHECK_SECONDS):
+        self.serve = serve
+        self.sock = sock
+        self.size = workers
+        self.max_growth_mb = max_growth_mb
+        self.memory_check_seconds = memory_check_seconds
+        # pid -> start time of workers taking traffic, and pid -> SIGTERM time of workers being retired
+        self.workers: Dict[int, float] = {}
+        self.retiring: Dict[int, float] = {}
+        # pid -> private memory at the worker's first check
+        self.baseline_mb: Dict[int, float] = {}
+        self.stopping = False
+        self.backoff = BACKOFF_INITIAL_SECONDS
+        self.next_spawn_at = 0.0
+        self.restarts = 0
+        self.memory_restarts = 0
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, signal.SIG_DFL)
+            code = 0
+            try:
+                self.serve(self.sock)
+            except BaseException:
+                logger.exception("Action worker %d failed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+        logger.info("Started action worker %d", pid)
+        return pid
+
+    def _stop(self, *_args) -> None:
+        self.stopping = True
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if self.retiring.pop(pid, None) is not None:
+                continue
+            self.baseline_mb.pop(pid, None)
+            started = self.workers.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            self.restarts += 1
+            uptime = time.monotonic() - started
+            if uptime < MIN_UPTIME_SECONDS:
+                self.next_spawn_at = time.monotonic() + self.backoff
+                self.backoff = min(self.backoff * 2, BACKOFF_MAX_SECONDS)
+            else:
+                self.backoff = BACKOFF_INITIAL_SECONDS
+            logger.warning("Action worker %d exited with code %d after %.0fs; replacing it", pid,
+                           os.waitstatus_to_exitcode(status), uptime)
+
+    def check_memory(self) -> None:
+        for pid in list(self.workers):
+            memory = private_memory_mb(pid)
+            if memory is None:
+                continue
+            baseline = self.baseline_mb.setdefault(pid, memory)
+            if memory - baseline <= self.max_growth_mb:
+                continue
+            logger.warning("Action worker %d grew from %.0f to %.0f MB of private memory (limit +%.0f MB); "
+                           "replacing it", pid, baseline, memory, self.max_growth_mb)
+            self.memory_restarts += 1
+            del self.workers[pid]
+            del self.baseline_mb[pid]
+            self.spawn()
+            self.retire(pid)
+
+    def retire(self, pid: int) -> None:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        self.retiring[pid] = time.monotonic()
+
+    def kill_overdue(self) -> None:
+        for pid, retired_at in list(self.retiring.items()):
+            if time.monotonic() - retired_at > STOP_TIMEOUT_SECONDS:
+                logger.warning("Action worker %d did not stop in %.0fs; killing it", pid, STOP_TIMEOUT_SECONDS)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.retiring[pid] = float('inf')
+
+    def run(self) -> None:
+        """Fork the workers and keep them running until SIGINT or SIGTERM."""
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self._stop)
+        # Keep the collector from touching (and so copying) every object the workers inherit
+        gc.collect()
+        gc.freeze()
+        memory_checked_at = time.monotonic()
+        while not self.stopping:
+            self.reap()
+            while len(self.workers) < self.size and time.monotonic() >= self.next_spawn_at and not self.stopping:
+                self.spawn()
+            if self.max_growth_mb > 0 and time.monotonic() - memory_checked_at >= self.memory_check_seconds:
+                memory_checked_at = time.monotonic()
+                self.check_memory()
+            self.kill_overdue()
+            time.sleep(POLL_SECONDS)
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        logger.info("Stopping %d action workers", len(self.workers) + len(self.retiring))
+        for pid in list(self.workers):
+            self.retire(pid)
+        self.workers.clear()
+        deadline = time.monotonic() + STOP_TIMEOUT_SECONDS
+        while self.retiring and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in self.retiring:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.sock.close()
@@ -10,7 +10,7 @@ class ActionAskStatus(Action):
     def name(self) -> Text:
         return "action_ask_status"
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         status_asked = tracker.get_slot('status_asked')
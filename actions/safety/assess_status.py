@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Text
+from typing import Any, Dict, List, Optional, Text
 
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
@@ -6,6 +6,27 @@ from rasa_sdk.events import SlotSet
 
 from ..templates.buttons import get_status_buttons, get_safe_user_buttons
 from ..utils.emergency_helpers import get_emergency_type
+from ..utils.metrics import record_exception, record_outcome
+from ..utils.phrase_matcher import PHRASE_MATCHER, PhraseScan
+
+
+def extract_status_from_text(text: str) -> Optional[str]:
+    """'trapped', 'injured' or 'safe' from a free-text status reply, or None if it says neither."""
+    return status_from_phrases(PHRASE_MATCHER.scan(text))
+
+
+def status_from_phrases(scan: PhraseScan) -> Optional[str]:
+    if scan.has('trapped'):
+        return 'trapped'
+    # A negated indicator flips its meaning ("not injured" is safe, "not okay" is injured),
+    # but any indicator outside a negation's scope is taken at face value
+    injuries = scan.hits_for('injury')
+    if injuries:
+        return 'safe' if all(scan.negated(hit) for hit in injuries) else 'injured'
+    safe = scan.hits_for('safe')
+    if safe:
+        return 'injured' if all(scan.negated(hit) for hit in safe) else 'safe'
+    return None
 
 
 class ActionAssessStatus(Action):
@@ -13,7 +34,7 @@ class ActionAssessStatus(Action):
     def name(self) -> Text:
         return "action_assess_status"
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
         try:
@@ -30,27 +51,9 @@ class ActionAssessStatus(Action):
             # This handles cases where NLU misclassifies the intent
             if status_asked:
                 # Try to extract status from text even if NLU didn't classify it correctly
-                negations = ['not', 'no', "n't", "aren't", "isn't", "don't", 'never']
-                safe_indicators = ['safe', 'fine', 'okay', 'ok', 'good', 'well', 'alright', "i'm all set"]
-                injury_indicators = ['injured', 'hurt', 'bleeding', 'wounded', 'broken', 'i\'m injured', 'i am injured', 'i\'m hurt', 'i am hurt', 'got hurt', 'got injured', 'in pain', 'have injuries', 'injuries']
-                trapped_indicators = ['trapped', 'i\'m trapped', 'we\'re trapped', 'i am trapped', 'we are trapped', 'stuck', 'can\'t get out']
-
-                has_negation = any(word in latest_text for word in negations)
-                has_safe = any(word in latest_text for word in safe_indicators)
-                has_injury = any(word in latest_text for word in injury_indicators)
-                has_trapped = any(phrase in latest_text for phrase in trapped_indicators)
-
-                # Extract status from text if found
-                if has_trapped:
-                    injury_status = 'trapped'
-                elif has_negation and has_injury:
-                    injury_status = 'safe'
-                elif has_negation and has_safe:
-                    injury_status = 'injured'
-                elif has_injury:
-                    injury_status = 'injured'
-                elif has_safe:
-                    injury_status = 'safe'
+                text_status = extract_status_from_text(latest_text)
+                if text_status:
+                    injury_status = text_status
                 # If we extracted status from text, continue processing
                 # Otherwise, fall through to intent-based processing
             
@@ -75,32 +78,12 @@ class ActionAssessStatus(Action):
                 injury_status = 'trapped'
             
             if not injury_status and latest_intent in status_intents:
-                negations = ['not', 'no', "n't", "aren't", "isn't", "don't", 'never']
-                safe_indicators = ['safe', 'fine', 'okay', 'ok', 'good', 'well', 'alright']
-                injury_indicators = ['injured', 'hurt', 'bleeding', 'wounded', 'broken']
-                trapped_indicators = ['trapped', 'i\'m trapped', 'we\'re trapped', 'i am trapped', 'we are trapped']
-
-                has_negation = any(word in latest_text for word in negations)
-                has_safe = any(word in latest_text for word in safe_indicators)
-                has_injury = any(word in latest_text for word in injury_indicators)
-                has_trapped = any(phrase in latest_text for phrase in trapped_indicators)
-
-                if has_trapped:
-                    injury_status = 'trapped'
-                elif has_negation and has_injury:
-                    injury_status = 'safe'
-                elif has_negation and has_safe:
-                    injury_status = 'injured'
-                elif has_injury:
-                    injury_status = 'injured'
-                elif has_safe:
-                    injury_status = 'safe'
-                else:
-                    injury_status = 'unclear'
+                injury_status = extract_status_from_text(latest_text) or 'unclear'
             elif not injury_status:
                 return []
             
             events.append(SlotSet("injury_status", injury_status))
+            record_outcome(injury_status)
 
             if injury_status in ['injured', 'trapped']:
                 events.append(SlotSet("escalation_required", True))
@@ -127,6 +110,7 @@ class ActionAssessStatus(Action):
                 # Location is only needed for injured/trapped users
 
         except Exception as e:
+            record_exception(e)
             return []
 
         return events
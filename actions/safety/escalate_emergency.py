@@ -10,7 +10,7 @@ class ActionEscalateEmergency(Action):
     def name(self) -> Text:
         return "action_escalate_emergency"
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         # Just set the escalation flag - let stories/rules control the flow explicitly
@@ -4,13 +4,15 @@ from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet
 
+from ..utils.conversation_summary import get_conversation_summary
+
 
 class ActionResetEmergencySlots(Action):
     
     def name(self) -> Text:
         return "action_reset_emergency_slots"
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         # Reset all emergency-related slots when user explicitly reports a new emergency
@@ -35,18 +37,7 @@ class ActionResetEmergencySlots(Action):
             emergency_type = 'fire'
         else:
             # Check recent events for emergency report intent (in case action is called from story)
-            for event in reversed(tracker.events[-10:]):
-                if event.get('event') == 'user':
-                    intent = event.get('parse_data', {}).get('intent', {}).get('name', '')
-                    if intent == 'report_earthquake':
-                        emergency_type = 'earthquake'
-                        break
-                    elif intent == 'report_flood':
-                        emergency_type = 'flood'
-                        break
-                    elif intent == 'report_fire':
-                        emergency_type = 'fire'
-                        break
+            emergency_type = get_conversation_summary(tracker).recent_emergency_report()
         
         # Set emergency type if detected, otherwise reset to None
         # This ensures emergency_type is set correctly when a new emergency is reported
@@ -64,5 +55,6 @@ class ActionResetEmergencySlots(Action):
         events.append(SlotSet("location_validated", False))
         events.append(SlotSet("location_retry_count", 0))
         events.append(SlotSet("postcode", None))
+        events.append(SlotSet("location_coords", None))
         
         return events
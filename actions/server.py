@@ -0,0 +1,117 @@
+"""
+Action server entry point: the rasa_sdk endpoint plus a Prometheus /metrics route.
+Every worker warms its actions up (see utils/warmup.py) before it starts
+listening. With --workers N (default: ACTION_SERVER_SANIC_WORKERS) above 1 the
+workers are pre-forked behind one port (see prefork.py). Takes the same
+arguments as `rasa run actions`:
+
+    python -m actions.server --port 5055 [--workers 4]
+"""
+
+import asyncio
+import logging
+import os
+from importlib import import_module
+from typing import Any, Dict, List
+
+from rasa_sdk import Action, utils
+from rasa_sdk.constants import APPLICATION_ROOT_LOGGER_NAME
+from rasa_sdk.endpoint import create_app, create_argument_parser, create_ssl_context
+from rasa_sdk.plugin import plugin_manager
+from sanic import Sanic, response
+
+from .location.reverse_geocoder import REVERSE_GEOCODER
+from .prefork import PreforkMaster, bind_socket
+from .shelters.occupancy import OCCUPANCY
+from .templates.render_cache import RENDER_CACHE
+from .utils.concurrency import close_http_session
+from .utils.constants import SHELTER_DATA
+from .utils.conversation_summary import SUMMARY_CACHE
+from .utils.metrics import METRICS, Family, info_family, stats_family
+from .utils.warmup import warm_up_actions
+
+logger = logging.getLogger(__name__)
+
+METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Timings of this worker's warm-up
+WARMUP_REPORT: Dict[str, Any] = {}
+
+
+def component_stats() -> List[Family]:
+    """Caches and data stores of the action server, read at scrape time."""
+    return [
+        stats_family('actions_shelter_data', 'Shelter data snapshot store.', SHELTER_DATA.stats()),
+        info_family('actions_shelter_data_info', 'Shelter data version served and the last reload error.',
+                    SHELTER_DATA.stats()),
+        stats_family('actions_reverse_geocoder', 'Nominatim client cache, rate limiter and breaker.',
+                     REVERSE_GEOCODER.stats()),
+        stats_family('actions_occupancy', 'Shelter occupancy registry.', OCCUPANCY.stats()),
+        stats_family('actions_render_cache', 'Rendered message cache.',
+                     {'hits': RENDER_CACHE.hits, 'misses': RENDER_CACHE.misses, 'entries': len(RENDER_CACHE)}),
+        stats_family('actions_summary_cache', 'Conversation summary cache.', {'entries': len(SUMMARY_CACHE)}),
+        stats_family('actions_warmup', 'Warm-up run before the worker started listening.', WARMUP_REPORT),
+    ]
+
+
+METRICS.add_collector(component_stats)
+
+
+def add_metrics_route(app: Sanic) -> None:
+    @app.get('/metrics')
+    async def metrics(_request):
+        return response.text(METRICS.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+def load_actions(action_package_name: str) -> List[Action]:
+    package = import_module(action_package_name)
+    return [member() for member in (getattr(package, name) for name in getattr(package, '__all__', []))
+            if isinstance(member, type) and issubclass(member, Action)]
+
+
+def add_warmup(app: Sanic, actions: List[Action]) -> None:
+    async def warm_up(_app, _loop):
+        WARMUP_REPORT.update(await warm_up_actions(actions))
+
+    app.register_listener(warm_up, 'before_server_start')
+
+
+async def warm_up_before_fork(actions: List[Action]) -> None:
+    # Whatever the actions build on first use is then built once and shared by the workers
+    await warm_up_actions(actions)
+    await close_http_session()
+
+
+def main() -> None:
+    parser = create_argument_parser()
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of pre-forked worker processes (default: ACTION_SERVER_SANIC_WORKERS or 1)')
+    args = parser.parse_args()
+
+    logging.getLogger('matplotlib').setLevel(logging.WARN)
+    utils.configure_colored_logging(args.loglevel)
+    utils.configure_file_logging(logging.getLogger(APPLICATION_ROOT_LOGGER_NAME), args.log_file, args.loglevel,
+                                 args.logging_config_file)
+    utils.update_sanic_log_level()
+
+    app = create_app(args.actions, cors_origins=args.cors, auto_reload=args.auto_reload)
+    add_metrics_route(app)
+    # Without --actions the executor serves the actions this package imported
+    actions = load_actions(args.actions or __package__)
+    add_warmup(app, actions)
+    plugin_manager().hook.attach_sanic_app_extensions(app=app)
+    ssl_context = create_ssl_context(args.ssl_certificate, args.ssl_keyfile, args.ssl_password)
+    host = os.environ.get('SANIC_HOST', '0.0.0.0')
+    workers = args.workers or utils.number_of_sanic_workers()
+    logger.info(f"Action server with /metrics is up on {'https' if ssl_context else 'http'}://{host}:{args.port} "
+                f"with {workers} worker(s)")
+    if workers <= 1:
+        app.run(host, args.port, ssl=ssl_context)
+        return
+    asyncio.run(warm_up_before_fork(actions))
+    sock = bind_socket(host, args.port)
+    PreforkMaster(lambda worker_sock: app.run(sock=worker_sock, ssl=ssl_context), sock, workers).run()
+
+
+if __name__ == '__main__':
+    main()
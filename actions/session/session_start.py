@@ -10,7 +10,7 @@ class ActionSessionStart(Action):
     def name(self) -> Text:
         return "action_session_start"
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker, 
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         return [
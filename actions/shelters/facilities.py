@@ -0,0 +1,63 @@
+"""
+Facilities a user asks their shelter to have.
+Requests come from `facility` entities, or failing that from the wording of
+a shelter request, and are resolved to the canonical names in
+FACILITY_VOCABULARY that the shelter store's bitmasks are built from.
+"""
+
+from typing import Iterable, List, Optional
+
+from rasa_sdk import Tracker
+
+from ..utils.constants import FACILITY_VOCABULARY
+from ..utils.phrase_matcher import PhraseMatcher
+
+FACILITY_MATCHER = PhraseMatcher(FACILITY_VOCABULARY, whole_word=FACILITY_VOCABULARY)
+
+_CANONICAL_NAMES = {}
+for _name, _phrases in FACILITY_VOCABULARY.items():
+    for _phrase in _phrases:
+        _CANONICAL_NAMES.setdefault(_phrase.lower(), _name)
+    _CANONICAL_NAMES[_name.lower()] = _name
+
+# Intents whose text is scanned for facility wording when no entity was extracted
+SHELTER_REQUEST_INTENTS = ('request_shelter_info',)
+
+
+def canonical_facility(value: str) -> Optional[str]:
+    """Canonical facility name for an entity value or phrase, or None if it is not a known facility."""
+    value = (value or '').strip().lower()
+    if value in _CANONICAL_NAMES:
+        return _CANONICAL_NAMES[value]
+    hits = FACILITY_MATCHER.scan(value).hits
+    return hits[0].category if hits else None
+
+
+def facilities_in_text(text: str) -> List[str]:
+    """Facilities mentioned in free text, in order of first mention."""
+    return list(dict.fromkeys(hit.category for hit in FACILITY_MATCHER.scan((text or '').lower()).hits))
+
+
+def _unique(names: Iterable[Optional[str]]) -> List[str]:
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def requested_facilities(tracker: Tracker) -> List[str]:
+    """
+    Facilities asked for in the latest message, otherwise those remembered in
+    the required_facilities slot.
+    """
+    latest_message = tracker.latest_message or {}
+    from_entities = _unique(canonical_facility(entity.get('value'))
+                            for entity in latest_message.get('entities', [])
+                            if entity.get('entity') == 'facility')
+    if from_entities:
+        return from_entities
+    if (latest_message.get('intent') or {}).get('name') in SHELTER_REQUEST_INTENTS:
+        from_text = facilities_in_text(latest_message.get('text', ''))
+        if from_text:
+            return from_text
+    remembered = tracker.get_slot('required_facilities') or []
+    if isinstance(remembered, str):
+        remembered = [remembered]
+    return _unique(canonical_facility(value) for value in remembered)
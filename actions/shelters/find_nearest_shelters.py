@@ -3,9 +3,19 @@ from typing import Any, Dict, List, Text
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 
-from ..utils.constants import EMERGENCY_DATA
-from ..templates.messages import format_shelter_info, format_emergency_contacts
+from ..utils.constants import SHELTER_DATA
+from ..utils.conversation_summary import get_conversation_summary
+from ..utils.delays import add_long_delay
+from ..utils.metrics import record_exception, record_outcome
+from ..utils.warmup import is_warmup
+from ..templates.messages import format_shelter_info, format_nearest_shelters, format_emergency_contacts
 from ..templates.buttons import get_safe_user_buttons
+from .facilities import requested_facilities
+from .occupancy import OCCUPANCY, shelter_id
+from .shelter_index import NEAREST_SHELTER_COUNT
+
+# Nearest shelters considered before re-ranking by remaining capacity
+CANDIDATE_SHELTER_COUNT = 4 * NEAREST_SHELTER_COUNT
 
 
 class ActionFindNearestShelters(Action):
@@ -13,7 +23,7 @@ class ActionFindNearestShelters(Action):
     def name(self) -> Text:
         return "action_find_nearest_shelters"
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
         try:
@@ -28,24 +38,42 @@ class ActionFindNearestShelters(Action):
             is_explicit_request = latest_intent == 'request_shelter_info'
             
             # Also check if action_handle_shelter_request was just called (indicates explicit request)
-            was_handle_shelter_request_called = False
-            for event in reversed(tracker.events[-5:]):
-                if event.get('event') == 'action' and event.get('name') == 'action_handle_shelter_request':
-                    was_handle_shelter_request_called = True
-                    break
+            was_handle_shelter_request_called = get_conversation_summary(tracker).shelter_request_handled()
             
             # Only skip if shelters were shown AND this is not an explicit request
             if shelters_shown and not is_explicit_request and not was_handle_shelter_request_called:
                 return []
 
             if not district:
+                record_outcome('no_location')
                 from rasa_sdk.events import FollowupAction
                 dispatcher.utter_message(text="📍 I need your location to find nearby shelters.")
                 return [FollowupAction("utter_ask_location")]
             
-            shelters = EMERGENCY_DATA.get('shelters', {}).get(district, [])
+            # One snapshot for the whole turn, so the index and the shelter lists always agree
+            snapshot = SHELTER_DATA.snapshot()
+            
+            shelter_index = snapshot.derived['shelter_index']
+            facilities = tuple(requested_facilities(tracker))
+            # Cleared if no shelter offers all requested facilities and the unfiltered list is shown
+            shown_facilities = facilities
+            
+            # With known coordinates, rank shelters by distance across district borders
+            location_coords = tracker.get_slot('location_coords')
+            nearest = []
+            if isinstance(location_coords, dict) and location_coords.get('lat') is not None and location_coords.get('lng') is not None:
+                lat, lng = float(location_coords['lat']), float(location_coords['lng'])
+                candidates = shelter_index.nearest(lat, lng, k=CANDIDATE_SHELTER_COUNT, facilities=facilities)
+                if facilities and not candidates:
+                    shown_facilities = ()
+                    candidates = shelter_index.nearest(lat, lng, k=CANDIDATE_SHELTER_COUNT)
+                # Spread a surge over nearby shelters instead of sending everyone to the closest one
+                nearest = OCCUPANCY.rank(candidates, k=NEAREST_SHELTER_COUNT)
             
-            if not shelters:
+            shelters = snapshot.data.get('shelters', {}).get(district, [])
+            
+            if not shelters and not nearest:
+                record_outcome('no_shelters')
                 dispatcher.utter_message(text=f"⚠️ No specific shelters listed for {district}. Please call **112** for the nearest emergency shelter or evacuation point.")
                 dispatcher.utter_message(text=format_emergency_contacts())
                 
@@ -61,8 +89,33 @@ class ActionFindNearestShelters(Action):
                 from rasa_sdk.events import SlotSet
                 return [SlotSet("shelters_shown", True)]
             
-            message = format_shelter_info(district, shelters)
-            dispatcher.utter_message(text=message)
+            if nearest:
+                record_outcome('nearest')
+                message = format_nearest_shelters(nearest, shown_facilities)
+                if not is_warmup(tracker):
+                    OCCUPANCY.reserve(shelter_id(nearest[0].shelter))
+            else:
+                record_outcome('district')
+                order = OCCUPANCY.order(shelters)
+                if facilities:
+                    # The district's store rows are in the same order as its shelter list
+                    offering = shelter_index.store.has_facilities(facilities)[
+                        shelter_index.store.rows_in_district(district)]
+                    filtered = tuple(i for i in order if i < len(offering) and offering[i])
+                    if filtered:
+                        order = filtered
+                    else:
+                        shown_facilities = ()
+                message = format_shelter_info(district, order=order, facilities=shown_facilities, snapshot=snapshot)
+                if not is_warmup(tracker):
+                    OCCUPANCY.reserve(shelter_id(shelters[order[0]]))
+            
+            if facilities and not shown_facilities:
+                record_outcome('facility_fallback')
+                dispatcher.utter_message(text=f"⚠️ No shelters with {', '.join(facilities)} found nearby. "
+                                              f"Showing the nearest shelters instead.")
+            # The data version travels with the utterance so answers can be traced to a data release
+            dispatcher.utter_message(text=message, data_version=snapshot.version)
             
             # Check if this is an independent request (not part of main emergency flow)
             # Main flow indicators: status_asked is True (earthquake flow) or instructions_provided is True (flood/fire flow)
@@ -75,13 +128,18 @@ class ActionFindNearestShelters(Action):
             is_main_flow = (status_asked and location_validated) or (instructions_provided and location_validated)
             
             if not is_main_flow:
+                add_long_delay(dispatcher)
                 dispatcher.utter_message(text="**What would you like to do next?**", buttons=get_safe_user_buttons())
             
             from rasa_sdk.events import SlotSet
             events = [SlotSet("shelters_shown", True)]
+            # Remember the requirement for later shelter requests in this conversation
+            if facilities:
+                events.append(SlotSet("required_facilities", list(facilities)))
             
             return events
         except Exception as e:
+            record_exception(e)
             dispatcher.utter_message(text="⚠️ Unable to retrieve shelter information. Please call **112** for emergency assistance.")
             return []
 
@@ -12,7 +12,7 @@ class ActionHandleShelterRequest(Action):
     def name(self) -> Text:
         return "action_handle_shelter_request"
     
-    def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
+    async def run(self, dispatcher: CollectingDispatcher, tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
         
         from rasa_sdk.events import SlotSet, FollowupAction
@@ -32,7 +32,7 @@ class ActionHandleShelterRequest(Action):
         events = [SlotSet("shelters_shown", False)]
         
         find_shelters_action = ActionFindNearestShelters()
-        shelter_events = find_shelters_action.run(dispatcher, tracker, domain)
+        shelter_events = await find_shelters_action.run(dispatcher, tracker, domain)
         
         events.extend(shelter_events)
         return events
@@ -0,0 +1,438 @@
+"""
+Live shelter occupancy and capacity-aware ranking.
+Shelter operators append absolute head counts to a JSON-lines feed; every
+action-server worker tails the same file and appends its own assignments to
+it, so all workers converge on the same counts without sharing memory.
+Assignments are held as reservations that decay with a half-life, covering
+people who are on their way but not yet in the operators' counts.
+
+Once the feed passes ACTIONS_OCCUPANCY_COMPACT_BYTES, one worker folds it into
+a snapshot next to it and empties it; the others, and any worker started
+later, load the snapshot and tail the feed from the offset it records.
+Appends take a shared flock on the feed and compaction an exclusive one, so
+operator scripts should append under flock(1) as well. Workers append their
+assignments from a writer thread, so an action never waits on the feed.
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .shelter_index import ShelterMatch
+
+logger = logging.getLogger(__name__)
+
+FEED_PATH = os.environ.get(
+    'ACTIONS_OCCUPANCY_FEED',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'occupancy_feed.jsonl'))
+FEED_POLL_SECONDS = float(os.environ.get('ACTIONS_OCCUPANCY_POLL_SECONDS', '1'))
+FEED_COMPACT_BYTES = int(os.environ.get('ACTIONS_OCCUPANCY_COMPACT_BYTES', str(4 * 1024 * 1024)))
+
+# A reservation counts half after this long; by then most people have arrived and been counted
+RESERVATION_HALF_LIFE_SECONDS = 1800.0
+
+# A full shelter ranks as if it were this much further away than an empty one
+LOAD_PENALTY_KM = 2.0
+
+SHARD_COUNT = 16
+
+
+def shelter_id(shelter: Dict[str, Any]) -> str:
+    return shelter.get('id') or shelter['name']
+
+
+def _decay(seconds: float) -> float:
+    return 0.5 ** (seconds / RESERVATION_HALF_LIFE_SECONDS)
+
+
+class _Shard:
+    __slots__ = ('lock', 'occupancy', 'reservations')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # shelter id -> (reported head count, reported at)
+        self.occupancy: Dict[str, Tuple[float, float]] = {}
+        # shelter id -> (reserved people as of the timestamp, timestamp)
+        self.reservations: Dict[str, Tuple[float, float]] = {}
+
+
+class OccupancyRegistry:
+    """
+    Sharded occupancy and reservation counters.
+
+    Reservations decay exponentially, so adding one is commutative: the feed
+    can deliver them in any order and every worker still ends up with the same
+    totals. Head counts are last-writer-wins on the operator's timestamp.
+    Every feed record carries its timestamp, so all workers apply the same
+    values no matter when they read it.
+
+    A new assignment is held as pending until the writer thread has appended it
+    to the feed, and only then joins the counts that polls and compactions work
+    on, so a snapshot never holds an assignment the feed does not.
+    """
+
+    def __init__(self, feed_path: Optional[str] = FEED_PATH, poll_interval: float = FEED_POLL_SECONDS,
+                 shard_count: int = SHARD_COUNT, compact_bytes: int = FEED_COMPACT_BYTES):
+        self.feed_path = feed_path
+        self.snapshot_path = f'{feed_path}.snapshot' if feed_path else None
+        self.poll_interval = poll_interval
+        self.compact_bytes = compact_bytes
+        self._shards = [_Shard() for _ in range(shard_count)]
+        self._feed_offset = 0
+        self._feed_remainder = b''
+        # Snapshot generation the counts are based on; None until the snapshot has been looked at
+        self._feed_generation: Optional[int] = None
+        self._snapshot_mtime: Optional[int] = None
+        self._feed_lock = threading.Lock()
+        self._feed_fd: Optional[int] = None
+        self._pid: Optional[int] = None
+        # Tags this process's feed records; unlike pids, never reused by a later worker
+        self._writer_id = ''
+        self._watcher_pid: Optional[int] = None
+        # Assignments not yet in the feed: per shelter for reserved(), and in order for the writer thread
+        self._pending_lock = threading.Lock()
+        self._pending: Dict[str, List[Tuple[float, float]]] = {}
+        self._queue: List[Tuple[str, float, float]] = []
+        self._wake = threading.Event()
+        self._writer_pid: Optional[int] = None
+        self.assignments = 0
+        self.feed_updates = 0
+        self.feed_errors = 0
+        self.compactions = 0
+        atexit.register(self.flush)
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def _adopt_process(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        if self._pid is not None:
+            # Forked: locks may have been held at fork time, and the inherited counts can't be told apart
+            # from the parent's later assignments, so rebuild them from the snapshot and the feed
+            self._feed_lock = threading.Lock()
+            self._pending_lock = threading.Lock()
+            self._wake = threading.Event()
+            # The parent's writer thread publishes the assignments the parent queued
+            self._pending = {}
+            self._queue = []
+            self._shards = [_Shard() for _ in self._shards]
+            self._feed_offset = 0
+            self._feed_remainder = b''
+            self._feed_generation = None
+            self._snapshot_mtime = None
+        self._feed_fd = None
+        self._writer_id = uuid.uuid4().hex
+        self._pid = pid
+
+    def report(self, key: str, occupancy: float, reported_at: Optional[float] = None) -> None:
+        """Record an operator head count; older reports than the one held are ignored."""
+        reported_at = time.time() if reported_at is None else reported_at
+        shard = self._shard(key)
+        with shard.lock:
+            current = shard.occupancy.get(key)
+            if current is None or reported_at >= current[1]:
+                shard.occupancy[key] = (float(occupancy), reported_at)
+
+    def _add_reservation(self, key: str, people: float, at: float) -> None:
+        shard = self._shard(key)
+        with shard.lock:
+            value, as_of = shard.reservations.get(key, (0.0, at))
+            if at >= as_of:
+                shard.reservations[key] = (value * _decay(at - as_of) + people, at)
+            else:
+                shard.reservations[key] = (value + people * _decay(as_of - at), as_of)
+
+    def reserve(self, key: str, people: float = 1.0, at: Optional[float] = None) -> None:
+        """Count an assignment here and queue it for the writer thread to publish through the feed."""
+        at = time.time() if at is None else at
+        self._adopt_process()
+        if not self.feed_path:
+            self._add_reservation(key, people, at)
+        else:
+            with self._pending_lock:
+                self._pending.setdefault(key, []).append((people, at))
+                self._queue.append((key, people, at))
+            self._ensure_writer()
+            self._wake.set()
+        self.assignments += 1
+
+    def reserved(self, key: str, now: Optional[float] = None) -> float:
+        """Reservations decayed to now; workers asked for the same instant give the same answer."""
+        now = time.time() if now is None else now
+        entry = self._shard(key).reservations.get(key)
+        value = entry[0] * _decay(now - entry[1]) if entry is not None else 0.0
+        if key in self._pending:
+            with self._pending_lock:
+                value += sum(people * _decay(now - at) for people, at in self._pending.get(key, ()))
+        return value
+
+    def occupancy(self, key: str) -> Optional[float]:
+        entry = self._shard(key).occupancy.get(key)
+        return entry[0] if entry is not None else None
+
+    def remaining(self, shelter: Dict[str, Any], now: Optional[float] = None) -> Optional[float]:
+        """Places left after head count and reservations; None if the capacity is unknown."""
+        capacity = shelter.get('capacity')
+        if not capacity:
+            return None
+        key = shelter_id(shelter)
+        return capacity - (self.occupancy(key) or 0.0) - self.reserved(key, now)
+
+    def load(self, shelter: Dict[str, Any], now: Optional[float] = None) -> float:
+        """Fraction of capacity in use, clamped to [0, 1]; 0 if the capacity is unknown."""
+        remaining = self.remaining(shelter, now)
+        if remaining is None:
+            return 0.0
+        return min(max(1.0 - remaining / shelter['capacity'], 0.0), 1.0)
+
+    def rank(self, matches: Sequence[ShelterMatch], k: int) -> List[ShelterMatch]:
+        """
+        The k best matches by distance plus a load penalty.
+        Full shelters are only offered when nothing else is in range.
+        """
+        self._ensure_watcher()
+        now = time.time()
+        scored = []
+        for position, match in enumerate(matches):
+            load = self.load(match.shelter, now)
+            scored.append((load >= 1.0, match.distance_km + LOAD_PENALTY_KM * load, position, match))
+        scored.sort(key=lambda item: item[:3])
+        return [item[3] for item in scored[:k]]
+
+    def order(self, shelters: Sequence[Dict[str, Any]]) -> Tuple[int, ...]:
+        """Indices of shelters (no distances known) from least to most loaded, stable on ties."""
+        self._ensure_watcher()
+        now = time.time()
+        loads = [self.load(shelter, now) for shelter in shelters]
+        return tuple(sorted(range(len(shelters)), key=lambda i: (loads[i] >= 1.0, loads[i])))
+
+    def flush(self) -> int:
+        """Append the queued assignments to the feed and move them into the counts. Returns how many."""
+        self._adopt_process()
+        with self._feed_lock:
+            with self._pending_lock:
+                batch, self._queue = self._queue, []
+            if not batch:
+                return 0
+            self._append_feed([{'shelter': key, 'reserve': people, 'ts': at, 'writer': self._writer_id}
+                               for key, people, at in batch])
+            # Under _feed_lock, so a poll or compaction sees each assignment in both the feed and the counts or
+            # in neither; a failed append still counts here
+            for key, people, at in batch:
+                self._add_reservation(key, people, at)
+            with self._pending_lock:
+                for key, people, at in batch:
+                    entries = self._pending[key]
+                    entries.remove((people, at))
+                    if not entries:
+                        del self._pending[key]
+        return len(batch)
+
+    def _append_feed(self, records: List[Dict[str, Any]]) -> None:
+        if not self.feed_path:
+            return
+        data = b''.join((json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8') for record in records)
+        try:
+            if self._feed_fd is None:
+                self._feed_fd = os.open(self.feed_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            # One O_APPEND write of whole lines keeps lines from different workers whole;
+            # the shared lock keeps it out of a compaction in progress
+            fcntl.flock(self._feed_fd, fcntl.LOCK_SH)
+            try:
+                os.write(self._feed_fd, data)
+            finally:
+                fcntl.flock(self._feed_fd, fcntl.LOCK_UN)
+        except OSError as e:
+            self.feed_errors += 1
+            logger.warning("Could not append to occupancy feed %s: %s", self.feed_path, e)
+
+    def _ensure_writer(self) -> None:
+        if self._writer_pid != os.getpid():
+            # Threads do not survive fork, so each worker process starts its own writer
+            self._writer_pid = os.getpid()
+            thread = threading.Thread(target=self._write_queued, name='occupancy-feed-writer', daemon=True)
+            thread.start()
+
+    def _write_queued(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self.flush()
+
+    def _ensure_watcher(self) -> None:
+        self._adopt_process()
+        if self._watcher_pid != os.getpid() and self.feed_path and self.poll_interval > 0:
+            # Threads do not survive fork, so each worker process tails the feed itself
+            self._watcher_pid = os.getpid()
+            thread = threading.Thread(target=self._watch, name='occupancy-feed-watcher', daemon=True)
+            thread.start()
+
+    def _watch(self) -> None:
+        while True:
+            self.poll_feed()
+            if self.compact_bytes > 0 and self._feed_offset >= self.compact_bytes:
+                self.compact(self.compact_bytes)
+            time.sleep(self.poll_interval)
+
+    def _load_snapshot(self) -> bool:
+        """
+        Replace the counts with the snapshot if a compaction has written a newer one since.
+        Call holding _feed_lock and a lock on the feed. Returns True if the counts were replaced.
+        """
+        try:
+            mtime = os.stat(self.snapshot_path).st_mtime_ns
+        except FileNotFoundError:
+            if self._feed_generation is None:
+                self._feed_generation = 0
+            return False
+        if mtime == self._snapshot_mtime:
+            return False
+        with open(self.snapshot_path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        self._snapshot_mtime = mtime
+        if snapshot['generation'] == self._feed_generation:
+            return False
+
+        shards = [_Shard() for _ in self._shards]
+        for key, (count, reported_at) in snapshot['occupancy'].items():
+            shards[hash(key) % len(shards)].occupancy[key] = (count, reported_at)
+        for key, (value, as_of) in snapshot['reservations'].items():
+            shards[hash(key) % len(shards)].reservations[key] = (value, as_of)
+        self._shards = shards
+        self._feed_generation = snapshot['generation']
+        self._feed_offset = snapshot['offset']
+        self._feed_remainder = b''
+        return True
+
+    def _write_snapshot(self, generation: int, offset: int) -> None:
+        occupancy: Dict[str, Tuple[float, float]] = {}
+        reservations: Dict[str, Tuple[float, float]] = {}
+        for shard in self._shards:
+            with shard.lock:
+                occupancy.update(shard.occupancy)
+                reservations.update(shard.reservations)
+        snapshot = {'generation': generation, 'offset': offset, 'occupancy': occupancy,
+                    'reservations': reservations}
+        tmp_path = f'{self.snapshot_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(tmp_path, self.snapshot_path)
+        self._snapshot_mtime = os.stat(self.snapshot_path).st_mtime_ns
+        self._feed_generation = generation
+
+    def _read_feed(self, feed) -> List[bytes]:
+        """Complete lines appended to the open feed since the last read."""
+        size = os.fstat(feed.fileno()).st_size
+        if size < self._feed_offset:
+            # Truncated by hand: start from the top, counts held so far stay valid
+            self._feed_offset = 0
+            self._feed_remainder = b''
+        feed.seek(self._feed_offset)
+        chunk = feed.read()
+        self._feed_offset += len(chunk)
+        lines = (self._feed_remainder + chunk).split(b'\n')
+        # The last piece is an incomplete line (or empty); finish it on the next read
+        self._feed_remainder = lines.pop()
+        return lines
+
+    def poll_feed(self) -> int:
+        """Apply lines appended to the feed since the last poll. Returns how many were applied."""
+        if not self.feed_path:
+            return 0
+        self._adopt_process()
+        with self._feed_lock:
+            try:
+                with open(self.feed_path, 'rb') as feed:
+                    fcntl.flock(feed, fcntl.LOCK_SH)
+                    reloaded = self._load_snapshot()
+                    lines = self._read_feed(feed)
+            except FileNotFoundError:
+                return 0
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.feed_errors += 1
+                logger.warning("Could not read occupancy feed %s: %s", self.feed_path, e)
+                return 0
+            # The snapshot holds none of the lines after its offset, this worker's own included
+            return self._apply(lines, skip_own=not reloaded)
+
+    def compact(self, min_bytes: int = 0) -> bool:
+        """
+        Fold the feed into the snapshot and empty it, unless another worker is compacting
+        or, once caught up, fewer than min_bytes are left to fold. Returns True if compacted.
+        """
+        if not self.feed_path:
+            return False
+        self._adopt_process()
+        with self._feed_lock:
+            try:
+                with open(self.feed_path, 'r+b') as feed:
+                    try:
+                        fcntl.flock(feed, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        return False
+                    # Catch up under the lock, so the counts cover every line in the file
+                    reloaded = self._load_snapshot()
+                    self._apply(self._read_feed(feed), skip_own=not reloaded)
+                    if self._feed_offset < min_bytes:
+                        return False
+                    self._write_snapshot(self._feed_generation + 1, 0)
+                    feed.truncate(0)
+                    # Keep a line an unlocked writer has not finished
+                    feed.seek(0)
+                    feed.write(self._feed_remainder)
+                    self._feed_offset = len(self._feed_remainder)
+            except FileNotFoundError:
+                return False
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                self.feed_errors += 1
+                logger.warning("Could not compact occupancy feed %s: %s", self.feed_path, e)
+                return False
+        self.compactions += 1
+        logger.info("Compacted occupancy feed %s into generation %d", self.feed_path, self._feed_generation)
+        return True
+
+    def _apply(self, lines: List[bytes], skip_own: bool) -> int:
+        applied = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                key = record['shelter']
+                # Required: a read-time default would differ between workers
+                at = float(record['ts'])
+                if 'reserve' in record:
+                    # This worker counted its own assignments when it made them
+                    if not (skip_own and record.get('writer') == self._writer_id):
+                        self._add_reservation(key, float(record['reserve']), at)
+                else:
+                    self.report(key, float(record['occupancy']), at)
+            except (ValueError, KeyError, TypeError) as e:
+                self.feed_errors += 1
+                logger.warning("Skipping malformed occupancy update %r: %s", line[:200], e)
+                continue
+            applied += 1
+        self.feed_updates += applied
+        return applied
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'assignments': self.assignments,
+            'queued_assignments': len(self._queue),
+            'feed_updates': self.feed_updates,
+            'feed_errors': self.feed_errors,
+            'feed_offset': self._feed_offset,
+            'feed_generation': self._feed_generation,
+            'compactions': self.compactions,
+        }
+
+
+OCCUPANCY = OccupancyRegistry()
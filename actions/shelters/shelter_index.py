@@ -0,0 +1,121 @@
+"""
+Spatial index over the shelter store.
+Answers "k nearest shelters" and "shelters within a radius" queries across
+district borders using vectorised great-circle distances.
+"""
+
+import math
+import os
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from ..utils.constants import SHELTER_DATA
+from .shelter_store import ShelterStore, load_shelter_store
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Number of shelters shown when the user's coordinates are known
+NEAREST_SHELTER_COUNT = 3
+
+# Optional store written by scripts/build_shelter_store.py, used instead of the JSON when up to date
+PREBUILT_STORE_PATH = os.environ.get('ACTIONS_SHELTER_STORE')
+
+
+class ShelterMatch(NamedTuple):
+    shelter: Mapping[str, Any]
+    district: str
+    distance_km: float
+
+
+def _unit_vectors(lat_deg: np.ndarray, lng_deg: np.ndarray) -> np.ndarray:
+    lat = np.radians(lat_deg)
+    lng = np.radians(lng_deg)
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+
+
+class ShelterIndex:
+    """
+    Shelters stored as unit vectors on the sphere.
+
+    The cosine of the central angle between two points is the dot product of
+    their unit vectors, so one matrix-vector product ranks every shelter and
+    great-circle distances are only computed for the results.
+    """
+
+    def __init__(self, store: ShelterStore):
+        self.store = store
+        # Store rows of the shelters that have coordinates; the vectors are in the same order
+        self.rows = np.flatnonzero(~np.isnan(store.lat))
+        self.vectors = _unit_vectors(store.lat[self.rows], store.lng[self.rows]).reshape(-1, 3)
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> 'ShelterIndex':
+        return cls(load_shelter_store(data, PREBUILT_STORE_PATH))
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _cosines(self, lat: float, lng: float) -> np.ndarray:
+        query = _unit_vectors(np.array([lat]), np.array([lng]))[0]
+        return self.vectors @ query
+
+    def _matches(self, indices: np.ndarray, cosines: np.ndarray) -> List[ShelterMatch]:
+        angles = np.arccos(np.clip(cosines[indices], -1.0, 1.0))
+        store = self.store
+        return [
+            ShelterMatch(store.view(row), store.district(row), float(angle * EARTH_RADIUS_KM))
+            for row, angle in zip(self.rows[indices].tolist(), angles.tolist())
+        ]
+
+    def _eligible(self, facilities: Sequence[str]) -> Optional[np.ndarray]:
+        """Per-indexed-shelter mask of those offering all facilities; None when unfiltered."""
+        if not facilities:
+            return None
+        return self.store.has_facilities(facilities)[self.rows]
+
+    def nearest(self, lat: float, lng: float, k: int = NEAREST_SHELTER_COUNT,
+                facilities: Sequence[str] = ()) -> List[ShelterMatch]:
+        """The k shelters closest to (lat, lng) offering all facilities, nearest first."""
+        eligible = self._eligible(facilities)
+        count = len(self.rows) if eligible is None else int(eligible.sum())
+        if count == 0 or k <= 0:
+            return []
+        cosines = self._cosines(lat, lng)
+        if eligible is not None:
+            # Below any real cosine, so filtered-out shelters never make the cut
+            cosines[~eligible] = -np.inf
+        if k < count:
+            # Largest cosine = smallest distance; partition before sorting the few winners
+            indices = np.argpartition(-cosines, k - 1)[:k]
+        else:
+            indices = np.arange(len(self.rows)) if eligible is None else np.flatnonzero(eligible)
+        indices = indices[np.argsort(-cosines[indices], kind='stable')]
+        return self._matches(indices, cosines)
+
+    def within_radius(self, lat: float, lng: float, radius_km: float,
+                      limit: Optional[int] = None, facilities: Sequence[str] = ()) -> List[ShelterMatch]:
+        """Shelters within radius_km of (lat, lng) offering all facilities, nearest first."""
+        if not len(self.rows) or radius_km < 0:
+            return []
+        cosines = self._cosines(lat, lng)
+        min_cosine = math.cos(min(radius_km / EARTH_RADIUS_KM, math.pi))
+        within = cosines >= min_cosine
+        eligible = self._eligible(facilities)
+        if eligible is not None:
+            within &= eligible
+        indices = np.flatnonzero(within)
+        indices = indices[np.argsort(-cosines[indices], kind='stable')]
+        if limit is not None:
+            indices = indices[:limit]
+        return self._matches(indices, cosines)
+
+
+# Rebuilt off the request path whenever the shelter data is reloaded
+SHELTER_DATA.derive('shelter_index', ShelterIndex.from_data)
+
+
+def get_shelter_index() -> ShelterIndex:
+    """Index of the latest published shelter data."""
+    return SHELTER_DATA.snapshot().derived['shelter_index']
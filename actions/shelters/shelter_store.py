@@ -0,0 +1,281 @@
+"""
+Columnar store of every shelter in the emergency data.
+Numeric fields (district, coordinates, capacity, facilities) are NumPy
+columns that spatial and facility queries scan without touching Python
+objects; text fields are packed into one UTF-8 buffer per column and only
+decoded when a result is rendered. Rows are read back as ShelterView
+mappings, which the message templates use like the original shelter dicts.
+"""
+
+import logging
+import math
+import os
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from ..utils.constants import FACILITY_VOCABULARY, data_version
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the layout of the prebuilt file changes
+STORE_FORMAT_VERSION = 1
+
+TEXT_FIELDS = ('id', 'name', 'address', 'phone')
+
+# Separates the entries of a shelter's facility list in the packed text column
+FACILITY_SEPARATOR = '\x1f'
+
+# A facility bitmask word; stores with more distinct facilities use several words per shelter
+MASK_BITS = 64
+MASK_WORD = (1 << MASK_BITS) - 1
+
+
+class TextColumn:
+    """Strings packed into one UTF-8 buffer with row offsets; None is kept distinct from ''."""
+
+    def __init__(self, buffer: bytes, offsets: np.ndarray, missing: np.ndarray):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.missing = missing
+
+    @classmethod
+    def from_values(cls, values: Sequence[Optional[str]]) -> 'TextColumn':
+        encoded = [value.encode('utf-8') if value is not None else b'' for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        missing = np.array([value is None for value in values], dtype=bool)
+        return cls(b''.join(encoded), offsets, missing)
+
+    def __len__(self) -> int:
+        return len(self.missing)
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        if self.missing[row]:
+            return None
+        return self.buffer[self.offsets[row]:self.offsets[row + 1]].decode('utf-8')
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buffer) + self.offsets.nbytes + self.missing.nbytes
+
+
+class ShelterView(Mapping):
+    """Read-only dict view of one shelter row, with the keys of the JSON shelter entries."""
+
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store: 'ShelterStore', row: int):
+        self._store = store
+        self._row = row
+
+    @property
+    def row(self) -> int:
+        return self._row
+
+    def _fields(self) -> List[str]:
+        store, row = self._store, self._row
+        fields = [field for field in TEXT_FIELDS if not store.text[field].missing[row]]
+        if store.capacity[row] >= 0:
+            fields.append('capacity')
+        if not store.text['facilities'].missing[row]:
+            fields.append('facilities')
+        if not np.isnan(store.lat[row]):
+            fields.append('coordinates')
+        return fields
+
+    def __getitem__(self, key: str) -> Any:
+        store, row = self._store, self._row
+        if key in TEXT_FIELDS:
+            value = store.text[key][row]
+        elif key == 'capacity':
+            value = int(store.capacity[row]) if store.capacity[row] >= 0 else None
+        elif key == 'facilities':
+            packed = store.text['facilities'][row]
+            value = packed.split(FACILITY_SEPARATOR) if packed else ([] if packed is not None else None)
+        elif key == 'coordinates':
+            value = None if np.isnan(store.lat[row]) else {'lat': float(store.lat[row]),
+                                                           'lng': float(store.lng[row])}
+        else:
+            value = None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields())
+
+    def __len__(self) -> int:
+        return len(self._fields())
+
+    def __repr__(self) -> str:
+        return f"ShelterView({dict(self)!r})"
+
+
+class ShelterStore:
+    """
+    One row per shelter across all districts, in data order.
+
+    district_codes index into districts; facility_masks has one row of
+    uint64 words per shelter, bit i of the mask meaning facilities[i].
+    """
+
+    def __init__(self, districts: List[str], facilities: List[str], district_codes: np.ndarray,
+                 lat: np.ndarray, lng: np.ndarray, capacity: np.ndarray, facility_masks: np.ndarray,
+                 text: Dict[str, TextColumn], version: Optional[str] = None):
+        # Version of the emergency data the store was built from
+        self.version = version
+        self.districts = districts
+        self.facilities = facilities
+        self.facility_bits = {facility: bit for bit, facility in enumerate(facilities)}
+        self.district_codes = district_codes
+        self.lat = lat
+        self.lng = lng
+        self.capacity = capacity
+        self.facility_masks = facility_masks
+        self.text = text
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any], version: Optional[str] = None) -> 'ShelterStore':
+        """Build the columns from the shelters section of the emergency data."""
+        districts: List[str] = []
+        # Vocabulary facilities keep the same bit in every store; others follow in order of appearance
+        facility_bits = {facility: bit for bit, facility in enumerate(FACILITY_VOCABULARY)}
+        rows = []
+        for district, shelters in data.get('shelters', {}).items():
+            districts.append(district)
+            for shelter in shelters:
+                rows.append((len(districts) - 1, shelter))
+                for facility in shelter.get('facilities') or []:
+                    facility_bits.setdefault(facility, len(facility_bits))
+
+        words = max(1, -(-len(facility_bits) // MASK_BITS))
+        district_codes = []
+        lats = []
+        lngs = []
+        capacities = []
+        masks = []
+        text_values: Dict[str, List[Optional[str]]] = {field: [] for field in TEXT_FIELDS + ('facilities',)}
+
+        # Collected as Python values and converted once; per-element NumPy writes are far slower
+        for code, shelter in rows:
+            district_codes.append(code)
+            coords = shelter.get('coordinates') or {}
+            if coords.get('lat') is not None and coords.get('lng') is not None:
+                lats.append(float(coords['lat']))
+                lngs.append(float(coords['lng']))
+            else:
+                lats.append(math.nan)
+                lngs.append(math.nan)
+            capacity = shelter.get('capacity')
+            capacities.append(int(capacity) if capacity is not None else -1)
+            facilities = shelter.get('facilities')
+            mask = 0
+            for facility in facilities or []:
+                mask |= 1 << facility_bits[facility]
+            masks.append([(mask >> (word * MASK_BITS)) & MASK_WORD for word in range(words)])
+            for field in TEXT_FIELDS:
+                value = shelter.get(field)
+                text_values[field].append(str(value) if value is not None else None)
+            text_values['facilities'].append(FACILITY_SEPARATOR.join(facilities) if facilities is not None else None)
+
+        text = {field: TextColumn.from_values(values) for field, values in text_values.items()}
+        return cls(districts, list(facility_bits), np.array(district_codes, dtype=np.int16),
+                   np.array(lats, dtype=np.float64), np.array(lngs, dtype=np.float64),
+                   np.array(capacities, dtype=np.int32), np.array(masks, dtype=np.uint64).reshape(-1, words),
+                   text, version)
+
+    def save(self, path: str) -> None:
+        """Write the store as an uncompressed .npz file that load() reads back without the JSON."""
+        arrays = {
+            'format_version': np.array(STORE_FORMAT_VERSION),
+            'data_version': np.array(self.version or '', dtype=str),
+            'districts': np.array(self.districts, dtype=str),
+            'facilities': np.array(self.facilities, dtype=str),
+            'district_codes': self.district_codes,
+            'lat': self.lat,
+            'lng': self.lng,
+            'capacity': self.capacity,
+            'facility_masks': self.facility_masks,
+        }
+        for field, column in self.text.items():
+            arrays[f'text_{field}_buffer'] = np.frombuffer(column.buffer, dtype=np.uint8)
+            arrays[f'text_{field}_offsets'] = column.offsets
+            arrays[f'text_{field}_missing'] = column.missing
+        with open(path, 'wb') as handle:
+            np.savez(handle, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'ShelterStore':
+        with np.load(path, allow_pickle=False) as arrays:
+            if int(arrays['format_version']) != STORE_FORMAT_VERSION:
+                raise ValueError(f"{path} has store format {int(arrays['format_version'])}, "
+                                 f"expected {STORE_FORMAT_VERSION}")
+            text = {
+                field: TextColumn(arrays[f'text_{field}_buffer'].tobytes(), arrays[f'text_{field}_offsets'],
+                                  arrays[f'text_{field}_missing'])
+                for field in TEXT_FIELDS + ('facilities',)
+            }
+            return cls(arrays['districts'].tolist(), arrays['facilities'].tolist(), arrays['district_codes'],
+                       arrays['lat'], arrays['lng'], arrays['capacity'], arrays['facility_masks'], text,
+                       str(arrays['data_version']) or None)
+
+    def __len__(self) -> int:
+        return len(self.district_codes)
+
+    def facility_mask(self, facilities: Iterable[str]) -> Optional[np.ndarray]:
+        """Mask words with the bits of all facilities set; None if no shelter can have one of them."""
+        query = np.zeros(self.facility_masks.shape[1], dtype=np.uint64)
+        for facility in facilities:
+            bit = self.facility_bits.get(facility)
+            if bit is None or bit // MASK_BITS >= len(query):
+                return None
+            query[bit // MASK_BITS] |= np.uint64(1 << (bit % MASK_BITS))
+        return query
+
+    def has_facilities(self, facilities: Iterable[str]) -> np.ndarray:
+        """Boolean column: True for shelters offering every one of facilities."""
+        query = self.facility_mask(facilities)
+        if query is None:
+            return np.zeros(len(self), dtype=bool)
+        return np.all((self.facility_masks & query) == query, axis=1)
+
+    def view(self, row: int) -> ShelterView:
+        return ShelterView(self, row)
+
+    def district(self, row: int) -> str:
+        return self.districts[self.district_codes[row]]
+
+    def rows_in_district(self, district: str) -> np.ndarray:
+        """Rows of a district's shelters, in data order."""
+        try:
+            code = self.districts.index(district)
+        except ValueError:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.district_codes == code)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.district_codes, self.lat, self.lng, self.capacity, self.facility_masks)
+        return sum(array.nbytes for array in arrays) + sum(column.nbytes for column in self.text.values())
+
+
+def load_shelter_store(data: Dict[str, Any], prebuilt_path: Optional[str] = None) -> ShelterStore:
+    """
+    The store for data, read from prebuilt_path if that file was built from the
+    same data version, otherwise built from the JSON.
+    """
+    version = None
+    if prebuilt_path and os.path.exists(prebuilt_path):
+        version = data_version(data)
+        try:
+            store = ShelterStore.load(prebuilt_path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring prebuilt shelter store %s: %s", prebuilt_path, e)
+        else:
+            if store.version == version:
+                return store
+            logger.warning("Prebuilt shelter store %s is for data version %s, not %s; building from JSON",
+                           prebuilt_path, store.version, version)
+    return ShelterStore.from_data(data, version)
@@ -7,7 +7,14 @@ from .buttons import (
 from .messages import (
     format_emergency_contacts,
     format_shelter_info,
+    format_nearest_shelters,
     get_emergency_emoji,
+    prerender_messages,
+)
+from .render_cache import (
+    RENDER_CACHE,
+    RenderCache,
+    cached_render,
 )
 
 __all__ = [
@@ -17,7 +24,12 @@ __all__ = [
     'get_shelter_menu_buttons',
     'format_emergency_contacts',
     'format_shelter_info',
+    'format_nearest_shelters',
     'get_emergency_emoji',
+    'prerender_messages',
+    'RENDER_CACHE',
+    'RenderCache',
+    'cached_render',
 ]
 
 
@@ -1,6 +1,8 @@
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from ..utils.constants import EMERGENCY_DATA
+from ..utils.constants import SHELTER_DATA, STANDARD_DISTRICTS, get_emergency_data
+from ..utils.data_snapshot import DataSnapshot
+from .render_cache import RENDER_CACHE, cached_render
 
 
 def get_emergency_emoji(emergency_type: Optional[str]) -> str:
@@ -12,8 +14,9 @@ def get_emergency_emoji(emergency_type: Optional[str]) -> str:
     return emoji_map.get(emergency_type, '⚠️')
 
 
+@cached_render
 def format_emergency_contacts() -> str:
-    contacts = EMERGENCY_DATA.get('emergency_contacts', {})
+    contacts = get_emergency_data().get('emergency_contacts', {})
     message = "**📞 EMERGENCY CONTACTS:**\n"
     message += f"🚨 Emergency Services: **{contacts.get('emergency', '112')}**\n"
     message += f"🚓 Police: **{contacts.get('police', '110')}**\n"
@@ -21,18 +24,93 @@ def format_emergency_contacts() -> str:
     return message
 
 
-def format_shelter_info(district: str, shelters: List[Dict]) -> str:
-    message = f"🏥 **EMERGENCY SHELTERS IN {district.upper()}:**\n\n"
+def _format_shelter_entry(index: int, shelter: Dict, distance_km: Optional[float] = None,
+                          district: Optional[str] = None) -> str:
+    return f"**{index}. " + _format_shelter_details(shelter, distance_km, district)
+
+
+def _format_shelter_details(shelter: Dict, distance_km: Optional[float] = None,
+                            district: Optional[str] = None) -> str:
+    """A shelter entry from its name on, i.e. everything but its position in the list."""
+    message = f"{shelter.get('name', 'Shelter')}**\n"
+    if distance_km is not None:
+        message += f"📏 {distance_km:.1f} km away"
+        if district:
+            message += f" ({district})"
+        message += "\n"
+    message += f"📍 {shelter.get('address', 'Address not available')}\n"
+    message += f"📞 {shelter.get('phone', 'N/A')}\n"
+    if shelter.get('capacity'):
+        message += f"👥 Capacity: {shelter['capacity']} people\n"
+    if shelter.get('facilities'):
+        message += f"🔧 Facilities: {', '.join(shelter['facilities'])}\n"
+    message += "\n"
+    return message
+
+
+def _format_facility_filter(facilities: Tuple[str, ...]) -> str:
+    if not facilities:
+        return ""
+    return f"🔎 With: {', '.join(facilities)}\n\n"
+
+
+def format_shelter_info(district: str, shelters: Optional[List[Dict]] = None,
+                        order: Optional[Tuple[int, ...]] = None, facilities: Tuple[str, ...] = (),
+                        snapshot: Optional[DataSnapshot] = None) -> str:
+    """
+    Shelter list for a district; without an explicit list the district's shelters are used and cached.
+    order lists the indices of the district's shelters in display order (default: as in the data),
+    in the snapshot they were ranked from (default: the latest one);
+    facilities names the filter the list was selected with.
+    """
+    if shelters is None:
+        return _format_district_shelters(district, order, tuple(facilities), snapshot or SHELTER_DATA.snapshot())
+    return _render_shelter_info(district, shelters, tuple(facilities))
+
+
+def _format_district_shelters(district: str, order: Optional[Tuple[int, ...]], facilities: Tuple[str, ...],
+                              snapshot: DataSnapshot) -> str:
+    # The order changes with occupancy, so entries are cached per shelter and only the joining is per request
+    count = len(snapshot.data.get('shelters', {}).get(district, []))
+    indices = range(count) if order is None else [i for i in order if i < count]
+    message = _format_shelter_info_header(district, facilities)
+    for position, index in enumerate(indices, 1):
+        message += f"**{position}. " + _format_district_shelter(district, index, snapshot)
+    return message + _format_shelter_info_footer()
+
+
+def _format_district_shelter(district: str, index: int, snapshot: DataSnapshot) -> str:
+    return RENDER_CACHE.get_or_render(
+        ('_format_district_shelter', district, index),
+        lambda: _format_shelter_details(snapshot.data['shelters'][district][index]), version=snapshot.version)
+
+
+def _format_shelter_info_header(district: str, facilities: Tuple[str, ...] = ()) -> str:
+    return f"🏥 **EMERGENCY SHELTERS IN {district.upper()}:**\n\n" + _format_facility_filter(facilities)
+
+
+def _format_shelter_info_footer() -> str:
+    return format_emergency_contacts() + "\n**Please head to the nearest shelter if it's safe to travel.**"
+
+
+def _render_shelter_info(district: str, shelters: List[Dict], facilities: Tuple[str, ...] = ()) -> str:
+    message = _format_shelter_info_header(district, facilities)
     
     for i, shelter in enumerate(shelters, 1):
-        message += f"**{i}. {shelter.get('name', 'Shelter')}**\n"
-        message += f"📍 {shelter.get('address', 'Address not available')}\n"
-        message += f"📞 {shelter.get('phone', 'N/A')}\n"
-        if shelter.get('capacity'):
-            message += f"👥 Capacity: {shelter['capacity']} people\n"
-        if shelter.get('facilities'):
-            message += f"🔧 Facilities: {', '.join(shelter['facilities'])}\n"
-        message += "\n"
+        message += _format_shelter_entry(i, shelter)
+    
+    message += _format_shelter_info_footer()
+    
+    return message
+
+
+def format_nearest_shelters(matches: List, facilities: Tuple[str, ...] = ()) -> str:
+    """Format ShelterMatch results (shelter, district, distance_km), nearest first."""
+    message = "🏥 **EMERGENCY SHELTERS NEAREST TO YOU:**\n\n"
+    message += _format_facility_filter(tuple(facilities))
+    
+    for i, match in enumerate(matches, 1):
+        message += _format_shelter_entry(i, match.shelter, match.distance_km, match.district)
     
     message += format_emergency_contacts()
     message += "\n**Please head to the nearest shelter if it's safe to travel.**"
@@ -40,8 +118,9 @@ def format_shelter_info(district: str, shelters: List[Dict]) -> str:
     return message
 
 
+@cached_render
 def format_safety_instructions(emergency_type: str, district: str = "your area") -> str:
-    instructions = EMERGENCY_DATA.get('safety_instructions', {}).get(emergency_type, {})
+    instructions = get_emergency_data().get('safety_instructions', {}).get(emergency_type, {})
     during = instructions.get('during', [])
     after = instructions.get('after', [])
     
@@ -62,8 +141,9 @@ def format_safety_instructions(emergency_type: str, district: str = "your area")
     return message
 
 
+@cached_render
 def format_earthquake_instructions_immediate() -> str:
-    instructions = EMERGENCY_DATA.get('safety_instructions', {}).get('earthquake', {})
+    instructions = get_emergency_data().get('safety_instructions', {}).get('earthquake', {})
     during = instructions.get('during', [])
     after = instructions.get('after', [])
     
@@ -95,3 +175,21 @@ def format_earthquake_instructions_immediate() -> str:
     
     return message
 
+
+def prerender_messages() -> None:
+    """Render every district x emergency type combination for the current data version."""
+    format_emergency_contacts()
+    format_earthquake_instructions_immediate()
+    data = get_emergency_data()
+    emergency_types = list(data.get('safety_instructions', {}).keys())
+    districts = list(dict.fromkeys(STANDARD_DISTRICTS + list(data.get('shelters', {}).keys())))
+    for district in districts:
+        format_shelter_info(district)
+        for emergency_type in emergency_types:
+            format_safety_instructions(emergency_type, district)
+    for emergency_type in emergency_types:
+        format_safety_instructions(emergency_type, "your area")
+
+
+RENDER_CACHE.add_prerender_hook(prerender_messages)
+RENDER_CACHE.refresh()
@@ -0,0 +1,74 @@
+"""
+Cache of rendered bot messages.
+Messages built only from their arguments and the static emergency data are
+rendered once per data version; a new version clears the cache and re-runs
+the registered pre-render hooks.
+"""
+
+import functools
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from ..utils.constants import get_data_version
+
+# Entries beyond this (e.g. free-form district strings) are rendered but not stored
+RENDER_CACHE_MAX_ENTRIES = 2048
+
+
+class RenderCache:
+
+    def __init__(self, version_func: Callable[[], str], max_entries: int = RENDER_CACHE_MAX_ENTRIES):
+        self.version_func = version_func
+        self.max_entries = max_entries
+        self.version = None
+        self._entries: Dict[Hashable, str] = {}
+        self._prerender_hooks: List[Callable[[], None]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add_prerender_hook(self, hook: Callable[[], None]) -> None:
+        self._prerender_hooks.append(hook)
+
+    def refresh(self) -> None:
+        """Drop entries from an older data version and pre-render the new one."""
+        version = self.version_func()
+        if version == self.version:
+            return
+        self.version = version
+        self._entries = {}
+        for hook in self._prerender_hooks:
+            hook()
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str], version: Optional[str] = None) -> str:
+        """Cached message for key; version is the data version render reads, if not the latest one."""
+        if self.version_func() != self.version:
+            self.refresh()
+        if version is not None and version != self.version:
+            # Rendered from a snapshot a reload has replaced since: never stored under the new version
+            self.misses += 1
+            return render()
+        message = self._entries.get(key)
+        if message is not None:
+            self.hits += 1
+            return message
+        self.misses += 1
+        message = render()
+        if len(self._entries) < self.max_entries:
+            self._entries[key] = message
+        return message
+
+
+RENDER_CACHE = RenderCache(get_data_version)
+
+
+def cached_render(func: Callable[..., str]) -> Callable[..., str]:
+    """Memoise a message renderer on its (hashable) arguments and the data version."""
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> str:
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        return RENDER_CACHE.get_or_render(key, lambda: func(*args, **kwargs))
+
+    return wrapper
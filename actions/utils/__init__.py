@@ -2,21 +2,81 @@ from .constants import (
     BERLIN_DISTRICTS,
     BERLIN_POSTCODES,
     EMERGENCY_DATA,
+    SHELTER_DATA,
     STANDARD_DISTRICTS,
+    get_data_version,
+    get_emergency_data,
     load_emergency_data,
 )
+from .data_snapshot import (
+    DataSnapshot,
+    SnapshotStore,
+)
+from .district_resolver import (
+    DISTRICT_RESOLVER,
+    DistrictMatch,
+    DistrictResolver,
+)
+from .district_matcher import (
+    DISTRICT_MATCHER,
+    DistrictMatcher,
+)
+from .postcodes import (
+    POSTCODE_TABLE,
+    PostcodeInfo,
+    PostcodeTable,
+    lookup_postcode,
+)
+from .phrase_matcher import (
+    PHRASE_MATCHER,
+    PhraseHit,
+    PhraseMatcher,
+    PhraseScan,
+)
+from .conversation_summary import (
+    ConversationSummary,
+    get_conversation_summary,
+)
 from .emergency_helpers import (
     get_emergency_type,
     fuzzy_match_district,
 )
+from .synthetic_tracker import (
+    location_request_events,
+    synthetic_events,
+    synthetic_tracker,
+)
 
 __all__ = [
     'BERLIN_DISTRICTS',
     'BERLIN_POSTCODES',
     'EMERGENCY_DATA',
+    'SHELTER_DATA',
     'STANDARD_DISTRICTS',
+    'get_data_version',
+    'get_emergency_data',
     'load_emergency_data',
+    'DataSnapshot',
+    'SnapshotStore',
+    'DISTRICT_RESOLVER',
+    'DistrictMatch',
+    'DistrictResolver',
+    'DISTRICT_MATCHER',
+    'DistrictMatcher',
+    'POSTCODE_TABLE',
+    'PostcodeInfo',
+    'PostcodeTable',
+    'lookup_postcode',
+    'PHRASE_MATCHER',
+    'PhraseHit',
+    'PhraseMatcher',
+    'PhraseScan',
+    'ConversationSummary',
+    'get_conversation_summary',
     'get_emergency_type',
     'fuzzy_match_district',
+    'location_request_events',
+    'synthetic_events',
+    'synthetic_tracker',
 ]
 
@@ -0,0 +1,70 @@
+"""
+Shared async resources for the action server.
+One pooled aiohttp session for outbound HTTP, and a bounded thread pool for
+CPU-bound helpers so they never stall the event loop.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import aiohttp
+
+from tracing import TRACER
+
+from .tracing_hooks import http_trace_config
+
+USER_AGENT = 'Berlin-Emergency-Chatbot/1.0'
+
+HTTP_POOL_SIZE = int(os.environ.get('ACTIONS_HTTP_POOL_SIZE', '100'))
+HTTP_TIMEOUT_SECONDS = 5.0
+CPU_POOL_SIZE = int(os.environ.get('ACTIONS_CPU_POOL_SIZE', '4'))
+
+_http_session: Optional[aiohttp.ClientSession] = None
+_http_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+_cpu_pool: Optional[ThreadPoolExecutor] = None
+_cpu_pool_pid: Optional[int] = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    """Pooled client session bound to the running event loop; created on first use."""
+    global _http_session, _http_session_loop
+    loop = asyncio.get_running_loop()
+    if _http_session is None or _http_session.closed or _http_session_loop is not loop:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS),
+            headers={'User-Agent': USER_AGENT},
+            trace_configs=[http_trace_config()] if TRACER.enabled else None,
+        )
+        _http_session_loop = loop
+    return _http_session
+
+
+async def close_http_session() -> None:
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+
+def get_cpu_pool() -> ThreadPoolExecutor:
+    """Bounded CPU pool of this process; created on first use."""
+    global _cpu_pool, _cpu_pool_pid
+    # Threads do not survive fork, and a pool copied from the parent would wait on its dead workers
+    if _cpu_pool is None or _cpu_pool_pid != os.getpid():
+        _cpu_pool = ThreadPoolExecutor(max_workers=CPU_POOL_SIZE, thread_name_prefix='actions-cpu')
+        _cpu_pool_pid = os.getpid()
+    return _cpu_pool
+
+
+async def run_cpu_bound(func: Callable[..., Any], *args: Any) -> Any:
+    """Run func(*args) on the bounded CPU pool and await its result."""
+    loop = asyncio.get_running_loop()
+    # Carry the context over, as asyncio.to_thread does, so metrics know which action run it belongs to
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_cpu_pool(), functools.partial(context.run, func, *args))
@@ -3,9 +3,13 @@ Constants for Berlin Crisis Response Chatbot.
 Contains district mappings, postcodes, and emergency data.
 """
 
+import hashlib
 import json
 import os
 
+from .data_snapshot import SnapshotStore
+from .postcodes import POSTCODE_TABLE
+
 # ============================================================================
 # DATA LOADING
 # ============================================================================
@@ -14,15 +18,59 @@ import os
 # Path: actions/utils/constants.py -> .. (to actions/) -> .. (to rasa-backend/) -> data/
 DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'berlin_shelters.json')
 
+def read_emergency_data(path: str = DATA_PATH) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 def load_emergency_data() -> dict:
     """Load emergency data from JSON file."""
     try:
-        with open(DATA_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_emergency_data()
     except FileNotFoundError:
         return {"shelters": {}, "emergency_contacts": {}, "safety_instructions": {}}
 
-EMERGENCY_DATA = load_emergency_data()
+def validate_emergency_data(data: dict) -> None:
+    """Raise ValueError unless data has the shape the actions rely on."""
+    if not isinstance(data, dict):
+        raise ValueError("top level must be an object")
+    for key in ('shelters', 'emergency_contacts', 'safety_instructions'):
+        if not isinstance(data.get(key), dict):
+            raise ValueError(f"'{key}' must be an object")
+    for district, shelters in data['shelters'].items():
+        if not isinstance(shelters, list):
+            raise ValueError(f"shelters for {district} must be a list")
+        for shelter in shelters:
+            if not isinstance(shelter, dict) or not shelter.get('name'):
+                raise ValueError(f"every shelter in {district} needs a name")
+            coords = shelter.get('coordinates')
+            if coords is not None:
+                try:
+                    float(coords['lat']), float(coords['lng'])
+                except (KeyError, TypeError, ValueError):
+                    raise ValueError(f"bad coordinates for {shelter['name']}")
+    for emergency_type, instructions in data['safety_instructions'].items():
+        if not isinstance(instructions, dict) or not all(
+                isinstance(instructions.get(part, []), list) for part in ('during', 'after')):
+            raise ValueError(f"safety instructions for {emergency_type} must list 'during' and 'after' steps")
+
+def data_version(data: dict) -> str:
+    """Short content hash of the emergency data; changes whenever the data does."""
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:12]
+
+# Hot-reloaded when data/berlin_shelters.json changes; read it through get_emergency_data()
+SHELTER_DATA = SnapshotStore(DATA_PATH, read_emergency_data, validate_emergency_data, data_version,
+                             initial=load_emergency_data())
+
+def get_emergency_data() -> dict:
+    """Shelter and emergency data from the latest published snapshot."""
+    return SHELTER_DATA.snapshot().data
+
+def get_data_version() -> str:
+    return SHELTER_DATA.snapshot().version
+
+# The data as loaded at startup; prefer get_emergency_data(), which follows reloads
+EMERGENCY_DATA = SHELTER_DATA.current.data
 
 # ============================================================================
 # BERLIN DISTRICT MAPPING
@@ -155,30 +203,8 @@ BERLIN_DISTRICTS = {
     'kopenick': 'Köpenick',
 }
 
-# Berlin postcode to district mapping
-BERLIN_POSTCODES = {
-    '10115': 'Mitte', '10117': 'Mitte', '10119': 'Mitte', '10178': 'Mitte', '10179': 'Mitte',
-    '10405': 'Prenzlauer Berg', '10435': 'Prenzlauer Berg', '10437': 'Prenzlauer Berg',
-    '10243': 'Friedrichshain', '10245': 'Friedrichshain', '10247': 'Friedrichshain',
-    '10961': 'Kreuzberg', '10963': 'Kreuzberg', '10965': 'Kreuzberg', '10967': 'Kreuzberg', '10969': 'Kreuzberg',
-    '10551': 'Charlottenburg', '10553': 'Charlottenburg', '10555': 'Charlottenburg', '10585': 'Charlottenburg',
-    '10623': 'Charlottenburg', '10625': 'Charlottenburg', '10627': 'Charlottenburg',
-    '10777': 'Schöneberg', '10779': 'Schöneberg', '10781': 'Schöneberg', '10783': 'Schöneberg',
-    '13347': 'Wedding', '13349': 'Wedding', '13351': 'Wedding', '13353': 'Wedding',
-    '13125': 'Pankow', '13127': 'Pankow', '13129': 'Pankow', '13156': 'Pankow',
-    '10315': 'Lichtenberg', '10317': 'Lichtenberg', '10318': 'Lichtenberg',
-    '12043': 'Neukölln', '12045': 'Neukölln', '12047': 'Neukölln', '12049': 'Neukölln',
-    '12157': 'Steglitz', '12159': 'Steglitz', '12161': 'Steglitz',
-    '12099': 'Tempelhof', '12101': 'Tempelhof', '12103': 'Tempelhof',
-    '13581': 'Spandau', '13583': 'Spandau', '13585': 'Spandau',
-    '12679': 'Marzahn', '12681': 'Marzahn', '12683': 'Marzahn',
-    '12435': 'Treptow', '12437': 'Treptow', '12439': 'Treptow',
-    '13403': 'Reinickendorf', '13405': 'Reinickendorf', '13407': 'Reinickendorf',
-    '12619': 'Hellersdorf', '12621': 'Hellersdorf', '12623': 'Hellersdorf',
-    '10707': 'Wilmersdorf', '10709': 'Wilmersdorf', '10711': 'Wilmersdorf',
-    '14163': 'Zehlendorf', '14165': 'Zehlendorf', '14167': 'Zehlendorf',
-    '12555': 'Köpenick', '12557': 'Köpenick', '12559': 'Köpenick',
-}
+# Berlin postcode to primary district mapping, from the full table in data/berlin_postcodes.json
+BERLIN_POSTCODES = POSTCODE_TABLE.district_map()
 
 # Standard district names for validation
 STANDARD_DISTRICTS = [
@@ -189,3 +215,87 @@ STANDARD_DISTRICTS = [
     'Wilmersdorf', 'Zehlendorf', 'Köpenick'
 ]
 
+# Aliases that are also everyday words: inside a longer message ("the center of
+# the building", "at a wedding") they rarely mean the district, so the matcher
+# only takes them when they are the whole message
+WHOLE_MESSAGE_DISTRICT_ALIASES = {
+    'center', 'central', 'city centre', 'zentrum', 'downtown', 'kreuz', 'tempel', 'wedding', 'friedrich',
+}
+
+
+# ============================================================================
+# PHRASE SETS
+# ============================================================================
+
+# Phrase categories used by the status and location heuristics, compiled once
+# into PHRASE_MATCHER (see phrase_matcher.py). Matching is by substring except
+# for the whole-word categories listed in WHOLE_WORD_PHRASE_SETS.
+PHRASE_SETS = {
+    # Status replies that must not be taken as a location
+    'status_report': [
+        "i'm safe", 'i am safe', 'we are safe', 'everyone is safe', "i'm injured", 'i am injured',
+        "i'm trapped", 'i am trapped', "i'm okay", "i'm fine", "we're safe", 'not injured', 'not hurt',
+        'no injuries',
+    ],
+    # Whole-message acknowledgements
+    'acknowledgment': [
+        'ok', 'okay', 'got it', 'understood', 'i understand', 'alright', 'all right', 'fine', 'sure',
+        'yes', 'yeah',
+    ],
+    # Small talk that is not an answer to "where are you?"
+    'non_location': [
+        'help', 'what should i do', 'what do i do', 'i need help',
+        "i don't know", 'not sure', 'maybe', 'i think',
+        'how are you', 'are you there', 'hello', 'hi',
+        'thanks', 'thank you', 'appreciate it',
+    ],
+    # Bot texts that ask the user for their location
+    'location_request': [
+        'which area', 'which district', 'your location', 'where are you', 'berlin district', 'postcode',
+        'select your district', 'i need to know your location', 'i need your location to help emergency services',
+        'i need your location', 'please provide', 'or your postcode', 'berlin district (e.g.',
+    ],
+    # Status extraction
+    # "n't" is a suffix (see WORD_SUFFIX_PHRASES) and covers can't, isn't, couldn't, ...
+    'negation': [
+        'not', 'no', 'never', "n't", 'nobody', "nobody's", 'no one', "no one's", 'none',
+    ],
+    'safe': ['safe', 'fine', 'okay', 'ok', 'good', 'well', 'alright', "i'm all set"],
+    'injury': [
+        'injured', 'hurt', 'bleeding', 'wounded', 'broken', "i'm injured", 'i am injured', "i'm hurt",
+        'i am hurt', 'got hurt', 'got injured', 'in pain', 'have injuries', 'injuries',
+    ],
+    'trapped': [
+        'trapped', "i'm trapped", "we're trapped", 'i am trapped', 'we are trapped', 'stuck', "can't get out",
+    ],
+}
+
+WHOLE_WORD_PHRASE_SETS = {'negation'}
+
+# Whole-word phrases that may also end a longer word ("n't" in "couldn't")
+WORD_SUFFIX_PHRASES = {"n't"}
+
+
+# ============================================================================
+# FACILITIES
+# ============================================================================
+
+# Facility vocabulary: canonical name (as spelled in berlin_shelters.json) -> what
+# users call it. The order fixes each facility's bit in the shelter store's masks;
+# append new facilities at the end. Phrases are matched as whole words.
+FACILITY_VOCABULARY = {
+    'Medical Care': ['medical care', 'medical', 'doctor', 'doctors', 'medic', 'nurse', 'medicine', 'medication'],
+    'First Aid': ['first aid', 'first-aid'],
+    'Wheelchair Access': ['wheelchair access', 'wheelchair', 'wheelchair accessible', 'accessible',
+                          'barrier-free', 'barrier free', 'step-free', 'step free', 'disabled access'],
+    'Pet Shelter': ['pet shelter', 'pet', 'pets', 'dog', 'dogs', 'cat', 'cats', 'animals', 'pet friendly',
+                    'pet-friendly'],
+    'Food': ['food', 'meals', 'something to eat'],
+    'Water': ['drinking water', 'water supply'],
+    'Restrooms': ['restrooms', 'restroom', 'toilet', 'toilets', 'bathroom', 'bathrooms'],
+    'Blankets': ['blankets', 'blanket'],
+    'Charging Stations': ['charging stations', 'charging station', 'charging', 'charge my phone', 'phone charging'],
+    'Child Care': ['child care', 'childcare', 'kids', 'children', 'baby', 'babies'],
+    'Large Capacity': ['large capacity'],
+    'Historic Site': ['historic site'],
+}
@@ -0,0 +1,152 @@
+"""
+Incremental per-conversation summary of the tracker's event history.
+Actions read facts such as "was the location asked recently" from here instead
+of rescanning tracker.events; each summary is cached by sender_id and only the
+events added since the previous turn are folded in.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from rasa_sdk import Tracker
+
+from .phrase_matcher import PHRASE_MATCHER
+
+LOCATION_REQUEST_ACTIONS = ('utter_ask_location', 'utter_ask_location_critical')
+
+REPORT_INTENTS = {
+    'report_earthquake': 'earthquake',
+    'report_flood': 'flood',
+    'report_fire': 'fire',
+}
+EMERGENCY_TYPES = ('earthquake', 'flood', 'fire')
+
+# How far back (in events) each fact used to be looked up
+LOCATION_ASKED_WINDOW = 25
+LOCATION_VALIDATED_WINDOW = 10
+EMERGENCY_REPORT_WINDOW = 10
+SHELTER_REQUEST_WINDOW = 5
+
+SUMMARY_CACHE_MAX_ENTRIES = 10000
+
+
+def _event_key(event: Dict[str, Any]) -> Tuple[Any, Any, Any]:
+    return event.get('event'), event.get('timestamp'), event.get('name') or event.get('text')
+
+
+class ConversationSummary:
+    """
+    Facts derived from a conversation's events.
+
+    Windowed facts store the position of the newest matching event, so "within
+    the last n events" is a comparison against the event count.
+    """
+
+    __slots__ = ('event_count', 'last_event_key', 'location_asked_at', 'location_validated_at',
+                 'emergency_type', 'emergency_report', 'emergency_report_at', 'shelter_request_at')
+
+    def __init__(self):
+        self.event_count = 0
+        self.last_event_key: Optional[Tuple[Any, Any, Any]] = None
+        self.location_asked_at = -1
+        self.location_validated_at = -1
+        # Newest emergency type from a report intent or an emergency_type entity
+        self.emergency_type: Optional[str] = None
+        # Newest report_* intent only, as used when resetting slots for a new emergency
+        self.emergency_report: Optional[str] = None
+        self.emergency_report_at = -1
+        self.shelter_request_at = -1
+
+    def _within(self, position: int, window: int) -> bool:
+        return position >= 0 and position >= self.event_count - window
+
+    def location_asked(self, window: int = LOCATION_ASKED_WINDOW) -> bool:
+        return self._within(self.location_asked_at, window)
+
+    def location_just_validated(self, window: int = LOCATION_VALIDATED_WINDOW) -> bool:
+        return self._within(self.location_validated_at, window)
+
+    def recent_emergency_report(self, window: int = EMERGENCY_REPORT_WINDOW) -> Optional[str]:
+        return self.emergency_report if self._within(self.emergency_report_at, window) else None
+
+    def shelter_request_handled(self, window: int = SHELTER_REQUEST_WINDOW) -> bool:
+        return self._within(self.shelter_request_at, window)
+
+    def update(self, events: List[Dict[str, Any]]) -> None:
+        """Fold in events[self.event_count:]."""
+        for position in range(self.event_count, len(events)):
+            self._apply(position, events[position])
+        self.event_count = len(events)
+        self.last_event_key = _event_key(events[-1]) if events else None
+
+    def _apply(self, position: int, event: Dict[str, Any]) -> None:
+        event_type = event.get('event')
+        if event_type == 'action':
+            name = event.get('name', '')
+            if name in LOCATION_REQUEST_ACTIONS:
+                self.location_asked_at = position
+            elif name == 'action_handle_shelter_request':
+                self.shelter_request_at = position
+        elif event_type == 'bot':
+            text = (event.get('text') or '').lower()
+            if PHRASE_MATCHER.scan(text).has('location_request'):
+                self.location_asked_at = position
+            if 'location confirmed' in text:
+                self.location_validated_at = position
+        elif event_type == 'slot':
+            if event.get('name') == 'location_validated' and event.get('value') is True:
+                self.location_validated_at = position
+        elif event_type == 'user':
+            parse_data = event.get('parse_data') or {}
+            intent = (parse_data.get('intent') or {}).get('name', '')
+            if intent in REPORT_INTENTS:
+                self.emergency_type = REPORT_INTENTS[intent]
+                self.emergency_report = REPORT_INTENTS[intent]
+                self.emergency_report_at = position
+                return
+            for entity in parse_data.get('entities', []):
+                if entity.get('entity') == 'emergency_type':
+                    value = (entity.get('value') or '').lower()
+                    if value in EMERGENCY_TYPES:
+                        self.emergency_type = value
+                        break
+
+
+class ConversationSummaryCache:
+    """LRU of summaries keyed by sender_id; each turn only processes the new events."""
+
+    def __init__(self, max_entries: int = SUMMARY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._summaries: 'OrderedDict[str, ConversationSummary]' = OrderedDict()
+
+    def get(self, tracker: Tracker) -> ConversationSummary:
+        events = tracker.events or []
+        summary = self._summaries.get(tracker.sender_id)
+        if summary is not None:
+            self._summaries.move_to_end(tracker.sender_id)
+            if summary.event_count == len(events) and summary.last_event_key == (
+                    _event_key(events[-1]) if events else None):
+                return summary
+            # The history must still start with what was summarised, otherwise start over
+            if (summary.event_count > len(events)
+                    or (summary.event_count and _event_key(events[summary.event_count - 1]) != summary.last_event_key)):
+                summary = None
+
+        if summary is None:
+            summary = ConversationSummary()
+            self._summaries[tracker.sender_id] = summary
+            while len(self._summaries) > self.max_entries:
+                self._summaries.popitem(last=False)
+
+        summary.update(events)
+        return summary
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+
+SUMMARY_CACHE = ConversationSummaryCache()
+
+
+def get_conversation_summary(tracker: Tracker) -> ConversationSummary:
+    return SUMMARY_CACHE.get(tracker)
@@ -0,0 +1,109 @@
+"""
+Versioned, hot-reloadable snapshots of a JSON data file.
+A background thread polls the file's mtime; new versions are parsed, validated
+and their derived structures (e.g. the shelter spatial index) built off the
+request path, then published with a single reference assignment. Readers take
+no lock and always see one complete snapshot.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = float(os.environ.get('ACTIONS_DATA_POLL_SECONDS', '5'))
+
+
+class DataSnapshot(NamedTuple):
+    data: Dict[str, Any]
+    version: str
+    loaded_at: float
+    # Structures built from data, keyed by the name they were registered under
+    derived: Dict[str, Any]
+
+
+class SnapshotStore:
+
+    def __init__(self, path: str, parse: Callable[[str], Dict[str, Any]],
+                 validate: Callable[[Dict[str, Any]], None], version: Callable[[Dict[str, Any]], str],
+                 initial: Dict[str, Any], poll_interval: float = POLL_INTERVAL_SECONDS):
+        self.path = path
+        self.parse = parse
+        self.validate = validate
+        self.version = version
+        self.poll_interval = poll_interval
+        self._derivers: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self._signature = self._file_signature()
+        self._watcher_pid: Optional[int] = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error: Optional[str] = None
+        self.current = DataSnapshot(initial, version(initial), time.time(), {})
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def derive(self, name: str, builder: Callable[[Dict[str, Any]], Any]) -> None:
+        """Build name from every snapshot's data; applied to the current snapshot immediately."""
+        self._derivers[name] = builder
+        self.current.derived[name] = builder(self.current.data)
+
+    def snapshot(self) -> DataSnapshot:
+        """The latest published snapshot. Starts the file watcher in this process on first use."""
+        if self._watcher_pid != os.getpid() and self.poll_interval > 0:
+            self._start_watcher()
+        return self.current
+
+    def _start_watcher(self) -> None:
+        # Threads do not survive fork, so each worker process starts its own watcher
+        self._watcher_pid = os.getpid()
+        thread = threading.Thread(target=self._watch, name='data-snapshot-watcher', daemon=True)
+        thread.start()
+
+    def _watch(self) -> None:
+        while True:
+            time.sleep(self.poll_interval)
+            self.reload_if_changed()
+
+    def reload_if_changed(self) -> bool:
+        """Publish a new snapshot if the file changed and the new contents are valid."""
+        signature = self._file_signature()
+        if signature is None or signature == self._signature:
+            return False
+        try:
+            data = self.parse(self.path)
+            self.validate(data)
+            version = self.version(data)
+            if version == self.current.version:
+                self._signature = signature
+                return False
+            derived = {name: builder(data) for name, builder in self._derivers.items()}
+        except Exception as e:
+            # Keep serving the previous snapshot; retry when the file changes again
+            self._signature = signature
+            self.reload_errors += 1
+            self.last_error = str(e)
+            logger.warning("Ignoring invalid update of %s: %s", self.path, e)
+            return False
+
+        self._signature = signature
+        self.current = DataSnapshot(data, version, time.time(), derived)
+        self.reloads += 1
+        logger.info("Loaded %s version %s", self.path, version)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'version': self.current.version,
+            'loaded_at': self.current.loaded_at,
+            'reloads': self.reloads,
+            'reload_errors': self.reload_errors,
+            'last_error': self.last_error,
+        }
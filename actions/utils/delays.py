@@ -1,22 +1,42 @@
-import time
+"""
+Message pacing.
+Pauses between bot messages are presentation only, so the action server never
+waits them out: it dispatches a pacing hint as a custom message and the client
+holds the following message back for that long behind its typing indicator.
+pause() is the non-blocking fallback for the rare case where the server itself
+has to wait.
+"""
 
+import asyncio
+from typing import Any, Dict
 
-def add_message_delay(seconds: float = 0.8) -> None:
-    time.sleep(seconds)
+from rasa_sdk.executor import CollectingDispatcher
 
+PACING_KEY = 'pace'
 
-def add_short_delay(seconds: float = 0.5) -> None:
-    time.sleep(seconds)
+SHORT_DELAY_SECONDS = 0.5
+MESSAGE_DELAY_SECONDS = 0.8
+# After long messages such as shelter lists and safety instructions, so they can be read first
+LONG_DELAY_SECONDS = 1.2
 
 
-def add_long_delay(seconds: float = 1.2) -> None:
-    time.sleep(seconds)
-
+def pacing_hint(seconds: float) -> Dict[str, Any]:
+    """Custom payload asking the client to wait before showing the next message."""
+    return {PACING_KEY: {'delay_ms': int(round(seconds * 1000)), 'typing': True}}
 
 
+def add_message_delay(dispatcher: CollectingDispatcher, seconds: float = MESSAGE_DELAY_SECONDS) -> None:
+    dispatcher.utter_message(json_message=pacing_hint(seconds))
 
 
+def add_short_delay(dispatcher: CollectingDispatcher, seconds: float = SHORT_DELAY_SECONDS) -> None:
+    add_message_delay(dispatcher, seconds)
 
 
+def add_long_delay(dispatcher: CollectingDispatcher, seconds: float = LONG_DELAY_SECONDS) -> None:
+    add_message_delay(dispatcher, seconds)
 
 
+async def pause(seconds: float) -> None:
+    """Wait on the server without holding up other conversations."""
+    await asyncio.sleep(seconds)
@@ -0,0 +1,174 @@
+"""
+Precompiled fuzzy matcher for Berlin district names.
+Candidates come from a character-trigram inverted index over every alias in
+BERLIN_DISTRICTS; they are scored with a bounded Levenshtein distance, and
+long messages are scanned with a sliding token window. Inside a window, only
+a full district name scores 1.0, and everyday words or very short aliases do
+not count at all.
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .constants import BERLIN_DISTRICTS, STANDARD_DISTRICTS, WHOLE_MESSAGE_DISTRICT_ALIASES
+
+# Longest window (in tokens) tried against the aliases; no alias has more words
+MAX_WINDOW_TOKENS = 3
+
+# Tokens shorter than this only count on an exact alias match
+MIN_FUZZY_LENGTH = 4
+
+# Aliases shorter than this ("wed", "hain", "marz") only count as the whole message,
+# and shorter windows of a longer message are not fuzzy-matched
+MIN_WINDOW_ALIAS_LENGTH = 5
+
+# Confidence of an exact alias hit inside a longer message, unless the alias is a full district name:
+# above the 0.8 at which callers accept a district without asking back
+WINDOW_ALIAS_CONFIDENCE = 0.9
+
+TOKEN_PATTERN = re.compile(r"[^\w\-]+", re.UNICODE)
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> int:
+    """Edit distance between a and b, or max_distance + 1 once it is known to be larger."""
+    limit = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return limit
+    if len(a) > len(b):
+        a, b = b, a
+
+    # Only the diagonal band |i - j| <= max_distance can hold distances within the bound
+    size = len(a)
+    previous = [i if i <= max_distance else limit for i in range(size + 1)]
+    for j, char_b in enumerate(b, 1):
+        current = [limit] * (size + 1)
+        current[0] = j if j <= max_distance else limit
+        row_min = current[0]
+        for i in range(max(1, j - max_distance), min(size, j + max_distance) + 1):
+            cost = previous[i - 1] + (a[i - 1] != char_b)
+            if previous[i] + 1 < cost:
+                cost = previous[i] + 1
+            if current[i - 1] + 1 < cost:
+                cost = current[i - 1] + 1
+            current[i] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return limit
+        previous = current
+    return min(previous[size], limit)
+
+
+class DistrictMatcher:
+    """Trigram-indexed alias matcher with the fuzzy_match_district contract."""
+
+    def __init__(self, aliases: Dict[str, str], standard_districts: Iterable[str],
+                 whole_message_aliases: Iterable[str] = ()):
+        self.aliases: Dict[str, str] = {}
+        for alias, district in aliases.items():
+            self.aliases[alias.lower()] = district
+        for district in standard_districts:
+            self.aliases.setdefault(district.lower(), district)
+        self.names = {district.lower() for district in self.aliases.values()}
+        self.whole_message_only = {alias.lower() for alias in whole_message_aliases}
+        self.whole_message_only.update(alias for alias in self.aliases if len(alias) < MIN_WINDOW_ALIAS_LENGTH)
+
+        self.alias_list = list(self.aliases.keys())
+        self.alias_grams = [_trigrams(alias) for alias in self.alias_list]
+        self.index: Dict[str, List[int]] = defaultdict(list)
+        for alias_id, grams in enumerate(self.alias_grams):
+            for gram in grams:
+                self.index[gram].append(alias_id)
+
+    def _score(self, text: str, threshold: float, whole_message: bool = True) -> List[Tuple[float, str]]:
+        """(similarity, district) for every alias at or above threshold; windows skip the whole-message aliases."""
+        if text in self.aliases and (whole_message or text not in self.whole_message_only):
+            return [(1.0, self.aliases[text])]
+        if len(text) < (MIN_FUZZY_LENGTH if whole_message else MIN_WINDOW_ALIAS_LENGTH):
+            return []
+
+        grams = _trigrams(text)
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for alias_id in self.index.get(gram, ()):
+                shared[alias_id] += 1
+
+        results = []
+        for alias_id, count in shared.items():
+            alias = self.alias_list[alias_id]
+            if not whole_message and alias in self.whole_message_only:
+                continue
+            longest = max(len(alias), len(text))
+            max_distance = int((1.0 - threshold) * longest)
+            # q-gram lemma: each edit destroys at most 3 trigrams
+            if count < max(len(grams), len(self.alias_grams[alias_id])) - 3 * max_distance:
+                continue
+            distance = bounded_levenshtein(text, alias, max_distance)
+            if distance <= max_distance:
+                results.append((1.0 - distance / longest, self.aliases[alias]))
+        return results
+
+    def _windows(self, text: str) -> List[str]:
+        tokens = [token for token in TOKEN_PATTERN.split(text) if token]
+        windows = []
+        # The whole message only needs scoring when it is short enough to be an alias
+        # and differs from the joined tokens (e.g. trailing punctuation)
+        if len(tokens) <= MAX_WINDOW_TOKENS and " ".join(tokens) != text:
+            windows.append(text)
+        for size in range(1, min(MAX_WINDOW_TOKENS, len(tokens)) + 1):
+            for start in range(len(tokens) - size + 1):
+                windows.append(" ".join(tokens[start:start + size]))
+        # Compound names such as "tempelhof-schöneberg" also try each part
+        for token in tokens:
+            if '-' in token:
+                windows.extend(part for part in token.split('-') if part)
+        return windows
+
+    def match(self, input_text: str, threshold: float = 0.7) -> Tuple[Optional[str], float, List[str]]:
+        input_lower = input_text.lower().strip()
+        if input_lower in self.aliases:
+            return self.aliases[input_lower], 1.0, []
+
+        # The message without its punctuation still counts as the whole message
+        whole = " ".join(token for token in TOKEN_PATTERN.split(input_lower) if token)
+        if whole in self.aliases:
+            return self.aliases[whole], 1.0, []
+
+        windows = [(window, window in (input_lower, whole)) for window in self._windows(input_lower)]
+
+        # Exact alias hits cannot be beaten by fuzzy scores, so check them first; full names rank first
+        exact = []
+        for window, whole_message in windows:
+            district = self.aliases.get(window)
+            if district and (whole_message or window not in self.whole_message_only):
+                exact.append((1.0 if window in self.names else WINDOW_ALIAS_CONFIDENCE, district))
+        if exact:
+            confidence = max(score for score, _ in exact)
+            suggestions = []
+            for score, district in sorted(exact, key=lambda hit: -hit[0]):
+                if district not in suggestions:
+                    suggestions.append(district)
+            return suggestions[0], confidence, suggestions
+
+        best_match = None
+        best_score = 0.0
+        suggestions: List[str] = []
+        for window, whole_message in windows:
+            for score, district in self._score(window, threshold, whole_message):
+                if score > best_score:
+                    best_score = score
+                    best_match = district
+                    suggestions = [district]
+                elif score == best_score and district not in suggestions:
+                    suggestions.append(district)
+
+        return best_match, best_score, suggestions
+
+
+DISTRICT_MATCHER = DistrictMatcher(BERLIN_DISTRICTS, STANDARD_DISTRICTS, WHOLE_MESSAGE_DISTRICT_ALIASES)
@@ -0,0 +1,330 @@
+"""
+Offline reverse geocoding for Berlin districts.
+Resolves GPS coordinates to a STANDARD_DISTRICTS name using the bundled
+boundary polygons in data/berlin_districts.json, without any network call.
+
+Points closer than border_margin_m to a border between two districts, or to
+the city outline, come back with near_border set, so callers can confirm them
+with the geocoder instead of trusting the polygons. The margin follows the
+boundaries' accuracy recorded in the file (boundary_accuracy_m), but is never
+below GPS accuracy: a few tens of metres with official boundaries (see
+scripts/build_district_boundaries.py --boundaries), so the offline answer is
+final almost everywhere, and a kilometre or two with the Voronoi
+approximation the script builds without them.
+"""
+
+import json
+import math
+import os
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Path: actions/utils/district_resolver.py -> .. (to actions/) -> .. (to project root) -> data/
+BOUNDARIES_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'berlin_districts.json')
+
+# Grid resolution of the spatial index (cells per axis)
+GRID_SIZE = 48
+# Horizontal strips per grid row for the polygon edge index used by point-in-polygon tests
+STRIPS_PER_ROW = 8
+
+# Points this close (in degrees) to the bounding box of the simplified outline
+# are treated as "near Berlin" and may still be inside the real city limits
+BORDER_MARGIN = 0.02
+
+# Longitude degrees are shorter than latitude degrees at Berlin's latitude (cos 52.5°)
+LNG_SCALE = 0.61
+
+# A phone's position is rarely better than this, whatever the boundaries' accuracy
+GPS_ACCURACY_METRES = 25.0
+# Overrides the margin derived from the boundaries file
+BORDER_MARGIN_OVERRIDE = os.environ.get('DISTRICT_BORDER_MARGIN_M')
+METRES_PER_DEGREE = 111320.0
+# Distance either side of an edge's midpoint used to tell which district lies beyond it
+EDGE_PROBE_METRES = 5.0
+
+Point = Tuple[float, float]
+
+
+class DistrictMatch(NamedTuple):
+    district: Optional[str]
+    inside_berlin: bool
+    # Within the border margin of another district or of the city outline: the answer is a hint
+    near_border: bool = False
+
+
+def point_in_polygon(lat: float, lng: float, polygon: Sequence[Point]) -> bool:
+    """Ray casting test; polygon is a list of (lat, lng) vertices."""
+    return _ray_crossings_odd(lat, lng, zip(polygon, polygon[-1:] + polygon[:-1]))
+
+
+def _ray_crossings_odd(lat: float, lng: float, edges) -> bool:
+    """True if a ray from the point towards increasing lng crosses an odd number of the (start, end) edges."""
+    inside = False
+    for (lat_i, lng_i), (lat_j, lng_j) in edges:
+        if (lat_i > lat) != (lat_j > lat):
+            crossing = lng_i + (lat - lat_i) * (lng_j - lng_i) / (lat_j - lat_i)
+            if lng < crossing:
+                inside = not inside
+    return inside
+
+
+def _segment_hits_box(start: Point, end: Point, box: Tuple[float, float, float, float]) -> bool:
+    """Liang-Barsky test: does the segment touch the (min_lat, min_lng, max_lat, max_lng) box?"""
+    min_lat, min_lng, max_lat, max_lng = box
+    lat0, lng0 = start
+    d_lat = end[0] - lat0
+    d_lng = end[1] - lng0
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-d_lat, lat0 - min_lat), (d_lat, max_lat - lat0),
+                 (-d_lng, lng0 - min_lng), (d_lng, max_lng - lng0)):
+        if p == 0:
+            if q < 0:
+                return False
+            continue
+        t = q / p
+        if p < 0:
+            t0 = max(t0, t)
+        else:
+            t1 = min(t1, t)
+        if t0 > t1:
+            return False
+    return True
+
+
+def _to_metres(lat: float, lng: float) -> Point:
+    return lng * METRES_PER_DEGREE * LNG_SCALE, lat * METRES_PER_DEGREE
+
+
+def _segment_distance(point: Point, start: Point, end: Point) -> float:
+    """Distance from point to the segment start-end, all in projected metres."""
+    x, y = point
+    x0, y0 = start
+    dx, dy = end[0] - x0, end[1] - y0
+    length = dx * dx + dy * dy
+    t = max(0.0, min(1.0, ((x - x0) * dx + (y - y0) * dy) / length)) if length else 0.0
+    return math.hypot(x - x0 - t * dx, y - y0 - t * dy)
+
+
+class DistrictResolver:
+    """
+    Point-in-polygon district lookup backed by a uniform grid index.
+
+    Each district may consist of several polygons. Grid cells that lie
+    entirely inside one polygon store it directly; only cells crossed by a
+    boundary fall back to polygon tests against the few polygons overlapping them.
+    Those tests only look at the polygon's edges in a thin horizontal strip
+    around the point, which keeps them cheap with detailed official boundaries.
+    """
+
+    def __init__(self, districts: Dict[str, List[List[Point]]], outline: Optional[List[Point]] = None,
+                 grid_size: int = GRID_SIZE, border_margin_m: float = GPS_ACCURACY_METRES):
+        # Flatten multi-part districts: polygon i belongs to district self.names[i]
+        self.names = []
+        self.polygons = []
+        for name, parts in districts.items():
+            for part in parts:
+                self.names.append(name)
+                self.polygons.append([(float(lat), float(lng)) for lat, lng in part])
+        self.outline = [(float(lat), float(lng)) for lat, lng in outline] if outline else None
+        self.grid_size = grid_size
+
+        all_points = [point for polygon in self.polygons for point in polygon]
+        self.min_lat = min(p[0] for p in all_points)
+        self.max_lat = max(p[0] for p in all_points)
+        self.min_lng = min(p[1] for p in all_points)
+        self.max_lng = max(p[1] for p in all_points)
+        self.cell_lat = (self.max_lat - self.min_lat) / grid_size
+        self.cell_lng = (self.max_lng - self.min_lng) / grid_size
+
+        self.centroids = [
+            (sum(p[0] for p in polygon) / len(polygon), sum(p[1] for p in polygon) / len(polygon))
+            for polygon in self.polygons
+        ]
+        self.strip_lat = self.cell_lat / STRIPS_PER_ROW
+        self.strip_edges = self._build_strip_edges()
+        self.grid = self._build_grid()
+        self.border_margin_m = border_margin_m
+        self.border_grid = self._build_border_grid()
+
+    @classmethod
+    def from_file(cls, path: str = BOUNDARIES_PATH) -> 'DistrictResolver':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if BORDER_MARGIN_OVERRIDE:
+            border_margin_m = float(BORDER_MARGIN_OVERRIDE)
+        else:
+            accuracy = float(data.get('metadata', {}).get('boundary_accuracy_m', 0))
+            border_margin_m = max(accuracy, GPS_ACCURACY_METRES)
+        return cls(data['districts'], data.get('outline'), border_margin_m=border_margin_m)
+
+    def _cell_range(self, low: float, high: float, origin: float, step: float) -> range:
+        """Grid rows (or columns) overlapped by the interval [low, high] on one axis."""
+        return range(max(0, int((low - origin) / step)), min(self.grid_size, int((high - origin) / step) + 1))
+
+    def _build_strip_edges(self) -> List[List[Tuple[Tuple[Point, Point], ...]]]:
+        """Per polygon, per strip, the edges whose latitude span overlaps the strip."""
+        strip_count = self.grid_size * STRIPS_PER_ROW
+        strip_edges = []
+        for polygon in self.polygons:
+            strips: List[List[Tuple[Point, Point]]] = [[] for _ in range(strip_count)]
+            for start, end in zip(polygon, polygon[-1:] + polygon[:-1]):
+                first = max(0, int((min(start[0], end[0]) - self.min_lat) / self.strip_lat))
+                last = min(strip_count - 1, int((max(start[0], end[0]) - self.min_lat) / self.strip_lat))
+                for strip in range(first, last + 1):
+                    strips[strip].append((start, end))
+            strip_edges.append([tuple(edges) for edges in strips])
+        return strip_edges
+
+    def _contains(self, index: int, lat: float, lng: float) -> bool:
+        """point_in_polygon for polygon index, for a point inside the grid: only edges crossing the point's strip can cross its ray."""
+        strip = min(int((lat - self.min_lat) / self.strip_lat), self.grid_size * STRIPS_PER_ROW - 1)
+        return _ray_crossings_odd(lat, lng, self.strip_edges[index][strip])
+
+    def _build_grid(self) -> List:
+        boxes = []
+        for polygon in self.polygons:
+            boxes.append((min(p[0] for p in polygon), min(p[1] for p in polygon),
+                          max(p[0] for p in polygon), max(p[1] for p in polygon)))
+
+        # Cells a polygon edge passes through; each edge only visits the cells its own box overlaps
+        crossed = set()
+        for polygon in self.polygons:
+            for start, end in zip(polygon, polygon[1:] + polygon[:1]):
+                for row in self._cell_range(min(start[0], end[0]), max(start[0], end[0]), self.min_lat, self.cell_lat):
+                    for col in self._cell_range(min(start[1], end[1]), max(start[1], end[1]),
+                                                self.min_lng, self.cell_lng):
+                        if row * self.grid_size + col not in crossed and _segment_hits_box(start, end, self._cell_box(row, col)):
+                            crossed.add(row * self.grid_size + col)
+
+        grid = []
+        for row in range(self.grid_size):
+            for col in range(self.grid_size):
+                cell = self._cell_box(row, col)
+                candidates = [index for index, box in enumerate(boxes)
+                              if not (box[0] > cell[2] or box[2] < cell[0] or box[1] > cell[3] or box[3] < cell[1])]
+                if row * self.grid_size + col not in crossed:
+                    # No boundary inside the cell: it is wholly inside one district or wholly outside
+                    centre_lat = (cell[0] + cell[2]) / 2
+                    centre_lng = (cell[1] + cell[3]) / 2
+                    owner = next((i for i in candidates
+                                  if self._contains(i, centre_lat, centre_lng)), None)
+                    grid.append(owner)
+                else:
+                    grid.append(tuple(candidates))
+        return grid
+
+    def _cell_box(self, row: int, col: int) -> Tuple[float, float, float, float]:
+        return (self.min_lat + row * self.cell_lat, self.min_lng + col * self.cell_lng,
+                self.min_lat + (row + 1) * self.cell_lat, self.min_lng + (col + 1) * self.cell_lng)
+
+    def _border_edges(self) -> List[Tuple[Point, Point]]:
+        """Polygon edges with another district or the outside beyond them, skipping edges between cells of one district."""
+        edges = []
+        probe_lat = EDGE_PROBE_METRES / METRES_PER_DEGREE
+        probe_lng = probe_lat / LNG_SCALE
+        for name, polygon in zip(self.names, self.polygons):
+            for start, end in zip(polygon, polygon[1:] + polygon[:1]):
+                mid_lat, mid_lng = (start[0] + end[0]) / 2, (start[1] + end[1]) / 2
+                d_lat, d_lng = end[0] - start[0], (end[1] - start[1]) * LNG_SCALE
+                length = math.hypot(d_lat, d_lng)
+                if not length:
+                    continue
+                # Unit normal in scaled degrees, so both probes sit EDGE_PROBE_METRES from the edge
+                n_lat, n_lng = -d_lng / length, d_lat / length
+                sides = [self._lookup(mid_lat + sign * n_lat * probe_lat, mid_lng + sign * n_lng * probe_lng)
+                         for sign in (1, -1)]
+                if any(side != name for side in sides):
+                    edges.append((start, end))
+        return edges
+
+    def _build_border_grid(self) -> List[Tuple[Tuple[Point, Point], ...]]:
+        """Per grid cell, the border edges within the margin of it, in projected metres."""
+        margin_lat = self.border_margin_m / METRES_PER_DEGREE
+        margin_lng = margin_lat / LNG_SCALE
+        cells: List[List[Tuple[Point, Point]]] = [[] for _ in range(self.grid_size * self.grid_size)]
+        for start, end in self._border_edges():
+            # Only the cells the edge's box, grown by the margin, overlaps
+            rows = self._cell_range(min(start[0], end[0]) - margin_lat, max(start[0], end[0]) + margin_lat,
+                                    self.min_lat, self.cell_lat)
+            cols = self._cell_range(min(start[1], end[1]) - margin_lng, max(start[1], end[1]) + margin_lng,
+                                    self.min_lng, self.cell_lng)
+            edge = (_to_metres(*start), _to_metres(*end))
+            for row in rows:
+                for col in cols:
+                    cells[row * self.grid_size + col].append(edge)
+        return [tuple(edges) for edges in cells]
+
+    def _cell_index(self, lat: float, lng: float) -> int:
+        row = int((lat - self.min_lat) / self.cell_lat)
+        col = int((lng - self.min_lng) / self.cell_lng)
+        if row == self.grid_size:
+            row -= 1
+        if col == self.grid_size:
+            col -= 1
+        return row * self.grid_size + col
+
+    def _cell(self, lat: float, lng: float):
+        return self.grid[self._cell_index(lat, lng)]
+
+    def _lookup(self, lat: float, lng: float) -> Optional[str]:
+        """District polygon containing the point, without the outline tie-break or the border check."""
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lng <= lng <= self.max_lng):
+            return None
+        cell = self._cell(lat, lng)
+        if cell is None:
+            return None
+        if isinstance(cell, int):
+            return self.names[cell]
+        return next((self.names[i] for i in cell if self._contains(i, lat, lng)), None)
+
+    def border_distance(self, lat: float, lng: float) -> Optional[float]:
+        """Metres to the nearest district border or city outline edge, or None if none is within the margin."""
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lng <= lng <= self.max_lng):
+            return None
+        point = _to_metres(lat, lng)
+        distances = [_segment_distance(point, start, end) for start, end in self.border_grid[self._cell_index(lat, lng)]]
+        nearest = min(distances, default=None)
+        return nearest if nearest is not None and nearest <= self.border_margin_m else None
+
+    def resolve(self, lat: float, lng: float) -> DistrictMatch:
+        """Return the district containing (lat, lng), whether the point is inside Berlin and whether it is near a border."""
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lng <= lng <= self.max_lng):
+            return DistrictMatch(None, False)
+
+        near_border = self.border_distance(lat, lng) is not None
+        cell = self._cell(lat, lng)
+        if cell is None:
+            return DistrictMatch(None, False, near_border)
+        if isinstance(cell, int):
+            return DistrictMatch(self.names[cell], True, near_border)
+
+        for index in cell:
+            if self._contains(index, lat, lng):
+                return DistrictMatch(self.names[index], True, near_border)
+
+        # Points exactly on a shared edge can miss every polygon; use the outline as tie-breaker
+        if cell and self.outline and point_in_polygon(lat, lng, self.outline):
+            return DistrictMatch(self.nearest_district(lat, lng, cell), True, True)
+        return DistrictMatch(None, False, near_border)
+
+    def nearest_district(self, lat: float, lng: float, candidates: Optional[Sequence[int]] = None) -> str:
+        """District whose polygon centroid is closest to (lat, lng)."""
+        indices = candidates if candidates else range(len(self.names))
+        best = min(indices, key=lambda i: (self.centroids[i][0] - lat) ** 2
+                   + ((self.centroids[i][1] - lng) * LNG_SCALE) ** 2)
+        return self.names[best]
+
+    def is_near_berlin(self, lat: float, lng: float, margin: float = BORDER_MARGIN) -> bool:
+        """True if the point is within the outline's bounding box plus a margin."""
+        return (self.min_lat - margin <= lat <= self.max_lat + margin
+                and self.min_lng - margin <= lng <= self.max_lng + margin)
+
+
+def load_district_resolver() -> Optional[DistrictResolver]:
+    """Load the resolver from the bundled boundaries file."""
+    try:
+        return DistrictResolver.from_file()
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+
+
+DISTRICT_RESOLVER = load_district_resolver()
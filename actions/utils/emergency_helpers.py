@@ -1,44 +1,34 @@
-from typing import Optional, Tuple, List
-from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Optional, Tuple
 
 from rasa_sdk import Tracker
 
-from .constants import BERLIN_DISTRICTS, BERLIN_POSTCODES, STANDARD_DISTRICTS
+from .concurrency import run_cpu_bound
+from .conversation_summary import get_conversation_summary
+from .district_matcher import DISTRICT_MATCHER
+from .metrics import timed
+from .postcodes import lookup_postcode
 
 
-def fuzzy_match_district(input_text: str, threshold: float = 0.7) -> Tuple[Optional[str], float, List[str]]:
+@lru_cache(maxsize=4096)
+def fuzzy_match_district(input_text: str, threshold: float = 0.7) -> Tuple[Optional[str], float, Tuple[str, ...]]:
+    # Results are shared by every caller through the cache, so suggestions are an immutable tuple
     input_lower = input_text.lower().strip()
 
-    if input_lower in BERLIN_DISTRICTS:
-        return BERLIN_DISTRICTS[input_lower], 1.0, []
-
-    for district in STANDARD_DISTRICTS:
-        if input_lower == district.lower():
-            return district, 1.0, []
-
     if input_lower.isdigit() and len(input_lower) == 5:
-        if input_lower in BERLIN_POSTCODES:
-            return BERLIN_POSTCODES[input_lower], 1.0, []
-
-    best_match = None
-    best_score = 0
-    suggestions = []
+        postcode_info = lookup_postcode(input_lower)
+        if postcode_info:
+            return postcode_info.district, 1.0, ()
 
-    for variation, district in BERLIN_DISTRICTS.items():
-        ratio_score = SequenceMatcher(None, input_lower, variation).ratio()
-        partial_score = SequenceMatcher(None, input_lower, variation).quick_ratio()
+    with timed('fuzzy_match'):
+        district, confidence, suggestions = DISTRICT_MATCHER.match(input_lower, threshold)
+    return district, confidence, tuple(suggestions)
 
-        score = max(ratio_score, partial_score)
 
-        if score >= threshold:
-            if score > best_score:
-                best_score = score
-                best_match = district
-                suggestions = [district]
-            elif score == best_score and district not in suggestions:
-                suggestions.append(district)
-
-    return best_match, best_score, suggestions
+async def fuzzy_match_district_async(input_text: str,
+                                     threshold: float = 0.7) -> Tuple[Optional[str], float, Tuple[str, ...]]:
+    """fuzzy_match_district on the CPU pool, for use inside async actions."""
+    return await run_cpu_bound(fuzzy_match_district, input_text, threshold)
 
 
 def get_emergency_type(tracker: Tracker) -> Optional[str]:
@@ -49,24 +39,5 @@ def get_emergency_type(tracker: Tracker) -> Optional[str]:
             return 'fire'
         return emergency_lower
 
-    for event in reversed(tracker.events):
-        if event.get('event') == 'user':
-            intent = event.get('parse_data', {}).get('intent', {}).get('name', '')
-            if intent == 'report_earthquake':
-                return 'earthquake'
-            elif intent == 'report_flood':
-                return 'flood'
-            elif intent == 'report_fire':
-                return 'fire'
-
-            entities = event.get('parse_data', {}).get('entities', [])
-            for entity in entities:
-                if entity.get('entity') == 'emergency_type':
-                    entity_value = entity.get('value', '').lower()
-                    if entity_value in ['fire', 'Fire']:
-                        return 'fire'
-                    elif entity_value in ['earthquake', 'flood', 'fire']:
-                        return entity_value
-
-    return None
+    return get_conversation_summary(tracker).emergency_type
 
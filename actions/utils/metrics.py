@@ -0,0 +1,260 @@
+"""
+In-process metrics of the action server, rendered in the Prometheus text format.
+instrument_action() times every run() and counts its outcome and the events it
+returns. Inside a run, record_outcome() labels what happened and
+record_exception() counts an exception the action handled itself; timed()
+measures sub-calls such as the Nominatim request. Warm-up runs are not
+recorded. Collectors added with
+METRICS.add_collector() export component stats at scrape time.
+"""
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .warmup import is_warmup
+
+# Seconds; from a cached render to a slow upstream call
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0)
+
+# (labels, value) samples of one metric family
+Samples = List[Tuple[Dict[str, str], float]]
+# name, type, help and samples, as returned by a collector
+Family = Tuple[str, str, str, Samples]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_format_labels(dict(zip(self.labelnames, labels)))} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (the last one is +Inf), sum]
+        self._children: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(labels)
+            if child is None:
+                child = self._children[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            child[0][index] += 1
+            child[1] += value
+
+    def count(self, labels: Tuple[str, ...] = ()) -> int:
+        child = self._children.get(labels)
+        return sum(child[0]) if child else 0
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            children = [(labels, list(counts), total) for labels, (counts, total) in self._children.items()]
+        for labels, counts, total in sorted(children):
+            label_dict = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                bucket_labels = dict(label_dict, le=_format_value(bound))
+                lines.append(f'{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(label_dict)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(label_dict)} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[Family]]] = []
+
+    def register(self, metric: Any) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], List[Family]]) -> None:
+        """collector() is called on every scrape and returns (name, type, help, samples) families."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.extend(f'{name}{_format_labels(labels)} {_format_value(value)}' for labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = MetricsRegistry()
+
+ACTION_SECONDS = METRICS.register(Histogram(
+    'action_run_seconds', 'Time spent in Action.run.', ('action',)))
+ACTION_RUNS = METRICS.register(Counter(
+    'action_runs_total', 'Action runs by outcome.', ('action', 'outcome')))
+ACTION_EXCEPTIONS = METRICS.register(Counter(
+    'action_exceptions_total', 'Exceptions raised out of actions or handled inside them.',
+    ('action', 'exception', 'handling')))
+ACTION_EVENTS = METRICS.register(Counter(
+    'action_events_total', 'Events returned by actions, by event type.', ('action', 'event')))
+SUBCALL_SECONDS = METRICS.register(Histogram(
+    'action_subcall_seconds', 'Time spent in instrumented calls made by actions.', ('call',)))
+
+
+class _RunRecord:
+    __slots__ = ('action', 'outcome', 'handled_exceptions', 'warmup')
+
+    def __init__(self, action: str, warmup: bool = False):
+        self.action = action
+        self.outcome: Optional[str] = None
+        self.handled_exceptions = 0
+        # Warm-up runs (see warmup.py) are not recorded, so metrics only describe user traffic
+        self.warmup = warmup
+
+
+_CURRENT_RUN: ContextVar[Optional[_RunRecord]] = ContextVar('current_action_run', default=None)
+
+
+def record_outcome(outcome: str) -> None:
+    """Label the current action run, e.g. 'validated' or 'retry'. The last label set wins."""
+    record = _CURRENT_RUN.get()
+    if record is not None:
+        record.outcome = outcome
+
+
+def record_exception(exception: BaseException) -> None:
+    """Count an exception that was caught and handled instead of propagating."""
+    record = _CURRENT_RUN.get()
+    action = record.action if record is not None else 'none'
+    if record is not None:
+        if record.warmup:
+            return
+        record.handled_exceptions += 1
+    ACTION_EXCEPTIONS.inc((action, type(exception).__name__, 'handled'))
+
+
+@contextmanager
+def timed(call: str) -> Iterator[None]:
+    """Observe the duration of the enclosed block as action_subcall_seconds{call=...}."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record = _CURRENT_RUN.get()
+        if record is None or not record.warmup:
+            SUBCALL_SECONDS.observe((call,), time.perf_counter() - started)
+
+
+def _default_outcome(record: _RunRecord, events: Optional[List[Dict[str, Any]]]) -> str:
+    if record.outcome:
+        return record.outcome
+    if record.handled_exceptions:
+        return 'handled_error'
+    return 'ok' if events else 'noop'
+
+
+def instrument_action(action_class: type) -> type:
+    """
+    Wrap action_class.run to record latency, outcome, exceptions and returned events,
+    except for warm-up runs. Idempotent.
+    """
+    original = action_class.run
+    if getattr(original, '_instrumented', False):
+        return action_class
+
+    @functools.wraps(original)
+    async def run(self, dispatcher, tracker, domain):
+        record = _RunRecord(self.name(), warmup=is_warmup(tracker))
+        token = _CURRENT_RUN.set(record)
+        started = time.perf_counter()
+        try:
+            events = original(self, dispatcher, tracker, domain)
+            if inspect.isawaitable(events):
+                events = await events
+        except Exception as e:
+            if record.warmup:
+                raise
+            ACTION_SECONDS.observe((record.action,), time.perf_counter() - started)
+            ACTION_EXCEPTIONS.inc((record.action, type(e).__name__, 'raised'))
+            ACTION_RUNS.inc((record.action, 'error'))
+            raise
+        finally:
+            _CURRENT_RUN.reset(token)
+        if record.warmup:
+            return events
+        ACTION_SECONDS.observe((record.action,), time.perf_counter() - started)
+        ACTION_RUNS.inc((record.action, _default_outcome(record, events)))
+        for event in events or []:
+            ACTION_EVENTS.inc((record.action, event.get('event', 'unknown') if isinstance(event, dict) else 'unknown'))
+        return events
+
+    run._instrumented = True
+    action_class.run = run
+    return action_class
+
+
+def stats_family(name: str, help_text: str, stats: Dict[str, Any], label: str = 'stat') -> Family:
+    """Gauge family from the numeric entries of a component's stats() dict."""
+    samples = [({label: key}, float(value)) for key, value in stats.items()
+               if isinstance(value, (int, float)) and not isinstance(value, bool)]
+    return name, 'gauge', help_text, samples
+
+
+def info_family(name: str, help_text: str, stats: Dict[str, Any]) -> Family:
+    """Info-style gauge: one sample of 1 labelled with the text entries of a component's stats() dict."""
+    labels = {key: '' if value is None else value for key, value in stats.items()
+              if value is None or isinstance(value, str)}
+    return name, 'gauge', help_text, [(labels, 1.0)]
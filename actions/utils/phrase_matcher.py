@@ -0,0 +1,139 @@
+"""
+Multi-pattern phrase matcher for the status and location heuristics.
+Every phrase in PHRASE_SETS is compiled into one Aho-Corasick automaton, so a
+single pass over a message finds every category hit with its position.
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from .constants import PHRASE_SETS, WHOLE_WORD_PHRASE_SETS, WORD_SUFFIX_PHRASES
+
+# A negation only applies to a phrase at most this many words after it, within the same clause
+NEGATION_SCOPE_WORDS = 3
+CLAUSE_BREAKS = set(',.;:!?')
+
+
+class PhraseHit(NamedTuple):
+    category: str
+    phrase: str
+    start: int
+    end: int
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "'"
+
+
+class PhraseScan:
+    """All phrase hits in one message."""
+
+    def __init__(self, text: str, hits: List[PhraseHit]):
+        self.text = text
+        self.hits = hits
+        self._by_category: Dict[str, List[PhraseHit]] = {}
+        for hit in hits:
+            self._by_category.setdefault(hit.category, []).append(hit)
+
+    def has(self, category: str) -> bool:
+        return category in self._by_category
+
+    def hits_for(self, category: str) -> List[PhraseHit]:
+        return self._by_category.get(category, [])
+
+    def is_exactly(self, category: str) -> bool:
+        """True if the whole message is one of the category's phrases."""
+        return any(hit.start == 0 and hit.end == len(self.text) for hit in self.hits_for(category))
+
+    def negated(self, hit: PhraseHit) -> bool:
+        """True if a negation precedes the hit within NEGATION_SCOPE_WORDS words of the same clause."""
+        for negation in self.hits_for('negation'):
+            if negation.end > hit.start:
+                continue
+            gap = self.text[negation.end:hit.start]
+            if any(char in CLAUSE_BREAKS for char in gap):
+                continue
+            if len(gap.split()) <= NEGATION_SCOPE_WORDS:
+                return True
+        return False
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over categorised phrases."""
+
+    def __init__(self, phrase_sets: Dict[str, Iterable[str]], whole_word: Iterable[str] = (),
+                 suffixes: Iterable[str] = ()):
+        self.whole_word: Set[str] = set(whole_word)
+        self.suffixes: Set[str] = set(suffixes)
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # Output of each state: (phrase, category) pairs ending here, including via fail links
+        self.output: List[List[Tuple[str, str]]] = [[]]
+
+        for category, phrases in phrase_sets.items():
+            for phrase in phrases:
+                self._add(phrase.lower(), category)
+        self._link()
+
+    def _add(self, phrase: str, category: str) -> None:
+        state = 0
+        for char in phrase:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        if (phrase, category) not in self.output[state]:
+            self.output[state].append((phrase, category))
+
+    def _link(self) -> None:
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+        # Fold the fail links into the transition table so scanning is one dict lookup per character.
+        # A fail target is always shallower than its state, so breadth-first order completes it first.
+        self.delta: List[Dict[str, int]] = [dict(self.goto[0])] + [{} for _ in range(len(self.goto) - 1)]
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            transitions = dict(self.delta[self.fail[state]])
+            transitions.update(self.goto[state])
+            self.delta[state] = transitions
+            queue.extend(self.goto[state].values())
+
+    def scan(self, text: str) -> PhraseScan:
+        """Every phrase occurrence in text (expected lower-case), in order of end position."""
+        hits = []
+        state = 0
+        delta = self.delta
+        output = self.output
+        whole_word = self.whole_word
+        suffixes = self.suffixes
+        for index, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            if not output[state]:
+                continue
+            end = index + 1
+            for phrase, category in output[state]:
+                start = end - len(phrase)
+                if category in whole_word and (
+                        (start > 0 and _is_word_char(text[start - 1]) and phrase not in suffixes)
+                        or (end < len(text) and _is_word_char(text[end]))):
+                    continue
+                hits.append(PhraseHit(category, phrase, start, end))
+        return PhraseScan(text, hits)
+
+
+PHRASE_MATCHER = PhraseMatcher(PHRASE_SETS, WHOLE_WORD_PHRASE_SETS, WORD_SUFFIX_PHRASES)
@@ -0,0 +1,116 @@
+"""
+Berlin postcode lookup.
+Loads data/berlin_postcodes.json into parallel sorted arrays searched with
+bisect, and returns the primary district, centroid and overlapping districts
+for a postcode.
+"""
+
+import json
+import os
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Path: actions/utils/postcodes.py -> .. (to actions/) -> .. (to project root) -> data/
+POSTCODES_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'berlin_postcodes.json')
+
+
+class PostcodeInfo(NamedTuple):
+    postcode: str
+    district: str
+    lat: float
+    lng: float
+    districts: Tuple[str, ...]  # primary district first, then any it overlaps
+
+    @property
+    def coords(self) -> Dict[str, float]:
+        """Centroid in the same shape as the location_coords slot."""
+        return {'lat': self.lat, 'lng': self.lng}
+
+
+class PostcodeTable:
+    """
+    Postcodes held as a sorted array of ints with parallel coordinate arrays.
+
+    District names are interned once and referenced by small indices, so the
+    full table costs a few kilobytes and a lookup is one binary search.
+    """
+
+    def __init__(self, rows: List[list]):
+        rows = sorted(rows, key=lambda row: int(row[0]))
+        self.names: List[str] = []
+        name_ids: Dict[str, int] = {}
+        self.overlaps: List[Tuple[int, ...]] = []
+
+        def name_id(name: str) -> int:
+            if name not in name_ids:
+                name_ids[name] = len(self.names)
+                self.names.append(name)
+            return name_ids[name]
+
+        self.codes = array('l')
+        self.lats = array('d')
+        self.lngs = array('d')
+        self.district_ids = array('B')
+        for postcode, district, lat, lng, districts in rows:
+            self.codes.append(int(postcode))
+            self.lats.append(float(lat))
+            self.lngs.append(float(lng))
+            self.district_ids.append(name_id(district))
+            self.overlaps.append(tuple(name_id(name) for name in districts))
+
+    @classmethod
+    def from_file(cls, path: str = POSTCODES_PATH) -> 'PostcodeTable':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['postcodes'])
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, postcode: str) -> bool:
+        return self._position(postcode) is not None
+
+    def _position(self, postcode: str) -> Optional[int]:
+        postcode = str(postcode).strip()
+        if len(postcode) != 5 or not postcode.isdigit():
+            return None
+        code = int(postcode)
+        position = bisect_left(self.codes, code)
+        if position < len(self.codes) and self.codes[position] == code:
+            return position
+        return None
+
+    def _info(self, position: int) -> PostcodeInfo:
+        return PostcodeInfo(
+            postcode=f"{self.codes[position]:05d}",
+            district=self.names[self.district_ids[position]],
+            lat=self.lats[position],
+            lng=self.lngs[position],
+            districts=tuple(self.names[i] for i in self.overlaps[position]),
+        )
+
+    def lookup(self, postcode: str) -> Optional[PostcodeInfo]:
+        """District, centroid and overlapping districts for a postcode, or None if it is not in Berlin."""
+        position = self._position(postcode)
+        return None if position is None else self._info(position)
+
+    def district_map(self) -> Dict[str, str]:
+        """Postcode -> primary district, for callers that want a plain dict."""
+        return {f"{code:05d}": self.names[district_id]
+                for code, district_id in zip(self.codes, self.district_ids)}
+
+
+def load_postcode_table() -> PostcodeTable:
+    """Load the bundled postcode table; empty if the data file is missing."""
+    try:
+        return PostcodeTable.from_file()
+    except (FileNotFoundError, KeyError, ValueError):
+        return PostcodeTable([])
+
+
+POSTCODE_TABLE = load_postcode_table()
+
+
+def lookup_postcode(postcode: str) -> Optional[PostcodeInfo]:
+    return POSTCODE_TABLE.lookup(postcode)
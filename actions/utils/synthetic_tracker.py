@@ -0,0 +1,60 @@
+"""
+Trackers built in-process, without a Rasa server.
+Used to run actions outside a real conversation: the benchmark suite times
+their run() on them, and the same inputs can drive each hot path once before
+real traffic arrives.
+"""
+
+import random
+from typing import Any, Dict, List, Optional
+
+from rasa_sdk import Tracker
+
+# Intents, bot texts and actions a synthetic history is drawn from
+HISTORY_INTENTS = ['inform_location', 'greet', 'request_shelter_info', 'report_safe', 'report_flood', 'report_fire']
+HISTORY_BOT_TEXTS = ['Which district are you in?', '✅ Location confirmed: **Mitte**', 'Stay calm.',
+                     'Please head to the nearest shelter.']
+HISTORY_ACTIONS = ['utter_ask_location', 'action_validate_location', 'action_listen', 'action_find_nearest_shelters']
+
+
+def synthetic_tracker(text: str = '', intent: Optional[str] = None, entities: Optional[List[Dict[str, Any]]] = None,
+                      slots: Optional[Dict[str, Any]] = None, events: Optional[List[Dict[str, Any]]] = None,
+                      metadata: Optional[Dict[str, Any]] = None, sender_id: str = 'synthetic') -> Tracker:
+    """Tracker whose latest message is text, classified as intent, after the given events."""
+    latest_message = {
+        'text': text,
+        'intent': {'name': intent, 'confidence': 1.0} if intent else {},
+        'entities': entities or [],
+        'metadata': metadata or {},
+    }
+    return Tracker(sender_id, dict(slots or {}), latest_message, list(events or []), False, None, None,
+                   'action_listen')
+
+
+def location_request_events() -> List[Dict[str, Any]]:
+    """Events of the bot having just asked the user where they are."""
+    return [
+        {'event': 'action', 'timestamp': 0.0, 'name': 'utter_ask_location'},
+        {'event': 'bot', 'timestamp': 0.0, 'text': 'Which district are you in?'},
+        {'event': 'action', 'timestamp': 0.0, 'name': 'action_listen'},
+    ]
+
+
+def synthetic_events(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """A plausible history of count user, bot, action and slot events."""
+    rng = random.Random(seed)
+    events = []
+    for position in range(count):
+        kind = rng.random()
+        timestamp = float(position)
+        if kind < 0.25:
+            events.append({'event': 'user', 'timestamp': timestamp, 'text': 'msg',
+                           'parse_data': {'intent': {'name': rng.choice(HISTORY_INTENTS)}, 'entities': []}})
+        elif kind < 0.5:
+            events.append({'event': 'bot', 'timestamp': timestamp, 'text': rng.choice(HISTORY_BOT_TEXTS)})
+        elif kind < 0.8:
+            events.append({'event': 'action', 'timestamp': timestamp, 'name': rng.choice(HISTORY_ACTIONS)})
+        else:
+            events.append({'event': 'slot', 'timestamp': timestamp, 'name': 'location_validated',
+                           'value': rng.random() < 0.5})
+    return events
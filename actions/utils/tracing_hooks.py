@@ -0,0 +1,65 @@
+"""
+Action server side of turn tracing (see tracing/spans.py).
+trace_action() runs each action in a 'run:<action>' span joined to the turn
+whose traceparent Rasa forwarded in the latest message's metadata, and
+http_trace_config() adds a span for every request of the shared HTTP session.
+"""
+
+import functools
+import inspect
+
+import aiohttp
+
+from tracing import TRACEPARENT_KEY, TRACER, parse_traceparent
+
+SERVICE = 'actions'
+
+
+def trace_action(action_class: type) -> type:
+    """Wrap action_class.run in a span when the turn is traced. Idempotent."""
+    original = action_class.run
+    if getattr(original, '_traced', False) or not TRACER.enabled:
+        return action_class
+
+    @functools.wraps(original)
+    async def run(self, dispatcher, tracker, domain):
+        metadata = (tracker.latest_message or {}).get('metadata') or {}
+        parent = parse_traceparent(metadata.get(TRACEPARENT_KEY))
+        span = TRACER.start_span(f'run:{self.name()}', parent, SERVICE, {'sender_id': tracker.sender_id}) \
+            if parent else None
+        with TRACER.activate(span):
+            events = original(self, dispatcher, tracker, domain)
+            if inspect.isawaitable(events):
+                events = await events
+            if span is not None:
+                span.set('events', len(events or []))
+                span.set('messages', len(dispatcher.messages))
+            return events
+
+    run._traced = True
+    action_class.run = run
+    return action_class
+
+
+async def _on_request_start(session, context, params) -> None:
+    context.span = TRACER.start_span(f'HTTP {params.method} {params.url.host}{params.url.path}')
+
+
+async def _on_request_end(session, context, params) -> None:
+    if context.span is not None:
+        context.span.set('status', params.response.status)
+        TRACER.end_span(context.span)
+
+
+async def _on_request_exception(session, context, params) -> None:
+    if context.span is not None:
+        context.span.set('error', type(params.exception).__name__)
+        TRACER.end_span(context.span)
+
+
+def http_trace_config() -> aiohttp.TraceConfig:
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_request_exception.append(_on_request_exception)
+    return trace_config
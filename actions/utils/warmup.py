@@ -0,0 +1,97 @@
+"""
+Warm-up of the action server before it accepts traffic.
+Runs every action on a handful of synthetic trackers (district text, a typo,
+a GPS share, a shelter request, a free-text status) until a pass is no slower
+than the one before, so imports, lazily built indexes and the render cache
+are ready for the first real user. Warm-up messages carry
+metadata {'warmup': true} and 'warmup-' sender ids; actions skip side effects
+such as shelter reservations for them, and their runs are left out of the
+action metrics.
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Sequence
+
+from rasa_sdk import Action, Tracker
+from rasa_sdk.executor import CollectingDispatcher
+
+from .synthetic_tracker import location_request_events, synthetic_tracker
+
+logger = logging.getLogger(__name__)
+
+WARMUP_METADATA_KEY = 'warmup'
+# Also used by the Rasa server warm-up (warmup.py), whose messages may reach an action without their metadata
+WARMUP_SENDER_PREFIX = 'warmup-'
+WARMUP_SENDER_ID = f'{WARMUP_SENDER_PREFIX}actions'
+
+# A pass at most this much slower than the previous one counts as steady state
+WARMUP_TOLERANCE = 1.2
+WARMUP_MAX_PASSES = 5
+
+COORDS = {'lat': 52.5200, 'lng': 13.4050}
+
+
+def is_warmup(tracker: Tracker) -> bool:
+    """True for messages sent by a warm-up pass rather than a user."""
+    if (tracker.sender_id or '').startswith(WARMUP_SENDER_PREFIX):
+        return True
+    metadata = (tracker.latest_message or {}).get('metadata') or {}
+    return bool(metadata.get(WARMUP_METADATA_KEY))
+
+
+def warmup_trackers() -> List[Tracker]:
+    inputs = [
+        dict(text='Mitte', intent='inform_location', events=location_request_events()),
+        dict(text='Kreuzbreg', intent='inform_location', events=location_request_events()),
+        dict(text='sharing my gps location', intent='share_gps_location', events=location_request_events(),
+             metadata={'location_coords': COORDS}),
+        dict(text='shelter with wheelchair access', intent='request_shelter_info',
+             slots={'district': 'Mitte', 'location_coords': COORDS, 'emergency_type': 'flood'}),
+        dict(text='my leg is hurt but i can walk', intent='nlu_fallback',
+             slots={'status_asked': True, 'emergency_type': 'earthquake', 'district': 'Mitte'}),
+        dict(text='there was an earthquake', intent='report_earthquake', slots={'district': 'Mitte'}),
+    ]
+    trackers = []
+    for kwargs in inputs:
+        kwargs['metadata'] = dict(kwargs.get('metadata') or {}, **{WARMUP_METADATA_KEY: True})
+        trackers.append(synthetic_tracker(sender_id=WARMUP_SENDER_ID, **kwargs))
+    return trackers
+
+
+async def _run_pass(actions: Sequence[Action], trackers: List[Tracker]) -> int:
+    failures = 0
+    for tracker in trackers:
+        for action in actions:
+            try:
+                await action.run(CollectingDispatcher(), tracker, {})
+            except Exception as e:
+                failures += 1
+                logger.debug("Warm-up run of %s failed: %s", action.name(), e)
+    return failures
+
+
+async def warm_up_actions(actions: Sequence[Action]) -> Dict[str, Any]:
+    """Run every action on the warm-up trackers until a pass reaches steady state; returns the timings."""
+    trackers = warmup_trackers()
+    started = time.perf_counter()
+    passes_ms: List[float] = []
+    failures = 0
+    while len(passes_ms) < WARMUP_MAX_PASSES:
+        pass_started = time.perf_counter()
+        failures = await _run_pass(actions, trackers)
+        passes_ms.append((time.perf_counter() - pass_started) * 1e3)
+        if len(passes_ms) >= 2 and passes_ms[-1] <= passes_ms[-2] * WARMUP_TOLERANCE:
+            break
+    report = {
+        'duration_ms': round((time.perf_counter() - started) * 1e3, 1),
+        'runs_per_pass': len(actions) * len(trackers),
+        'passes': len(passes_ms),
+        'first_pass_ms': round(passes_ms[0], 2),
+        'last_pass_ms': round(passes_ms[-1], 2),
+        'failures': failures,
+    }
+    logger.info("Warm-up: %d passes of %d action runs in %.1f ms; first pass %.2f ms, last %.2f ms",
+                report['passes'], report['runs_per_pass'], report['duration_ms'], report['first_pass_ms'],
+                report['last_pass_ms'])
+    return report
@@ -1,57 +1,269 @@
 #!/usr/bin/env python3
+"""
+Starts the action server and the Rasa server side by side and supervises them.
+
+Both start at once; on first boot the model is trained before the Rasa server
+starts, while the action server is already coming up. A server counts as ready
+when its readiness check passes: the action server lists its actions and the
+Rasa server reports a loaded model on /status. Neither is ready cold: the
+action server warms its actions up before it listens, and once the action
+server is ready the Rasa server is warmed up through NLU, core and the
+actions (see warmup.py) until a first turn is as fast as steady state. A
+server that exits is restarted with exponential backoff. GET /health (every
+server process up) and GET /ready (every server ready) on SUPERVISOR_PORT
+report the combined state.
+"""
+
+import asyncio
 import os
-import subprocess
+import signal
 import sys
 import time
-from multiprocessing import Process
-
-def start_actions_server():
-    print("Starting Rasa actions server on port 5055...", flush=True)
-    cmd = [sys.executable, '-m', 'rasa', 'run', 'actions', '--port', '5055']
-    subprocess.run(cmd)
-
-def start_rasa_server():
-    port = os.environ.get('PORT', '7860')
-    model_path = 'models/crisis-bot.tar.gz'
-    
-    print(f"Starting Rasa server on port {port}...", flush=True)
-    print(f"Model: {model_path}", flush=True)
-    
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+from warmup import describe, warm_up_rasa
+
+MODEL_PATH = 'models/crisis-bot.tar.gz'
+ACTIONS_PORT = 5055
+SUPERVISOR_PORT = int(os.environ.get('SUPERVISOR_PORT', '7861'))
+
+READY_POLL_SECONDS = 0.25
+# Once ready, keep checking so a hung server shows up as not ready
+LIVE_POLL_SECONDS = 5.0
+CHECK_TIMEOUT_SECONDS = 2.0
+BACKOFF_INITIAL_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+# A server that stayed up this long after becoming ready restarts without backoff
+STABLE_SECONDS = 60.0
+STOP_TIMEOUT_SECONDS = 10.0
+
+
+class ServerProcess:
+
+    def __init__(self, name: str, command: Callable[[], List[str]],
+                 check: Callable[[aiohttp.ClientSession], Awaitable[Optional[bool]]],
+                 prepare: Optional[Callable[['ServerProcess'], Awaitable[None]]] = None,
+                 warm_up: Optional[Callable[[aiohttp.ClientSession], Awaitable[Optional[Dict[str, Any]]]]] = None):
+        self.name = name
+        self.command = command
+        self.check = check
+        self.prepare = prepare
+        self.warm_up = warm_up
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.state = 'pending'
+        self.restarts = 0
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.last_exit: Optional[int] = None
+        self.warmup: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'pid': self.process.pid if self.running else None,
+            'restarts': self.restarts,
+            'last_exit': self.last_exit,
+            'ready_after_seconds': round(self.ready_at - self.started_at, 2) if self.ready_at else None,
+            'warmup': self.warmup,
+        }
+
+
+async def http_ok(session: aiohttp.ClientSession, url: str,
+                  accept: Optional[Callable[[Any], bool]] = None) -> Optional[bool]:
+    """True if url answers 200 (and accept() takes the body), False if it answers otherwise, None if it is down."""
+    try:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=CHECK_TIMEOUT_SECONDS)) as response:
+            if response.status != 200:
+                return False
+            return accept(await response.json()) if accept else True
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+    except ValueError:
+        return False
+
+
+def actions_command() -> List[str]:
+    return [sys.executable, '-m', 'actions.server', '--port', str(ACTIONS_PORT)]
+
+
+async def actions_ready(session: aiohttp.ClientSession) -> Optional[bool]:
+    return await http_ok(session, f'http://127.0.0.1:{ACTIONS_PORT}/actions', lambda actions: bool(actions))
+
+
+def rasa_port() -> str:
+    return os.environ.get('PORT', '7860')
+
+
+def rasa_command() -> List[str]:
     cmd = [
         sys.executable, '-m', 'rasa', 'run',
         '--enable-api',
         '--cors', '*',
-        '--port', port
+        '--port', rasa_port(),
     ]
-    
-    if os.path.exists(model_path):
-        cmd.extend(['--model', model_path])
-    
-    subprocess.run(cmd)
+    if os.path.exists(MODEL_PATH):
+        cmd.extend(['--model', MODEL_PATH])
+    return cmd
 
-def main():
-    model_path = 'models/crisis-bot.tar.gz'
-    if not os.path.exists(model_path):
-        print("Model not found. Training model...", flush=True)
-        subprocess.run([
-            sys.executable, '-m', 'rasa', 'train',
-            '--fixed-model-name', 'crisis-bot'
-        ], check=True)
-        print("Model training completed.", flush=True)
-    
-    actions_process = Process(target=start_actions_server)
-    actions_process.start()
-    
-    time.sleep(5)
-    
+
+async def rasa_ready(session: aiohttp.ClientSession) -> Optional[bool]:
+    # The Rasa server loads its model before it listens; /status answers 409 if no model could be loaded
+    return await http_ok(session, f'http://127.0.0.1:{rasa_port()}/status')
+
+
+async def warm_up_rasa_server(actions_server: ServerProcess,
+                              session: aiohttp.ClientSession) -> Optional[Dict[str, Any]]:
+    # Conversations run actions, so wait for the action server (already warm once it is ready)
+    while actions_server.state != 'ready':
+        await asyncio.sleep(READY_POLL_SECONDS)
     try:
-        start_rasa_server()
-    except KeyboardInterrupt:
+        report = await warm_up_rasa(f'http://127.0.0.1:{rasa_port()}', session)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Warm-up of the Rasa server failed ({e!r}); reporting it ready anyway", flush=True)
+        return None
+    print(describe(report), flush=True)
+    return report
+
+
+async def train_model(server: ServerProcess) -> None:
+    if os.path.exists(MODEL_PATH):
+        return
+    print("Model not found. Training model...", flush=True)
+    server.state = 'training'
+    server.process = await asyncio.create_subprocess_exec(
+        sys.executable, '-m', 'rasa', 'train', '--fixed-model-name', 'crisis-bot')
+    if await server.process.wait() != 0:
+        raise RuntimeError(f"Model training failed with exit code {server.process.returncode}")
+    print("Model training completed.", flush=True)
+
+
+async def watch_readiness(server: ServerProcess, session: aiohttp.ClientSession) -> None:
+    while True:
+        ready = await server.check(session)
+        if ready and server.state != 'ready':
+            if server.ready_at is None:
+                if server.warm_up is not None:
+                    server.state = 'warming_up'
+                    server.warmup = await server.warm_up(session)
+                server.ready_at = time.monotonic()
+                print(f"{server.name} ready after {server.ready_at - server.started_at:.1f}s", flush=True)
+            server.state = 'ready'
+        elif not ready and server.state == 'ready':
+            print(f"{server.name} stopped passing its readiness check", flush=True)
+            server.state = 'unready'
+        # Poll fast only while the server is not listening yet; each failed check may be logged by the server
+        await asyncio.sleep(READY_POLL_SECONDS if ready is None else LIVE_POLL_SECONDS)
+
+
+async def supervise(server: ServerProcess, session: aiohttp.ClientSession, stopping: asyncio.Event) -> None:
+    if server.prepare is not None:
+        await server.prepare(server)
+    backoff = BACKOFF_INITIAL_SECONDS
+    while not stopping.is_set():
+        print(f"Starting {server.name}: {' '.join(server.command()[1:])}", flush=True)
+        server.state = 'starting'
+        server.ready_at = None
+        server.warmup = None
+        server.started_at = time.monotonic()
+        server.process = await asyncio.create_subprocess_exec(*server.command())
+        watcher = asyncio.ensure_future(watch_readiness(server, session))
+        server.last_exit = await server.process.wait()
+        watcher.cancel()
+        if stopping.is_set():
+            break
+        if server.ready_at is not None and time.monotonic() - server.ready_at >= STABLE_SECONDS:
+            backoff = BACKOFF_INITIAL_SECONDS
+        server.state = 'restarting'
+        server.restarts += 1
+        print(f"{server.name} exited with code {server.last_exit}; restarting in {backoff:.0f}s", flush=True)
+        try:
+            await asyncio.wait_for(stopping.wait(), backoff)
+        except asyncio.TimeoutError:
+            pass
+        backoff = min(backoff * 2, BACKOFF_MAX_SECONDS)
+    server.state = 'stopped'
+
+
+async def stop(servers: List[ServerProcess]) -> None:
+    running = [server.process for server in servers if server.running]
+    for process in running:
+        process.terminate()
+    if running:
+        _, pending = await asyncio.wait([asyncio.ensure_future(process.wait()) for process in running],
+                                        timeout=STOP_TIMEOUT_SECONDS)
+        if pending:
+            for process in running:
+                if process.returncode is None:
+                    process.kill()
+
+
+def create_status_app(servers: List[ServerProcess]) -> web.Application:
+    started_at = time.monotonic()
+
+    def report(ok: bool) -> web.Response:
+        body = {
+            'status': 'ok' if ok else 'unavailable',
+            'uptime_seconds': round(time.monotonic() - started_at, 1),
+            'servers': {server.name: server.status() for server in servers},
+        }
+        return web.json_response(body, status=200 if ok else 503)
+
+    async def health(_request: web.Request) -> web.Response:
+        return report(all(server.running for server in servers))
+
+    async def ready(_request: web.Request) -> web.Response:
+        return report(all(server.state == 'ready' for server in servers))
+
+    app = web.Application()
+    app.router.add_get('/health', health)
+    app.router.add_get('/ready', ready)
+    return app
+
+
+async def run() -> int:
+    actions_server = ServerProcess('actions server', actions_command, actions_ready)
+    servers = [
+        actions_server,
+        ServerProcess('Rasa server', rasa_command, rasa_ready, prepare=train_model,
+                      warm_up=partial(warm_up_rasa_server, actions_server)),
+    ]
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    runner = web.AppRunner(create_status_app(servers))
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', SUPERVISOR_PORT).start()
+    print(f"Supervisor reporting /health and /ready on port {SUPERVISOR_PORT}", flush=True)
+
+    exit_code = 0
+    async with aiohttp.ClientSession() as session:
+        tasks = [asyncio.ensure_future(supervise(server, session, stopping)) for server in servers]
+        await asyncio.wait(tasks + [asyncio.ensure_future(stopping.wait())], return_when=asyncio.FIRST_COMPLETED)
+        for task in tasks:
+            if task.done() and task.exception() is not None:
+                print(f"Error: {task.exception()}", flush=True)
+                exit_code = 1
         print("\nShutting down...", flush=True)
-        actions_process.terminate()
-        actions_process.join()
-        sys.exit(0)
+        stopping.set()
+        await stop(servers)
+        await asyncio.gather(*tasks, return_exceptions=True)
+    await runner.cleanup()
+    return exit_code
+
+
+def main():
+    sys.exit(asyncio.run(run()))
+
 
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Concurrency check for the async action server path.
+
+Fires many simultaneous GPS turns through ActionValidateLocation, all near
+the Berlin border so each one needs a reverse-geocoding round trip to the
+local Nominatim stub. With non-blocking actions the wall time stays close to
+one upstream latency; a blocking implementation would take roughly
+turns x latency. Exits non-zero if the wall time exceeds --max-factor x latency.
+
+Usage:
+    python benchmarks/bench_concurrent_gps.py [--turns 200] [--latency 0.3] [--max-factor 3]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+
+def border_points(resolver, count):
+    """Points outside the simplified outline but within its border margin, one per geohash cell."""
+    from actions.location.reverse_geocoder import geohash
+
+    random.seed(11)
+    points = {}
+    margin = 0.015
+    while len(points) < count:
+        lat = random.uniform(resolver.min_lat - margin, resolver.max_lat + margin)
+        lng = random.uniform(resolver.min_lng - margin, resolver.max_lng + margin)
+        if resolver.resolve(lat, lng).inside_berlin or not resolver.is_near_berlin(lat, lng):
+            continue
+        points.setdefault(geohash(lat, lng), (lat, lng))
+    return list(points.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.3, help='stub response latency in seconds')
+    parser.add_argument('--max-factor', type=float, default=3.0, help='allowed wall time in multiples of latency')
+    parser.add_argument('--port', type=int, default=8090)
+    args = parser.parse_args()
+
+    # Point the module-level client at the stub, with a rate limit that admits the whole burst.
+    # Must happen before anything imports the actions package.
+    os.environ['NOMINATIM_URL'] = f"http://127.0.0.1:{args.port}"
+    os.environ['NOMINATIM_RATE_LIMIT'] = str(args.turns * 10)
+    # The connection pool caps parallel upstream calls; size it for the burst being measured
+    os.environ.setdefault('ACTIONS_HTTP_POOL_SIZE', str(args.turns))
+
+    from nominatim_stub import NominatimStub
+    from rasa_sdk import Tracker
+    from rasa_sdk.executor import CollectingDispatcher
+
+    from actions.location.reverse_geocoder import REVERSE_GEOCODER
+    from actions.location.validate_location import ActionValidateLocation
+    from actions.utils.concurrency import close_http_session
+    from actions.utils.district_resolver import DISTRICT_RESOLVER
+
+    REVERSE_GEOCODER.bucket.capacity = float(args.turns)
+    REVERSE_GEOCODER.bucket._tokens = float(args.turns)
+
+    stub = NominatimStub(latency=args.latency)
+    server = stub.serve(port=args.port)
+    points = border_points(DISTRICT_RESOLVER, args.turns)
+    action = ActionValidateLocation()
+
+    def gps_tracker(sender_id, lat, lng):
+        latest_message = {
+            'text': 'sharing my gps location',
+            'intent': {'name': 'share_gps_location', 'confidence': 0.95},
+            'entities': [],
+            'metadata': {'location_coords': {'lat': lat, 'lng': lng}},
+        }
+        return Tracker(sender_id, {'emergency_type': 'flood'}, latest_message, [], False, None, None,
+                       'action_listen')
+
+    async def run_all():
+        trackers = [gps_tracker(f"bench-{i}", lat, lng) for i, (lat, lng) in enumerate(points)]
+        started = time.perf_counter()
+        await asyncio.gather(*(action.run(CollectingDispatcher(), tracker, {}) for tracker in trackers))
+        wall = time.perf_counter() - started
+        await close_http_session()
+        return wall
+
+    wall = asyncio.run(run_all())
+    server.shutdown()
+
+    stats = REVERSE_GEOCODER.stats()
+    serial = args.turns * args.latency
+    limit = args.max_factor * args.latency
+    print(f"turns: {args.turns}  upstream latency: {args.latency * 1000:.0f} ms")
+    print(f"wall time: {wall:.2f}s  (serial estimate {serial:.1f}s, limit {limit:.2f}s)")
+    print(f"upstream requests served by stub: {stub.requests}  "
+          f"errors: {stats['upstream_errors']}  fallbacks: {stats['fallbacks']}")
+
+    if stub.requests < args.turns or stats['upstream_errors']:
+        print("FAIL: not every turn reached the upstream")
+        sys.exit(1)
+    if wall > limit:
+        print("FAIL: turns did not overlap")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Per-turn cost of the conversation summary versus the event rescans it replaced,
+as sessions grow. Also checks that both give the same answers at every turn.
+
+Usage:
+    python benchmarks/bench_conversation_summary.py [--turns 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from rasa_sdk import Tracker  # noqa: E402
+
+from actions.utils.constants import PHRASE_SETS  # noqa: E402
+from actions.utils.conversation_summary import LOCATION_REQUEST_ACTIONS, ConversationSummaryCache  # noqa: E402
+
+LOCATION_REQUEST_PHRASES = PHRASE_SETS['location_request']
+
+# Emergencies are reported rarely; most turns are follow-ups within one report
+USER_INTENTS = ['inform_location', 'greet', 'request_shelter_info', 'affirm', 'inform_status'] * 20 + [
+    'report_flood', 'report_fire', 'report_earthquake']
+BOT_TEXTS = ['Which district are you in?', '✅ Location confirmed: **Mitte**', 'Stay calm.',
+             'Please head to the nearest shelter.']
+ACTIONS = ['utter_ask_location', 'action_handle_shelter_request', 'action_validate_location',
+           'action_listen', 'action_find_nearest_shelters']
+
+
+def legacy_facts(events):
+    """The scans actions ran over tracker.events before the summary existed."""
+    location_just_validated = False
+    for event in reversed(events[-10:]):
+        if event.get('event') == 'slot':
+            if event.get('name') == 'location_validated' and event.get('value') is True:
+                location_just_validated = True
+                break
+        elif event.get('event') == 'bot':
+            if 'location confirmed' in event.get('text', '').lower():
+                location_just_validated = True
+                break
+
+    location_asked = False
+    for event in reversed(events[-25:]):
+        if event.get('event') == 'action':
+            if event.get('name', '') in LOCATION_REQUEST_ACTIONS:
+                location_asked = True
+                break
+        elif event.get('event') == 'bot':
+            text = event.get('text', '').lower()
+            if any(phrase in text for phrase in LOCATION_REQUEST_PHRASES):
+                location_asked = True
+                break
+
+    emergency_type = None
+    for event in reversed(events):
+        if event.get('event') == 'user':
+            parse_data = event.get('parse_data', {})
+            intent = parse_data.get('intent', {}).get('name', '')
+            if intent.startswith('report_'):
+                emergency_type = intent[len('report_'):]
+                break
+            values = [e.get('value', '').lower() for e in parse_data.get('entities', [])
+                      if e.get('entity') == 'emergency_type']
+            values = [v for v in values if v in ('earthquake', 'flood', 'fire')]
+            if values:
+                emergency_type = values[0]
+                break
+
+    recent_report = None
+    for event in reversed(events[-10:]):
+        if event.get('event') == 'user':
+            intent = event.get('parse_data', {}).get('intent', {}).get('name', '')
+            if intent.startswith('report_'):
+                recent_report = intent[len('report_'):]
+                break
+
+    shelter_request = any(event.get('event') == 'action' and event.get('name') == 'action_handle_shelter_request'
+                          for event in events[-5:])
+    return location_just_validated, location_asked, emergency_type, recent_report, shelter_request
+
+
+def random_event(rng, timestamp):
+    kind = rng.random()
+    if kind < 0.25:
+        entities = []
+        if rng.random() < 0.01:
+            entities.append({'entity': 'emergency_type', 'value': rng.choice(['Fire', 'flood', 'storm'])})
+        return {'event': 'user', 'timestamp': timestamp, 'text': 'msg',
+                'parse_data': {'intent': {'name': rng.choice(USER_INTENTS)}, 'entities': entities}}
+    if kind < 0.5:
+        return {'event': 'bot', 'timestamp': timestamp, 'text': rng.choice(BOT_TEXTS)}
+    if kind < 0.8:
+        return {'event': 'action', 'timestamp': timestamp, 'name': rng.choice(ACTIONS)}
+    return {'event': 'slot', 'timestamp': timestamp, 'name': 'location_validated', 'value': rng.random() < 0.5}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=2000, help='turns per session')
+    parser.add_argument('--events-per-turn', type=int, default=6)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    cache = ConversationSummaryCache()
+    events = []
+    legacy_time = 0.0
+    summary_time = 0.0
+    checkpoints = {args.turns // 4, args.turns // 2, args.turns - 1}
+    print(f"{'events':>8} {'legacy us/turn':>15} {'summary us/turn':>16}")
+    window_legacy = window_summary = 0.0
+    window_turns = 0
+
+    for turn in range(args.turns):
+        for _ in range(args.events_per_turn):
+            events.append(random_event(rng, float(len(events))))
+        tracker = Tracker('bench', {}, {}, events, False, None, None, 'action_listen')
+
+        started = time.perf_counter()
+        expected = legacy_facts(events)
+        elapsed_legacy = time.perf_counter() - started
+
+        started = time.perf_counter()
+        summary = cache.get(tracker)
+        actual = (summary.location_just_validated(), summary.location_asked(), summary.emergency_type,
+                  summary.recent_emergency_report(), summary.shelter_request_handled())
+        elapsed_summary = time.perf_counter() - started
+
+        if actual != expected:
+            print(f"MISMATCH at turn {turn}: summary={actual} legacy={expected}")
+            sys.exit(1)
+
+        legacy_time += elapsed_legacy
+        summary_time += elapsed_summary
+        window_legacy += elapsed_legacy
+        window_summary += elapsed_summary
+        window_turns += 1
+        if turn in checkpoints:
+            print(f"{len(events):>8} {window_legacy / window_turns * 1e6:>15.1f} "
+                  f"{window_summary / window_turns * 1e6:>16.1f}")
+            window_legacy = window_summary = 0.0
+            window_turns = 0
+
+    print(f"all {args.turns} turns matched; total legacy {legacy_time * 1000:.1f} ms, "
+          f"summary {summary_time * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Per-call latency of fuzzy_match_district: the trigram-indexed matcher versus
+the previous SequenceMatcher scan over every alias.
+
+Usage:
+    python benchmarks/bench_fuzzy_match.py [--repeat 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from actions.utils.constants import BERLIN_DISTRICTS, BERLIN_POSTCODES, STANDARD_DISTRICTS  # noqa: E402
+from actions.utils.district_matcher import DISTRICT_MATCHER  # noqa: E402
+
+SAMPLES = {
+    'exact alias': 'kreuzberg',
+    'typo': 'charlotenburg',
+    'short typo': 'spandu',
+    'postcode': '10115',
+    'long free text': "I'm in kreuzberg near the park",
+    'no district': 'i need help right now please',
+}
+
+
+def legacy_fuzzy_match_district(input_text, threshold=0.7):
+    """The SequenceMatcher implementation this matcher replaced."""
+    input_lower = input_text.lower().strip()
+
+    if input_lower in BERLIN_DISTRICTS:
+        return BERLIN_DISTRICTS[input_lower], 1.0, []
+
+    for district in STANDARD_DISTRICTS:
+        if input_lower == district.lower():
+            return district, 1.0, []
+
+    if input_lower.isdigit() and len(input_lower) == 5:
+        if input_lower in BERLIN_POSTCODES:
+            return BERLIN_POSTCODES[input_lower], 1.0, []
+
+    best_match = None
+    best_score = 0
+    suggestions = []
+
+    for variation, district in BERLIN_DISTRICTS.items():
+        ratio_score = SequenceMatcher(None, input_lower, variation).ratio()
+        partial_score = SequenceMatcher(None, input_lower, variation).quick_ratio()
+
+        score = max(ratio_score, partial_score)
+
+        if score >= threshold:
+            if score > best_score:
+                best_score = score
+                best_match = district
+                suggestions = [district]
+            elif score == best_score and district not in suggestions:
+                suggestions.append(district)
+
+    return best_match, best_score, suggestions
+
+
+def indexed_fuzzy_match_district(input_text, threshold=0.7):
+    """fuzzy_match_district without its lru_cache, so every call does the work."""
+    input_lower = input_text.lower().strip()
+    if input_lower.isdigit() and len(input_lower) == 5 and input_lower in BERLIN_POSTCODES:
+        return BERLIN_POSTCODES[input_lower], 1.0, []
+    return DISTRICT_MATCHER.match(input_lower, threshold)
+
+
+def time_per_call(func, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200, help='calls per sample')
+    args = parser.parse_args()
+
+    print(f"{'input class':<16} {'legacy µs':>10} {'indexed µs':>11} {'speedup':>8}  legacy -> indexed")
+    for label, text in SAMPLES.items():
+        legacy_us = time_per_call(legacy_fuzzy_match_district, text, args.repeat)
+        indexed_us = time_per_call(indexed_fuzzy_match_district, text, args.repeat)
+        legacy = legacy_fuzzy_match_district(text)[0]
+        indexed = indexed_fuzzy_match_district(text)[0]
+        print(f"{label:<16} {legacy_us:>10.1f} {indexed_us:>11.1f} {legacy_us / indexed_us:>7.1f}x  {legacy} -> {indexed}")
+
+
+if __name__ == '__main__':
+    main()
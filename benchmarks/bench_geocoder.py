@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Reverse-geocoding client under concurrent load, against the local Nominatim stub.
+
+Simulates a surge of GPS turns concentrated around a few hotspots, so many
+lookups share geohash cells. Reports latency, cache/coalescing behaviour and
+what the circuit breaker did when the upstream is slow or failing.
+
+Usage:
+    python benchmarks/bench_geocoder.py [--lookups 2000] [--concurrency 32] [--latency 0.2] [--rate 1.0]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from actions.location.reverse_geocoder import ReverseGeocodeClient, TokenBucket  # noqa: E402
+from nominatim_stub import NominatimStub  # noqa: E402
+
+HOTSPOTS = [(52.5219, 13.4132), (52.4892, 13.3850), (52.5136, 13.4581), (52.5388, 13.2127)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32, help='lookups in flight at once')
+    parser.add_argument('--latency', type=float, default=0.2, help='stub response latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of stub responses that fail')
+    parser.add_argument('--rate', type=float, default=1.0, help='upstream requests per second allowed')
+    parser.add_argument('--port', type=int, default=8089)
+    args = parser.parse_args()
+
+    stub = NominatimStub(latency=args.latency, error_rate=args.error_rate)
+    server = stub.serve(port=args.port)
+    client = ReverseGeocodeClient(base_url=f"http://127.0.0.1:{args.port}",
+                                  bucket=TokenBucket(rate=args.rate, capacity=max(1.0, args.rate)))
+
+    random.seed(7)
+    points = []
+    for _ in range(args.lookups):
+        lat, lng = random.choice(HOTSPOTS)
+        # Scatter within ~300 m of the hotspot
+        points.append((lat + random.uniform(-0.003, 0.003), lng + random.uniform(-0.004, 0.004)))
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def timed(point):
+            async with semaphore:
+                started = time.perf_counter()
+                result = await client.reverse(*point)
+                return time.perf_counter() - started, result.source
+
+        return await asyncio.gather(*(timed(point) for point in points))
+
+    started = time.perf_counter()
+    results = asyncio.run(run_all())
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    sources = {}
+    for _, source in results:
+        sources[source] = sources.get(source, 0) + 1
+
+    print(f"lookups: {args.lookups}  concurrency: {args.concurrency}  wall time: {elapsed:.2f}s")
+    print(f"latency ms  p50={statistics.median(latencies):.2f}  "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1]:.2f}  max={latencies[-1]:.2f}")
+    print(f"answered by: {sources}")
+    print(f"upstream requests served by stub: {stub.requests}")
+    for name, value in client.stats().items():
+        print(f"  {name}: {value}")
+
+
+if __name__ == '__main__':
+    main()
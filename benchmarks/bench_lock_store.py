@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Contention benchmark of the SQLite lock store across processes.
+
+Forks --processes workers, each running --concurrency conversations' worth of
+turns against the same small set of --senders, the way several Rasa server
+processes would handle a burst from a few busy users. Every turn takes the
+sender's lock, runs the retrieve / update / save cycle on a shared-mode
+sharded tracker store, holds the lock for --hold ms more (policy and action
+time) and releases it.
+
+Prints lock acquisitions per second, how much of the run each sender's lock
+was held (the rest is hand-over delay and idle senders), wait time
+percentiles and the uncontended acquire + release cost, then checks that:
+- no two turns of a sender overlapped in time,
+- each sender's turns ran in ticket order (first come, first served),
+- every sender's tracker holds exactly one user message per turn taken.
+--lock-store memory runs the same load with Rasa's per-process in-memory lock
+store, which shows the overlaps and lost turns it allows across processes.
+Needs Rasa installed.
+
+Usage:
+    python benchmarks/bench_lock_store.py [--processes 4] [--senders 8] [--turns 50] [--hold 5]
+    python benchmarks/bench_lock_store.py --lock-store memory
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PROJECT_DIR)
+
+from rasa.core.lock_store import InMemoryLockStore  # noqa: E402
+from rasa.shared.core.domain import Domain  # noqa: E402
+from rasa.shared.core.events import ActionExecuted, BotUttered, SlotSet, UserUttered  # noqa: E402
+
+from stores.lock_store import SQLiteLockStore  # noqa: E402
+from stores.tracker_store import ShardedSQLiteTrackerStore  # noqa: E402
+
+
+def create_stores(args, tmp):
+    lock_store = (SQLiteLockStore(db_path=os.path.join(tmp, 'locks.db')) if args.lock_store == 'sqlite'
+                  else InMemoryLockStore())
+    tracker_store = ShardedSQLiteTrackerStore(Domain.empty(), db_dir=os.path.join(tmp, 'trackers'), shards=4,
+                                              shared=True)
+    return lock_store, tracker_store
+
+
+async def take_turn(tracker_store, sender_id, turn):
+    tracker = await tracker_store.get_or_create_tracker(sender_id)
+    tracker.update(UserUttered(f'i am in mitte {turn}', {'name': 'inform_location', 'confidence': 0.98}))
+    tracker.update(ActionExecuted('action_validate_location'))
+    tracker.update(SlotSet('district', 'Mitte'))
+    tracker.update(BotUttered('Location confirmed: Mitte'))
+    tracker.update(ActionExecuted('action_listen'))
+    await tracker_store.save(tracker)
+
+
+def worker(args, tmp, seed, start, results):
+    async def run():
+        lock_store, tracker_store = create_stores(args, tmp)
+        rng = random.Random(seed)
+        records = []
+
+        async def conversation(turns):
+            for turn in range(turns):
+                sender_id = f'sender-{rng.randrange(args.senders)}'
+                requested = time.monotonic()
+                async with lock_store.lock(sender_id) as lock:
+                    acquired = time.monotonic()
+                    await take_turn(tracker_store, sender_id, turn)
+                    await asyncio.sleep(args.hold / 1e3)
+                    released = time.monotonic()
+                    records.append((sender_id, lock.now_serving, requested, acquired, released))
+
+        per_task = max(1, args.turns // args.concurrency)
+        await asyncio.gather(*(conversation(per_task) for _ in range(args.concurrency)))
+        return records
+
+    start.wait()
+    results.put(asyncio.run(run()))
+
+
+async def uncontended_cost(store, rounds):
+    started = time.perf_counter()
+    for i in range(rounds):
+        async with store.lock(f'solo-{i % 16}'):
+            pass
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def check(records):
+    """Overlapping turns and out-of-order tickets per sender."""
+    overlaps = out_of_order = 0
+    by_sender = defaultdict(list)
+    for sender_id, ticket, requested, acquired, released in records:
+        by_sender[sender_id].append((acquired, released, ticket))
+    for turns in by_sender.values():
+        turns.sort()
+        for (_, previous_end, previous_ticket), (start, _, ticket) in zip(turns, turns[1:]):
+            if start < previous_end:
+                overlaps += 1
+            if ticket is not None and previous_ticket is not None and ticket < previous_ticket:
+                out_of_order += 1
+    return overlaps, out_of_order
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent turns per process')
+    parser.add_argument('--senders', type=int, default=8, help='conversations all processes compete for')
+    parser.add_argument('--turns', type=int, default=50, help='turns per process')
+    parser.add_argument('--hold', type=float, default=5.0, help='ms the lock is held after saving')
+    parser.add_argument('--lock-store', choices=('sqlite', 'memory'), default='sqlite')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lock_store, tracker_store = create_stores(args, tmp)
+        overhead_us = asyncio.run(uncontended_cost(lock_store, 2000))
+
+        context = multiprocessing.get_context('fork')
+        start = context.Barrier(args.processes + 1)
+        results = context.Queue()
+        processes = [context.Process(target=worker, args=(args, tmp, seed, start, results))
+                     for seed in range(args.processes)]
+        for process in processes:
+            process.start()
+        start.wait()
+        started = time.perf_counter()
+        records = [record for _ in processes for record in results.get()]
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+
+        turns_by_sender = defaultdict(int)
+        for record in records:
+            turns_by_sender[record[0]] += 1
+        lost = 0
+        for sender_id, turns in turns_by_sender.items():
+            tracker = asyncio.run(tracker_store.retrieve_full_tracker(sender_id))
+            stored = sum(isinstance(event, UserUttered) for event in tracker.events) if tracker else 0
+            lost += turns - stored
+
+    waits = sorted((acquired - requested) * 1e3 for _, _, requested, acquired, _ in records)
+    overlaps, out_of_order = check(records)
+    print(f"{args.lock_store} lock store: {args.processes} processes x {args.concurrency} concurrent turns "
+          f"on {args.senders} senders, {args.hold:.0f} ms hold")
+    print(f"uncontended acquire + release: {overhead_us:.0f} us")
+    held = sum(released - acquired for _, _, _, acquired, released in records)
+    print(f"{len(records)} turns in {elapsed:.2f}s: {len(records) / elapsed:.0f} acquisitions/s; "
+          f"locks held {held / (len(turns_by_sender) * elapsed):.0%} of the time, "
+          f"{held / len(records) * 1e3:.1f} ms per turn")
+    print(f"wait ms  p50 {statistics.median(waits):.1f}  p95 {waits[int(len(waits) * 0.95)]:.1f}  "
+          f"p99 {waits[int(len(waits) * 0.99)]:.1f}  max {waits[-1]:.1f}")
+    print(f"overlapping turns: {overlaps}  out of ticket order: {out_of_order}  lost turns: {lost}")
+    if args.lock_store == 'sqlite' and (overlaps or out_of_order or lost):
+        print("FAIL")
+        sys.exit(1)
+    print("OK" if not (overlaps or out_of_order or lost) else "violations expected with a per-process lock store")
+
+
+if __name__ == '__main__':
+    main()
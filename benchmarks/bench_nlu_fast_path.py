@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+NLU latency with and without the pre-NLU fast path (nlu/fast_path.py).
+
+Loads a trained model and parses --messages messages: a --button-share of
+button clicks (payloads, titles and district names from the domain and
+actions/templates/buttons.py) and, for the rest, examples from data/nlu.yml
+drawn with a Zipf-like skew, so a few utterances are frequent the way "help"
+or "yes" are. The stream goes once through the full pipeline (resolver
+bypassed, cache off) and once through the fast path. Prints per-message
+latency for both, the fast path's hit rate by kind and its own estimate of
+the time saved. Lists the buttons and districts for which the pipeline's
+reading differs from the table's (e.g. a district entity DIET misses), and
+exits non-zero if a cached parse differs from the full pipeline's intent and
+entities. Needs Rasa and a model trained with the fast path in its pipeline.
+
+Usage:
+    python benchmarks/bench_nlu_fast_path.py [--model models/crisis-bot.tar.gz] [--messages 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from unittest import mock
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PROJECT_DIR)
+
+from rasa.core.agent import Agent  # noqa: E402
+from rasa.shared.core.domain import Domain  # noqa: E402
+
+from nlu.fast_path import FAST_PATH_STATS, PARSE_CACHE, FastPathResolver, template_buttons  # noqa: E402
+from warmup import load_utterances  # noqa: E402
+
+
+def button_messages(domain_path):
+    domain = Domain.load(domain_path)
+    buttons = [button for responses in domain.responses.values() for response in responses
+               for button in response.get('buttons') or []] + template_buttons()
+    return sorted({text for button in buttons for text in (button['payload'], button['title'])})
+
+
+def message_stream(args):
+    rng = random.Random(args.seed)
+    buttons = button_messages(os.path.join(PROJECT_DIR, 'domain.yml'))
+    utterances = [text for examples in load_utterances(per_intent=20).values() for text in examples]
+    rng.shuffle(utterances)
+    # Zipf-like: the utterance ranked r is drawn with weight 1 / r
+    weights = [1 / rank for rank in range(1, len(utterances) + 1)]
+    return [rng.choice(buttons) if rng.random() < args.button_share else rng.choices(utterances, weights)[0]
+            for _ in range(args.messages)]
+
+
+def summary(parse):
+    return (parse['intent']['name'],
+            tuple(sorted((entity['entity'], str(entity['value'])) for entity in parse.get('entities', []))))
+
+
+def served_by(before, after):
+    for kind in ('payload', 'table', 'cache'):
+        if after[f'{kind}_hits'] > before[f'{kind}_hits']:
+            return kind
+    return 'pipeline'
+
+
+async def run(agent, messages):
+    latencies, parses, kinds = [], [], []
+    for text in messages:
+        before = FAST_PATH_STATS.stats()
+        started = time.perf_counter()
+        parse = await agent.parse_message(text)
+        latencies.append((time.perf_counter() - started) * 1e3)
+        parses.append(summary(parse))
+        kinds.append(served_by(before, FAST_PATH_STATS.stats()))
+    return latencies, parses, kinds
+
+
+def describe(name, latencies):
+    latencies = sorted(latencies)
+    return (f"{name:<10} mean {statistics.mean(latencies):6.2f} ms  p50 {statistics.median(latencies):6.2f}  "
+            f"p95 {latencies[int(len(latencies) * 0.95)]:6.2f}  total {sum(latencies) / 1e3:6.2f}s")
+
+
+async def main_async(args):
+    agent = Agent.load(args.model)
+    messages = message_stream(args)
+    # Trace DIET's graphs before timing anything
+    with mock.patch.object(FastPathResolver, 'lookup', return_value=None):
+        for text in messages[:50]:
+            await agent.parse_message(text)
+
+        cache_size = PARSE_CACHE.size
+        PARSE_CACHE.configure(0)
+        full_latencies, full_parses, _ = await run(agent, messages)
+    PARSE_CACHE.configure(cache_size)
+    FAST_PATH_STATS.reset()
+    fast_latencies, fast_parses, kinds = await run(agent, messages)
+
+    stats = FAST_PATH_STATS.stats()
+    print(f"{len(messages)} messages, {len(set(messages))} distinct, {args.button_share:.0%} button clicks")
+    print(describe('pipeline', full_latencies))
+    print(describe('fast path', fast_latencies))
+    print(f"hit rate {stats['hit_rate']:.1%}: {stats['payload_hits']} payloads, {stats['table_hits']} buttons and "
+          f"districts, {stats['cache_hits']} cached parses, {stats['misses']} misses "
+          f"({stats['cache_entries']} cache entries)")
+    print(f"saved {(sum(full_latencies) - sum(fast_latencies)) / 1e3:.2f}s measured, "
+          f"{(stats['saved_ms'] or 0) / 1e3:.2f}s estimated by the fast path")
+
+    different = sorted({(kind, text, full, fast) for text, full, fast, kind
+                        in zip(messages, full_parses, fast_parses, kinds) if full != fast})
+    corrected = [row for row in different if row[0] in ('payload', 'table')]
+    if corrected:
+        print(f"{len(corrected)} buttons or districts the pipeline reads differently from the table:")
+        for _, text, full, fast in corrected:
+            print(f"  {text!r}: pipeline {full}, table {fast}")
+    wrong = [row for row in different if row not in corrected]
+    for kind, text, full, fast in wrong:
+        print(f"  {text!r}: pipeline {full}, {kind} {fast}")
+    if wrong:
+        print(f"FAIL: {len(wrong)} cached or pipeline parses differ from the full pipeline")
+        sys.exit(1)
+    print("OK: cached parses match the full pipeline")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.path.join(PROJECT_DIR, 'models', 'crisis-bot.tar.gz'))
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--button-share', type=float, default=0.4, help='fraction of messages that are button clicks')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
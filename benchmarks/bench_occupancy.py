@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Assignment throughput and cross-worker consistency of the occupancy registry.
+
+Forks --workers processes that each rank candidates and reserve a shelter
+--assignments times, sharing one feed file the way action-server workers do.
+Workers compact the feed into its snapshot whenever it passes
+--compact-bytes. Every worker then catches up on the feed and reports its
+reservation totals, which must agree with each other, with a registry started
+afresh from the snapshot and feed, and with the number of assignments made.
+
+Usage:
+    python benchmarks/bench_occupancy.py [--workers 4] [--assignments 5000] [--compact-bytes 65536]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from actions.shelters.occupancy import OccupancyRegistry, shelter_id  # noqa: E402
+from actions.shelters.shelter_index import get_shelter_index  # noqa: E402
+
+# Alexanderplatz: everyone in a surge asking from the same spot
+SURGE_POINT = (52.5219, 13.4132)
+
+
+def totals_at(registry, candidates, compare_at):
+    return {shelter_id(match.shelter): registry.reserved(shelter_id(match.shelter), compare_at)
+            for match in candidates}
+
+
+def worker(feed_path, assignments, compact_bytes, start, results, compare_at):
+    registry = OccupancyRegistry(feed_path=feed_path, poll_interval=0)
+    candidates = get_shelter_index().nearest(*SURGE_POINT, k=12)
+    start.wait()
+    started = time.perf_counter()
+    for i in range(assignments):
+        if i % 100 == 0:
+            registry.poll_feed()
+            registry.compact(compact_bytes)
+        best = registry.rank(candidates, k=3)[0]
+        registry.reserve(shelter_id(best.shelter))
+    elapsed = time.perf_counter() - started
+    # Publish what the writer thread has not appended yet before the others catch up
+    registry.flush()
+    start.wait()
+    registry.poll_feed()
+    results.put((elapsed, registry.compactions, totals_at(registry, candidates, compare_at)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--assignments', type=int, default=5000, help='per worker')
+    parser.add_argument('--compact-bytes', type=int, default=64 * 1024, help='feed size that triggers compaction')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('fork')
+    with tempfile.TemporaryDirectory() as directory:
+        feed_path = os.path.join(directory, 'occupancy_feed.jsonl')
+        start = context.Barrier(args.workers)
+        # Totals are compared decayed to one common instant
+        compare_at = time.time()
+        results = context.Queue()
+        processes = [context.Process(target=worker, args=(feed_path, args.assignments, args.compact_bytes, start,
+                                                          results, compare_at))
+                     for _ in range(args.workers)]
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        # A worker started now loads the snapshot and only replays what was appended since
+        restarted = OccupancyRegistry(feed_path=feed_path, poll_interval=0)
+        replayed = restarted.poll_feed()
+        candidates = get_shelter_index().nearest(*SURGE_POINT, k=12)
+        reports.append((0.0, 0, totals_at(restarted, candidates, compare_at)))
+
+    total = args.workers * args.assignments
+    slowest = max(elapsed for elapsed, _, _ in reports)
+    compactions = sum(count for _, count, _ in reports)
+    print(f"{total} assignments by {args.workers} workers in {slowest:.2f} s "
+          f"({total / slowest:,.0f} assignments/s)")
+    print(f"{compactions} compactions; a fresh registry replayed {replayed} feed lines")
+
+    reference = reports[0][2]
+    for _, _, totals in reports:
+        for key, value in totals.items():
+            if abs(value - reference[key]) > 1e-6 * total:
+                print(f"FAIL: workers disagree on {key}: {value:.3f} != {reference[key]:.3f}")
+                sys.exit(1)
+    # Decayed back to compare_at, later reservations count very slightly more than one person
+    reserved = sum(reference.values())
+    if abs(reserved - total) > 0.01 * total:
+        print(f"FAIL: {reserved:.1f} reserved for {total} assignments")
+        sys.exit(1)
+    print("consistency: all workers and a fresh registry agree")
+    for key, value in sorted(reference.items(), key=lambda item: -item[1]):
+        if value >= 0.5:
+            print(f"  {value:8.1f}  {key}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+The Aho-Corasick phrase matcher versus the any(phrase in text) loops it replaced.
+
+Checks that the location heuristics in ActionValidateLocation give the same
+answers as before for a corpus of messages, and that status extraction only
+differs where negation scope is now honoured (listed in SCOPED_NEGATION_CHANGES).
+Then reports per-message latency of both.
+
+Usage:
+    python benchmarks/bench_phrase_matcher.py [--repeat 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from actions.safety.assess_status import extract_status_from_text, status_from_phrases  # noqa: E402
+from actions.utils.constants import PHRASE_SETS  # noqa: E402
+from actions.utils.phrase_matcher import PHRASE_MATCHER  # noqa: E402
+
+MESSAGES = [
+    "i'm safe", 'we are safe now', "i'm not injured", 'not hurt, just scared', 'no injuries here',
+    "i'm injured", 'my leg is broken', 'i am bleeding', "we're trapped under debris", "i can't get out",
+    'stuck in the elevator', 'i am okay', "i'm fine thanks", 'all good', 'not okay', "i'm not safe",
+    'never been better', 'ok', 'okay', 'got it', 'yes', 'sure', 'alright', 'kreuzberg', 'mitte please',
+    'i am in neukölln near the park', '10115', 'help', 'what should i do', "i don't know", 'hello',
+    'hi there', 'thank you', 'maybe charlottenburg', 'which way to the shelter', 'this is wedding',
+    'i think spandau', 'in pain but safe', "i'm all set", 'well', 'nothing happened to me',
+    "i don't know, i'm hurt", 'no, i am hurt', 'i know i am fine', 'is it safe to go outside',
+    'friedrichshain, near ostkreuz', 'we are at the hospital in steglitz',
+    'nobody is hurt', 'nobody got hurt', 'none of us are hurt', "nobody's injured", "we're all fine, nobody hurt",
+    "no one is injured", "i can't say i'm hurt", "we couldn't be better", "it isn't safe here", "i'm not ok",
+]
+
+# Messages whose status deliberately changes: negations are now whole words
+# ("now", "know" no longer count) and only apply within their own clause.
+# Values are (legacy, matcher).
+SCOPED_NEGATION_CHANGES = {
+    'we are safe now': ('injured', 'safe'),
+    "i don't know, i'm hurt": ('safe', 'injured'),
+    'no, i am hurt': ('safe', 'injured'),
+    'i know i am fine': ('injured', 'safe'),
+}
+
+LEGACY_STATUS_INDICATORS = PHRASE_SETS['status_report']
+LEGACY_ACKNOWLEDGMENTS = PHRASE_SETS['acknowledgment']
+LEGACY_NON_LOCATION = PHRASE_SETS['non_location']
+LEGACY_LOCATION_REQUEST = PHRASE_SETS['location_request']
+
+
+def legacy_location_flags(text):
+    """The substring loops ActionValidateLocation used to run."""
+    return (
+        any(indicator in text for indicator in LEGACY_STATUS_INDICATORS),
+        any(word == text for word in LEGACY_ACKNOWLEDGMENTS),
+        any(phrase in text for phrase in LEGACY_NON_LOCATION),
+        any(phrase in text for phrase in LEGACY_LOCATION_REQUEST),
+    )
+
+
+def matcher_location_flags(text):
+    phrases = PHRASE_MATCHER.scan(text)
+    return (phrases.has('status_report'), phrases.is_exactly('acknowledgment'),
+            phrases.has('non_location'), phrases.has('location_request'))
+
+
+def legacy_status(text):
+    """The status extraction ActionAssessStatus used to run."""
+    negations = ['not', 'no', "n't", "aren't", "isn't", "don't", 'never']
+    safe_indicators = ['safe', 'fine', 'okay', 'ok', 'good', 'well', 'alright', "i'm all set"]
+    injury_indicators = ['injured', 'hurt', 'bleeding', 'wounded', 'broken', "i'm injured", 'i am injured',
+                         "i'm hurt", 'i am hurt', 'got hurt', 'got injured', 'in pain', 'have injuries',
+                         'injuries']
+    trapped_indicators = ['trapped', "i'm trapped", "we're trapped", 'i am trapped', 'we are trapped', 'stuck',
+                          "can't get out"]
+
+    has_negation = any(word in text for word in negations)
+    has_safe = any(word in text for word in safe_indicators)
+    has_injury = any(word in text for word in injury_indicators)
+    has_trapped = any(phrase in text for phrase in trapped_indicators)
+
+    if has_trapped:
+        return 'trapped'
+    elif has_negation and has_injury:
+        return 'safe'
+    elif has_negation and has_safe:
+        return 'injured'
+    elif has_injury:
+        return 'injured'
+    elif has_safe:
+        return 'safe'
+    return None
+
+
+def check_equivalence():
+    failures = []
+    for text in MESSAGES:
+        if legacy_location_flags(text) != matcher_location_flags(text):
+            failures.append(f"location flags differ for {text!r}: "
+                            f"{legacy_location_flags(text)} != {matcher_location_flags(text)}")
+
+        old, new = legacy_status(text), extract_status_from_text(text)
+        if text in SCOPED_NEGATION_CHANGES:
+            if (old, new) != SCOPED_NEGATION_CHANGES[text]:
+                failures.append(f"status for {text!r}: expected {SCOPED_NEGATION_CHANGES[text]}, got {(old, new)}")
+        elif old != new:
+            failures.append(f"status differs for {text!r}: legacy={old} matcher={new}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    failures = check_equivalence()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"equivalence: {len(MESSAGES)} messages OK "
+          f"({len(SCOPED_NEGATION_CHANGES)} with intended negation-scope changes)")
+
+    def legacy_all(text):
+        legacy_location_flags(text)
+        legacy_status(text)
+
+    def matcher_all(text):
+        # One scan serves both actions' checks
+        phrases = PHRASE_MATCHER.scan(text)
+        phrases.has('status_report')
+        phrases.is_exactly('acknowledgment')
+        phrases.has('non_location')
+        status_from_phrases(phrases)
+
+    # Long free-text messages are where one pass beats a loop per phrase
+    long_messages = [' '.join(MESSAGES[i:i + 8]) for i in range(0, len(MESSAGES), 8)]
+    for corpus_label, corpus in (('short', MESSAGES), ('long', long_messages)):
+        for label, func in (('legacy loops', legacy_all), ('phrase matcher', matcher_all)):
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                for text in corpus:
+                    func(text)
+            elapsed = time.perf_counter() - started
+            print(f"{corpus_label:<6} {label:<16} {elapsed / (args.repeat * len(corpus)) * 1e6:8.2f} us/message")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Throughput of the pre-forked action server from 1 to N workers.
+
+For each --workers count, starts `python -m actions.server --workers N`,
+waits for it to answer, and has --clients load processes post a mix of
+CPU-bound action calls (typo'd districts, long free text, status
+assessment, shelter ranking) to /webhook with --connections requests in
+flight for --duration seconds. Prints requests per second, latency, the
+speed-up over the first worker count, and the total PSS of the server's
+processes, which stays well below N times one worker while data pages are
+shared copy-on-write. Scaling is bounded by the cores available to the run;
+the load processes need cores of their own.
+
+Usage:
+    python benchmarks/bench_prefork.py [--workers 1 2 4] [--duration 10] [--connections 32]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import aiohttp
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from actions.utils.synthetic_tracker import location_request_events, synthetic_tracker  # noqa: E402
+
+LONG_TEXT = ("hi, we had to leave the flat in a hurry after the shaking started, my neighbour says we are "
+             "somewhere around the big park near friedrichshian, not sure exactly, please help us find somewhere")
+COORDS = {'lat': 52.5200, 'lng': 13.4050}
+
+
+def action_calls():
+    """(action name, tracker) pairs with the most CPU work per call."""
+    return [
+        ('action_validate_location', synthetic_tracker('Kreuzbreg', 'inform_location',
+                                                       events=location_request_events())),
+        ('action_validate_location', synthetic_tracker(LONG_TEXT, 'inform_location',
+                                                       events=location_request_events())),
+        ('action_assess_status', synthetic_tracker('my leg is hurt and my friend cannot walk, we are stuck',
+                                                   'nlu_fallback',
+                                                   slots={'status_asked': True, 'emergency_type': 'earthquake',
+                                                          'district': 'Mitte'})),
+        ('action_find_nearest_shelters', synthetic_tracker('shelter with wheelchair access', 'request_shelter_info',
+                                                           slots={'district': 'Mitte', 'location_coords': COORDS,
+                                                                  'emergency_type': 'flood'})),
+    ]
+
+
+def payloads():
+    return [{'next_action': name, 'sender_id': tracker.sender_id, 'tracker': tracker.current_state(),
+             'domain': {}, 'version': '3.6.13'} for name, tracker in action_calls()]
+
+
+def client(url, connections, duration, start, results):
+    async def run():
+        calls = payloads()
+        latencies = []
+        errors = 0
+        deadline = time.perf_counter() + duration
+
+        async def connection(session, offset):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    async with session.post(f'{url}/webhook', json=calls[i % len(calls)]) as response:
+                        await response.read()
+                        if response.status != 200:
+                            errors += 1
+                            continue
+                except aiohttp.ClientError:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1e3)
+                i += 1
+
+        connector = aiohttp.TCPConnector(limit=connections)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(*(connection(session, offset) for offset in range(connections)))
+        return latencies, errors
+
+    start.wait()
+    results.put(asyncio.run(run()))
+
+
+def process_tree(pid):
+    pids = [pid]
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children', 'r') as f:
+            children = [int(child) for child in f.read().split()]
+    except OSError:
+        children = []
+    for child in children:
+        pids.extend(process_tree(child))
+    return pids
+
+
+def total_pss_mb(pid):
+    total = 0
+    for member in process_tree(pid):
+        try:
+            with open(f'/proc/{member}/smaps_rollup', 'r') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('Pss:'))
+        except (OSError, StopIteration):
+            return None
+    return total / 1024
+
+
+def wait_until_up(url, process, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"action server exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(f'{url}/health', timeout=2):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.5)
+    sys.exit(f"{url} did not come up in time")
+
+
+def measure(args, workers, feed_path):
+    url = f'http://127.0.0.1:{args.port}'
+    # No network: shelter reservations go to a scratch feed and Nominatim is unreachable
+    env = dict(os.environ, ACTIONS_OCCUPANCY_FEED=feed_path, NOMINATIM_URL='http://127.0.0.1:9')
+    server = subprocess.Popen([sys.executable, '-m', 'actions.server', '--port', str(args.port),
+                               '--workers', str(workers)], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(url, server, args.startup_timeout)
+        # Give every worker time to finish its warm-up
+        time.sleep(1.0 + 0.2 * workers)
+        context = multiprocessing.get_context('fork')
+        start = context.Barrier(args.clients + 1)
+        results = context.Queue()
+        clients = [context.Process(target=client, args=(url, max(1, args.connections // args.clients),
+                                                         args.duration, start, results))
+                   for _ in range(args.clients)]
+        for process in clients:
+            process.start()
+        start.wait()
+        started = time.perf_counter()
+        outcomes = [results.get() for _ in clients]
+        elapsed = time.perf_counter() - started
+        pss = total_pss_mb(server.pid)
+        for process in clients:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+    latencies = sorted(latency for outcome in outcomes for latency in outcome[0])
+    errors = sum(outcome[1] for outcome in outcomes)
+    return {
+        'workers': workers,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) if latencies else float('nan'),
+        'p95_ms': latencies[int(len(latencies) * 0.95)] if latencies else float('nan'),
+        'pss_mb': pss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    default_workers = sorted({1, 2, os.cpu_count() or 1})
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load per worker count')
+    parser.add_argument('--connections', type=int, default=32, help='requests in flight across all clients')
+    parser.add_argument('--clients', type=int, default=2, help='load-generating processes')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--startup-timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores; {args.clients} client processes, {args.connections} connections, "
+          f"{args.duration:.0f}s per run\n")
+    print(f"{'workers':>7} {'req/s':>9} {'speed-up':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'PSS MB':>8}")
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in args.workers:
+            row = measure(args, workers, os.path.join(tmp, f'occupancy-{workers}.jsonl'))
+            rows.append(row)
+            speed_up = row['rps'] / rows[0]['rps'] if rows[0]['rps'] else float('nan')
+            pss = f"{row['pss_mb']:.0f}" if row['pss_mb'] is not None else 'n/a'
+            print(f"{workers:>7} {row['rps']:>9.0f} {speed_up:>8.2f}x {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+                  f"{row['errors']:>7} {pss:>8}", flush=True)
+    if any(row['errors'] for row in rows):
+        print("FAIL: some requests failed")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Memory and query latency of the columnar shelter store at city-wide scale.
+
+Generates synthetic shelter data (random sites across Berlin with the real
+facility vocabulary) at each size and compares the nested dict-of-lists the
+JSON parses into with the columnar store: resident memory, build and prebuilt
+load time, and nearest / radius / facility-filtered query latency. A plain
+Python scan over the dicts is timed as the baseline query.
+
+Usage:
+    python benchmarks/bench_shelter_store.py [--sizes 1000 10000 100000] [--queries 200]
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from actions.shelters.shelter_index import EARTH_RADIUS_KM, ShelterIndex  # noqa: E402
+from actions.shelters.shelter_store import ShelterStore  # noqa: E402
+from actions.utils.constants import get_emergency_data  # noqa: E402
+
+BERLIN_BOUNDS = (52.34, 52.67, 13.09, 13.76)
+RADIUS_KM = 1.0
+FILTER = ('Medical Care', 'Wheelchair Access')
+
+
+def synthetic_data(size, seed=0):
+    rng = random.Random(seed)
+    facilities = sorted({facility for shelters in get_emergency_data()['shelters'].values()
+                         for shelter in shelters for facility in shelter.get('facilities', [])})
+    districts = list(get_emergency_data()['shelters'])
+    min_lat, max_lat, min_lng, max_lng = BERLIN_BOUNDS
+    shelters = {district: [] for district in districts}
+    for i in range(size):
+        district = rng.choice(districts)
+        shelters[district].append({
+            'name': f"{district} Site {i}",
+            'address': f"Teststraße {i % 300 + 1}, 1{i % 9000:04d} Berlin",
+            'phone': f"+49 30 {i:07d}",
+            'capacity': rng.randrange(50, 1500),
+            'facilities': rng.sample(facilities, rng.randrange(1, 6)),
+            'coordinates': {'lat': rng.uniform(min_lat, max_lat), 'lng': rng.uniform(min_lng, max_lng)},
+        })
+    return {'shelters': shelters}
+
+
+def measure_memory(build):
+    """Bytes still allocated by the object build() returns, and the object."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, result
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def dict_scan_nearest(data, lat, lng, k):
+    scored = []
+    for district, shelters in data['shelters'].items():
+        for shelter in shelters:
+            coords = shelter['coordinates']
+            scored.append((haversine_km(lat, lng, coords['lat'], coords['lng']), shelter['name']))
+    scored.sort()
+    return scored[:k]
+
+
+def time_per_call(func, points):
+    started = time.perf_counter()
+    for lat, lng in points:
+        func(lat, lng)
+    return (time.perf_counter() - started) / len(points) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    min_lat, max_lat, min_lng, max_lng = BERLIN_BOUNDS
+    points = [(rng.uniform(min_lat, max_lat), rng.uniform(min_lng, max_lng)) for _ in range(args.queries)]
+
+    print(f"{'shelters':>9} {'dicts MB':>9} {'store MB':>9} {'build ms':>9} {'load ms':>8} "
+          f"{'nearest us':>11} {'radius us':>10} {'filtered us':>12} {'dict scan us':>13}")
+    for size in args.sizes:
+        payload = json.dumps(synthetic_data(size), ensure_ascii=False)
+        dict_bytes, data = measure_memory(lambda: json.loads(payload))
+
+        store_bytes, store = measure_memory(lambda: ShelterStore.from_data(data))
+        started = time.perf_counter()
+        ShelterStore.from_data(data)
+        build_ms = (time.perf_counter() - started) * 1e3
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'shelters.npz')
+            store.save(path)
+            started = time.perf_counter()
+            ShelterStore.load(path)
+            load_ms = (time.perf_counter() - started) * 1e3
+
+        index = ShelterIndex(store)
+        nearest_us = time_per_call(lambda lat, lng: index.nearest(lat, lng, k=12), points)
+        radius_us = time_per_call(lambda lat, lng: index.within_radius(lat, lng, RADIUS_KM, limit=12), points)
+        filtered_us = time_per_call(lambda lat, lng: index.nearest(lat, lng, k=12, facilities=FILTER), points)
+        scan_points = points[:max(1, min(len(points), 2_000_000 // size))]
+        scan_us = time_per_call(lambda lat, lng: dict_scan_nearest(data, lat, lng, 12), scan_points)
+
+        print(f"{size:>9} {dict_bytes / 1e6:>9.1f} {store_bytes / 1e6:>9.1f} {build_ms:>9.0f} {load_ms:>8.1f} "
+              f"{nearest_us:>11.0f} {radius_us:>10.0f} {filtered_us:>12.0f} {scan_us:>13.0f}")
+
+
+if __name__ == '__main__':
+    main()
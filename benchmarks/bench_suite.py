@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+In-process micro-benchmarks of the action server's hot paths, with baselines.
+
+Runs each case on synthetic trackers and a CollectingDispatcher (no Rasa
+server): ActionValidateLocation.run per input class, ActionAssessStatus.run,
+ActionFindNearestShelters.run, fuzzy_match_district, get_emergency_type over
+10/100/1000-event histories, and every formatter in templates/messages.py,
+both rendered and served from the render cache. Prints the median and best
+per-call time of --rounds rounds.
+
+--save NAME stores the medians as benchmarks/baselines/NAME.json; --compare
+NAME flags every case slower than the baseline by more than --threshold and
+exits non-zero if there is any. Baselines are only comparable on the machine
+that recorded them.
+
+Usage:
+    python benchmarks/bench_suite.py [--filter validate] [--rounds 7] [--min-time 0.05]
+    python benchmarks/bench_suite.py --save main
+    python benchmarks/bench_suite.py --compare main --threshold 0.15
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+sys.path.insert(0, PROJECT_DIR)
+
+# Shelter reservations made by the benchmark must not reach the shared occupancy feed
+os.environ['ACTIONS_OCCUPANCY_FEED'] = os.path.join(tempfile.mkdtemp(), 'occupancy_feed.jsonl')
+
+from rasa_sdk.executor import CollectingDispatcher  # noqa: E402
+
+from actions import ActionAssessStatus, ActionFindNearestShelters, ActionValidateLocation  # noqa: E402
+from actions.templates import messages  # noqa: E402
+from actions.utils.constants import SHELTER_DATA  # noqa: E402
+from actions.utils.emergency_helpers import fuzzy_match_district, get_emergency_type  # noqa: E402
+from actions.utils.synthetic_tracker import (  # noqa: E402
+    location_request_events,
+    synthetic_events,
+    synthetic_tracker,
+)
+
+LONG_TEXT = ("we left the flat when the water came up the stairs and walked for maybe twenty minutes along the "
+             "canal past the old brewery and a big park, my phone is almost dead and i think we are somewhere "
+             "in kreuzberg near the bridge but i am not completely sure")
+
+VALIDATE_INPUTS = {
+    'exact district': dict(text='Mitte', intent='inform_location'),
+    'typo': dict(text='Kreuzbreg', intent='inform_location'),
+    'postcode': dict(text='my postcode is 10115', intent='inform_location',
+                     entities=[{'entity': 'postcode', 'value': '10115'}]),
+    'gps': dict(text='sharing my gps location', intent='share_gps_location',
+                metadata={'location_coords': {'lat': 52.5200, 'lng': 13.4050}}),
+    'long free text': dict(text=LONG_TEXT, intent='inform_location'),
+}
+
+ASSESS_INPUTS = {
+    'intent': dict(text="i'm safe", intent='report_safe'),
+    'free text': dict(text='my leg is hurt but i can walk', intent='nlu_fallback', slots={'status_asked': True}),
+}
+
+
+def action_case(action, tracker):
+    async def call():
+        await action.run(CollectingDispatcher(), tracker, {})
+    return call
+
+
+def build_cases():
+    """(name, callable) pairs; callables may be coroutine functions."""
+    cases = []
+    validate = ActionValidateLocation()
+    for label, inputs in VALIDATE_INPUTS.items():
+        tracker = synthetic_tracker(events=location_request_events(), **inputs)
+        cases.append((f'validate_location[{label}]', action_case(validate, tracker)))
+
+    assess = ActionAssessStatus()
+    for label, inputs in ASSESS_INPUTS.items():
+        cases.append((f'assess_status[{label}]', action_case(assess, synthetic_tracker(**inputs))))
+
+    find = ActionFindNearestShelters()
+    find_inputs = {
+        'district': dict(slots={'district': 'Mitte'}),
+        'coords': dict(slots={'district': 'Mitte', 'location_coords': {'lat': 52.52, 'lng': 13.405}}),
+        'coords + facility': dict(text='shelter with wheelchair access', intent='request_shelter_info',
+                                  slots={'district': 'Mitte', 'location_coords': {'lat': 52.52, 'lng': 13.405}}),
+    }
+    for label, inputs in find_inputs.items():
+        cases.append((f'find_nearest_shelters[{label}]', action_case(find, synthetic_tracker(**inputs))))
+
+    for text in ('Mitte', 'Kreuzbreg', 'charlotenburg wilmersdorf', 'somewhere unknown'):
+        cases.append((f'fuzzy_match_district[{text}, cached]', lambda text=text: fuzzy_match_district(text)))
+        cases.append((f'fuzzy_match_district[{text}, match]',
+                      lambda text=text: fuzzy_match_district.__wrapped__(text)))
+
+    for count in (10, 100, 1000):
+        events = synthetic_events(count)
+        cached = synthetic_tracker(events=events, sender_id=f'bench-history-{count}')
+        cases.append((f'get_emergency_type[{count} events, cached]', lambda tracker=cached: get_emergency_type(tracker)))
+        counter = iter(range(10 ** 9))
+        # A new conversation every call, so the whole history is summarised
+        cases.append((f'get_emergency_type[{count} events, new]',
+                      lambda events=events, counter=counter: get_emergency_type(
+                          synthetic_tracker(events=events, sender_id=f'bench-new-{count}-{next(counter)}'))))
+
+    index = SHELTER_DATA.snapshot().derived['shelter_index']
+    matches = index.nearest(52.52, 13.405, k=3)
+    formatters = [
+        ('get_emergency_emoji', lambda: messages.get_emergency_emoji('flood')),
+        ('format_emergency_contacts', messages.format_emergency_contacts),
+        ('format_shelter_info', lambda: messages.format_shelter_info('Mitte')),
+        ('format_shelter_info[explicit list]',
+         lambda: messages.format_shelter_info('Mitte', [match.shelter for match in matches])),
+        ('format_nearest_shelters', lambda: messages.format_nearest_shelters(matches, ('Wheelchair Access',))),
+        ('format_safety_instructions', lambda: messages.format_safety_instructions('flood', 'Mitte')),
+        ('format_earthquake_instructions_immediate', messages.format_earthquake_instructions_immediate),
+    ]
+    for name, call in formatters:
+        cases.append((f'messages.{name}', call))
+    # The cached renderers again, bypassing the cache
+    uncached = [
+        ('format_emergency_contacts', lambda: messages.format_emergency_contacts.__wrapped__()),
+        ('format_shelter_info', lambda: messages._render_shelter_info(
+            'Mitte', SHELTER_DATA.snapshot().data['shelters']['Mitte'])),
+        ('format_safety_instructions', lambda: messages.format_safety_instructions.__wrapped__('flood', 'Mitte')),
+        ('format_earthquake_instructions_immediate',
+         lambda: messages.format_earthquake_instructions_immediate.__wrapped__()),
+    ]
+    for name, call in uncached:
+        cases.append((f'messages.{name}[render]', call))
+    return cases
+
+
+def time_case(call, rounds, min_time, loop):
+    """Per-call seconds of each round; a round repeats the call for at least min_time."""
+    is_async = inspect.iscoroutinefunction(call)
+
+    async def repeat_async(number):
+        for _ in range(number):
+            await call()
+
+    def repeat(number):
+        started = time.perf_counter()
+        if is_async:
+            loop.run_until_complete(repeat_async(number))
+        else:
+            for _ in range(number):
+                call()
+        return time.perf_counter() - started
+
+    number = 1
+    # Calibrate (and warm up) until one round takes min_time
+    while True:
+        elapsed = repeat(number)
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    return [repeat(number) / number for _ in range(rounds)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', help='only cases whose name contains this')
+    parser.add_argument('--rounds', type=int, default=7)
+    parser.add_argument('--min-time', type=float, default=0.05, help='seconds per round')
+    parser.add_argument('--save', metavar='NAME', help='store the results as baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='compare with baselines/NAME.json')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative slowdown over the baseline that counts as a regression')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINES_DIR, f'{args.compare}.json'), 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['cases']
+
+    # One loop for every case, as in the action server
+    loop = asyncio.new_event_loop()
+    results = {}
+    regressions = []
+    header = f"{'case':<62} {'median us':>10} {'best us':>10}"
+    print(header + (f" {'baseline us':>12} {'change':>8}" if baseline else ''))
+    for name, call in build_cases():
+        if args.filter and args.filter not in name:
+            continue
+        timings = time_case(call, args.rounds, args.min_time, loop)
+        median_us, best_us = statistics.median(timings) * 1e6, min(timings) * 1e6
+        results[name] = {'median_us': round(median_us, 3), 'best_us': round(best_us, 3)}
+        line = f"{name:<62} {median_us:>10.2f} {best_us:>10.2f}"
+        if baseline and name in baseline:
+            before = baseline[name]['median_us']
+            change = (median_us - before) / before if before else 0.0
+            flag = '  REGRESSION' if change > args.threshold else ''
+            if flag:
+                regressions.append(name)
+            line += f" {before:>12.2f} {change:>+8.1%}{flag}"
+        print(line, flush=True)
+
+    if args.save:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        path = os.path.join(BASELINES_DIR, f'{args.save}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'cases': results}, f, indent=2)
+        print(f"\nbaseline saved to {os.path.relpath(path)}")
+    if regressions:
+        print(f"\n{len(regressions)} case(s) more than {args.threshold:.0%} slower than '{args.compare}':")
+        for name in regressions:
+            print(f"  {name}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
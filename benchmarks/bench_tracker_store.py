@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Turn throughput of the sharded write-behind tracker store against Rasa's
+stock SQL tracker store on a single SQLite file.
+
+Simulates --conversations concurrent users taking --turns turns each; every
+turn is the retrieve / update / save cycle the Rasa processor runs. Afterwards
+the sharded store is reopened from disk to check that no event was lost once
+flushed.
+
+Then grows one conversation to --session-turns turns with and without
+compaction, printing retrieve latency and tracker length as it grows, and
+checks that the compacted tracker has the same slots and the full tracker the
+same events as the uncompacted one. Needs Rasa installed.
+
+Usage:
+    python benchmarks/bench_tracker_store.py [--conversations 500] [--turns 10] [--shards 8]
+                                             [--session-turns 1000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PROJECT_DIR)
+
+from rasa.core.tracker_store import SQLTrackerStore  # noqa: E402
+from rasa.shared.core.domain import Domain  # noqa: E402
+from rasa.shared.core.events import ActionExecuted, BotUttered, SlotSet, UserUttered  # noqa: E402
+
+from stores.tracker_store import ShardedSQLiteTrackerStore  # noqa: E402
+
+# Events of one turn: the user's message, a custom action setting a slot and replying, then listening
+TURN_EVENTS = 5
+
+
+async def take_turn(store, sender_id, turn):
+    tracker = await store.get_or_create_tracker(sender_id)
+    tracker.update(UserUttered(f'i am in mitte {turn}', {'name': 'provide_location', 'confidence': 0.98}))
+    tracker.update(ActionExecuted('action_validate_location'))
+    tracker.update(SlotSet('district', 'Mitte'))
+    tracker.update(BotUttered('📍 Location confirmed: Mitte'))
+    tracker.update(ActionExecuted('action_listen'))
+    await store.save(tracker)
+
+
+async def run(store, conversations, turns):
+    async def conversation(index):
+        for turn in range(turns):
+            await take_turn(store, f'user-{index}', turn)
+            # Let other conversations interleave, as concurrent requests do
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(conversation(index) for index in range(conversations)))
+    return time.perf_counter() - started
+
+
+def without_timestamps(events):
+    # The two stores were fed at different times
+    return [{key: value for key, value in event.as_dict().items() if key != 'timestamp'} for event in events]
+
+
+async def grow_session(store, turns, checkpoints):
+    """Retrieve latency (ms, averaged over 20 retrieves) and tracker length at each checkpoint turn."""
+    results = []
+    for turn in range(turns):
+        await take_turn(store, 'long-session', turn)
+        if turn + 1 in checkpoints:
+            started = time.perf_counter()
+            for _ in range(20):
+                tracker = await store.retrieve('long-session')
+            results.append(((time.perf_counter() - started) / 20 * 1e3, len(tracker.events)))
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=500)
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--shards', type=int, default=8)
+    parser.add_argument('--session-turns', type=int, default=1000)
+    args = parser.parse_args()
+
+    domain = Domain.load(os.path.join(PROJECT_DIR, 'domain.yml'))
+    total_turns = args.conversations * args.turns
+
+    with tempfile.TemporaryDirectory() as directory:
+        stock = SQLTrackerStore(domain, dialect='sqlite', db=os.path.join(directory, 'tracker.db'))
+        elapsed = await run(stock, args.conversations, args.turns)
+        print(f"{'SQLTrackerStore (sqlite)':<28} {total_turns / elapsed:10,.0f} turns/s")
+
+        shard_dir = os.path.join(directory, 'trackers')
+        sharded = ShardedSQLiteTrackerStore(domain, db_dir=shard_dir, shards=args.shards)
+        elapsed = await run(sharded, args.conversations, args.turns)
+        sharded.flush()
+        print(f"{f'ShardedSQLite ({args.shards} shards)':<28} {total_turns / elapsed:10,.0f} turns/s  "
+              f"{sharded.stats()}")
+
+        reopened = ShardedSQLiteTrackerStore(domain, db_dir=shard_dir, shards=args.shards)
+        expected = 1 + args.turns * TURN_EVENTS
+        for index in range(args.conversations):
+            tracker = await reopened.retrieve(f'user-{index}')
+            if tracker is None or len(tracker.events) != expected:
+                found = len(tracker.events) if tracker else 0
+                print(f"FAIL: user-{index} has {found} events on disk, expected {expected}")
+                sys.exit(1)
+        print(f"durability: all {args.conversations} conversations complete on disk after flush")
+
+        checkpoints = sorted({max(1, args.session_turns * share // 100) for share in (5, 25, 50, 100)})
+        plain = ShardedSQLiteTrackerStore(domain, db_dir=os.path.join(directory, 'plain'), snapshot_every=0)
+        compacted = ShardedSQLiteTrackerStore(domain, db_dir=os.path.join(directory, 'compacted'))
+        plain_results = await grow_session(plain, args.session_turns, checkpoints)
+        compacted_results = await grow_session(compacted, args.session_turns, checkpoints)
+        print(f"\n{'turns':>7} {'plain ms':>9} {'events':>7} {'compacted ms':>13} {'events':>7}")
+        for turns, (plain_ms, plain_events), (compacted_ms, compacted_events) in zip(
+                checkpoints, plain_results, compacted_results):
+            print(f"{turns:>7} {plain_ms:>9.2f} {plain_events:>7} {compacted_ms:>13.2f} {compacted_events:>7}")
+        print(compacted.stats())
+
+        expected_tracker = await plain.retrieve('long-session')
+        tracker = await compacted.retrieve('long-session')
+        if tracker.current_slot_values() != expected_tracker.current_slot_values():
+            print("FAIL: compacted tracker has different slot values")
+            sys.exit(1)
+        full = await compacted.retrieve_full_tracker('long-session')
+        if without_timestamps(full.events) != without_timestamps(expected_tracker.events):
+            print("FAIL: full tracker differs from the uncompacted history")
+            sys.exit(1)
+        print(f"compaction: same slots, full history of {len(full.events)} events intact")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
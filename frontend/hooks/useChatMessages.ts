@@ -38,6 +38,11 @@ export function useChatMessages(sessionId: string) {
    * Convert Rasa response to Message format
    */
   const rasaToMessage = useCallback((response: RasaMessage): Message | null => {
+    const pace = response.custom?.pace;
+    if (pace && typeof pace.delay_ms === 'number') {
+      return { ...createMessage('', false), paceMs: pace.delay_ms };
+    }
+
     const hasText = response.text && response.text.trim();
     const hasButtons = response.buttons && response.buttons.length > 0;
     
@@ -76,7 +81,7 @@ export function useChatMessages(sessionId: string) {
         .map(rasaToMessage)
         .filter((msg): msg is Message => msg !== null);
 
-      return botMessages.length > 0 
+      return botMessages.some(msg => msg.paceMs === undefined)
         ? botMessages 
         : [createMessage(ERROR_MESSAGES.NO_RESPONSE, false)];
     } catch (error) {
@@ -51,12 +51,21 @@ export function useMessageQueue(): UseMessageQueueReturn {
       // new ones are added while processing
       while (messageQueueRef.current.length > 0) {
         const message = messageQueueRef.current.shift();
-        if (message) {
-          onMessage(message);
-          // Wait before showing next message (except for the last one)
+        if (!message) {
+          continue;
+        }
+        if (message.paceMs !== undefined) {
+          // Server pacing hint: wait the requested time instead of the default delay
           if (messageQueueRef.current.length > 0) {
-            await new Promise(resolve => setTimeout(resolve, MESSAGE_DELAY));
+            await new Promise(resolve => setTimeout(resolve, message.paceMs));
           }
+          continue;
+        }
+        onMessage(message);
+        // Wait before showing next message (except for the last one, or when a pacing hint follows)
+        const next = messageQueueRef.current[0];
+        if (next && next.paceMs === undefined) {
+          await new Promise(resolve => setTimeout(resolve, MESSAGE_DELAY));
         }
       }
     } finally {
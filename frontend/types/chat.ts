@@ -9,6 +9,8 @@ export interface Message {
   isUser: boolean;
   timestamp: Date;
   buttons?: Array<{ title: string; payload: string }>;
+  // Pacing hint from the server: not shown, holds the next message back this long
+  paceMs?: number;
 }
 
 export interface Button {
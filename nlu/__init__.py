@@ -0,0 +1,17 @@
+from .fast_path import (
+    FAST_PATH_STATS,
+    PARSE_CACHE,
+    FastPathCollector,
+    FastPathResolver,
+    ParseCache,
+    normalise,
+)
+
+__all__ = [
+    'FAST_PATH_STATS',
+    'PARSE_CACHE',
+    'FastPathCollector',
+    'FastPathResolver',
+    'ParseCache',
+    'normalise',
+]
@@ -0,0 +1,421 @@
+"""
+Pre-NLU fast path for button clicks, district names and repeated messages.
+
+Much of what users send is a button: '/report_safe' style payloads, district
+names from the location selector, or a button's title typed out. Each of them
+used to go through the tokenizer, four featurizers and DIET, only for the
+answer to be known in advance.
+
+FastPathResolver runs first in the pipeline and FastPathCollector last. A
+message the resolver can answer is set aside, so the components in between
+only see the rest, and the collector puts it back in its place. Messages are
+matched on their normalised text (NFKC, casefolded, emoji and other symbols
+dropped, whitespace collapsed, surrounding punctuation stripped):
+- '/intent' payloads of domain intents skip the pipeline and are unpacked by
+  Rasa's RegexMessageHandler as before;
+- button titles from the domain responses and actions/templates/buttons.py
+  resolve to their payload's intent;
+- district names (STANDARD_DISTRICTS and district button payloads) resolve to
+  district_intent with a district_entity entity;
+- anything else is looked up in an LRU of the last cache_size full parses,
+  which the collector fills. A cached parse with entities is only reused for
+  exactly the same text, as the entities' offsets and values come from it.
+
+The table is compiled when the model is trained (the domain is an input of
+training, so button changes retrain it) and saved with the model; the cache
+belongs to the process and is emptied whenever a model is loaded. Rasa runs
+the NLU graph synchronously, one message at a time per process, which is what
+lets the two components share the message set aside through module state.
+
+Hit rate and the estimated NLU time saved (hits times the difference between
+the mean time of a full parse and of a fast path one) are logged every
+report_every messages and returned by FAST_PATH_STATS.stats().
+
+Configure in config.yml:
+
+    pipeline:
+    - name: nlu.fast_path.FastPathResolver
+      cache_size: 2048
+    ...
+    - name: nlu.fast_path.FastPathCollector
+"""
+
+import copy
+import inspect
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Text, Tuple
+
+import rasa.shared.utils.io
+from rasa.engine.graph import ExecutionContext, GraphComponent
+from rasa.engine.recipes.default_recipe import DefaultV1Recipe
+from rasa.engine.storage.resource import Resource
+from rasa.engine.storage.storage import ModelStorage
+from rasa.shared.constants import INTENT_MESSAGE_PREFIX
+from rasa.shared.core.domain import Domain
+from rasa.shared.nlu.constants import (
+    ENTITIES,
+    ENTITY_ATTRIBUTE_END,
+    ENTITY_ATTRIBUTE_START,
+    ENTITY_ATTRIBUTE_TYPE,
+    ENTITY_ATTRIBUTE_VALUE,
+    EXTRACTOR,
+    INTENT,
+    INTENT_NAME_KEY,
+    INTENT_RANKING_KEY,
+    PREDICTED_CONFIDENCE_KEY,
+    TEXT,
+    TEXT_TOKENS,
+)
+from rasa.shared.nlu.training_data.message import Message
+from rasa.shared.nlu.training_data.training_data import TrainingData
+
+logger = logging.getLogger(__name__)
+
+TABLE_FILE_NAME = 'fast_path.json'
+DEFAULT_CACHE_SIZE = 2048
+DEFAULT_REPORT_EVERY = 1000
+
+# Emoji, other symbols, format characters and combining marks (emoji variation selectors)
+DROPPED_CATEGORIES = {'So', 'Sk', 'Cf', 'Mn'}
+EDGE_PUNCTUATION = ' .,;:!?¡¿"\'()-'
+
+# '/intent', '/intent@0.9' or '/intent{"entity": "value"}', as RegexMessageHandler unpacks them
+PAYLOAD = re.compile(r'^/(?P<intent>[^{@\s]+)(@[0-9.]+)?(\{.*\})?$', re.DOTALL)
+
+
+def normalise(text: Text) -> Text:
+    text = unicodedata.normalize('NFKC', text).casefold().replace('’', "'")
+    text = ''.join(char for char in text if unicodedata.category(char) not in DROPPED_CATEGORIES)
+    return ' '.join(text.split()).strip(EDGE_PUNCTUATION)
+
+
+def template_buttons() -> List[Dict[Text, Text]]:
+    """Buttons the actions send, from every get_*_button(s) function in actions/templates/buttons.py."""
+    from actions.templates import buttons
+
+    found = []
+    for name, function in inspect.getmembers(buttons, inspect.isfunction):
+        if name.startswith('get_') and name.endswith(('_button', '_buttons')):
+            found.extend(function())
+    return found
+
+
+def standard_districts() -> List[Text]:
+    from actions.utils.constants import STANDARD_DISTRICTS
+
+    return list(STANDARD_DISTRICTS)
+
+
+class ParseCache:
+    """LRU of full NLU parses keyed on normalised text."""
+
+    def __init__(self, size: int = DEFAULT_CACHE_SIZE) -> None:
+        self.size = size
+        # key -> (text the parse came from if it has entities, else None; output properties)
+        self._entries: 'OrderedDict[Text, Tuple[Optional[Text], Dict[Text, Any]]]' = OrderedDict()
+
+    def configure(self, size: int) -> None:
+        """Resize and empty the cache, e.g. when a new model is loaded."""
+        self.size = size
+        self._entries.clear()
+
+    def get(self, key: Text, text: Text) -> Optional[Dict[Text, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        source, parse = entry
+        if source is not None and source != text:
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(parse)
+
+    def put(self, key: Text, text: Text, parse: Dict[Text, Any]) -> None:
+        if self.size <= 0:
+            return
+        self._entries[key] = (text if parse.get(ENTITIES) else None, copy.deepcopy(parse))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class FastPathStats:
+
+    def __init__(self) -> None:
+        self.report_every = DEFAULT_REPORT_EVERY
+        self.reset()
+
+    def reset(self) -> None:
+        self.reported_at = 0
+        self.messages = 0
+        self.payload_hits = 0
+        self.table_hits = 0
+        self.cache_hits = 0
+        self.misses = 0
+        self.pipeline_seconds = 0.0
+        self.pipeline_messages = 0
+        self.fast_path_seconds = 0.0
+        self.fast_path_messages = 0
+
+    @property
+    def hits(self) -> int:
+        return self.payload_hits + self.table_hits + self.cache_hits
+
+    def record_lookup(self, hit: Optional[Text]) -> None:
+        self.messages += 1
+        if hit == 'payload':
+            self.payload_hits += 1
+        elif hit == 'table':
+            self.table_hits += 1
+        elif hit == 'cache':
+            self.cache_hits += 1
+        else:
+            self.misses += 1
+
+    def record_run(self, seconds: float, passed: int, held: int) -> None:
+        """Time of one graph run; a run with any message through the pipeline counts as full parses."""
+        if passed:
+            self.pipeline_seconds += seconds
+            self.pipeline_messages += passed
+        elif held:
+            self.fast_path_seconds += seconds
+            self.fast_path_messages += held
+        if self.report_every > 0 and self.messages - self.reported_at >= self.report_every:
+            self.reported_at = self.messages
+            logger.info("NLU fast path: %s", self.describe())
+
+    def stats(self) -> Dict[Text, Any]:
+        pipeline_ms = self.pipeline_seconds / self.pipeline_messages * 1e3 if self.pipeline_messages else None
+        fast_path_ms = self.fast_path_seconds / self.fast_path_messages * 1e3 if self.fast_path_messages else None
+        saved_ms = (self.hits * max(0.0, pipeline_ms - fast_path_ms)
+                    if pipeline_ms is not None and fast_path_ms is not None else None)
+        return {
+            'messages': self.messages,
+            'payload_hits': self.payload_hits,
+            'table_hits': self.table_hits,
+            'cache_hits': self.cache_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / self.messages if self.messages else None,
+            'cache_entries': len(PARSE_CACHE),
+            'pipeline_ms': pipeline_ms,
+            'fast_path_ms': fast_path_ms,
+            'saved_ms': saved_ms,
+        }
+
+    def describe(self) -> Text:
+        stats = self.stats()
+        text = (f"{stats['hit_rate'] or 0:.0%} of {stats['messages']} messages skipped the pipeline "
+                f"({stats['payload_hits']} payloads, {stats['table_hits']} buttons and districts, "
+                f"{stats['cache_hits']} cached parses)")
+        if stats['saved_ms'] is not None:
+            text += (f"; {stats['pipeline_ms']:.1f} ms per full parse vs {stats['fast_path_ms']:.2f} ms, "
+                     f"{stats['saved_ms'] / 1e3:.1f}s saved")
+        return text
+
+
+class _Run:
+    """What the resolver set aside in the current graph run, for the collector to put back."""
+
+    def __init__(self) -> None:
+        self.started = 0.0
+        self.size = 0
+        self.held: List[Tuple[int, Message]] = []
+
+    def begin(self, size: int) -> None:
+        self.started = time.perf_counter()
+        self.size = size
+        self.held = []
+
+    def finish(self) -> Tuple[int, List[Tuple[int, Message]]]:
+        size, held = self.size, self.held
+        self.size, self.held = 0, []
+        return size, held
+
+
+PARSE_CACHE = ParseCache()
+FAST_PATH_STATS = FastPathStats()
+_RUN = _Run()
+
+
+@DefaultV1Recipe.register(
+    [DefaultV1Recipe.ComponentType.INTENT_CLASSIFIER, DefaultV1Recipe.ComponentType.ENTITY_EXTRACTOR],
+    is_trainable=True,
+)
+class FastPathResolver(GraphComponent):
+    """Answers button payloads, button titles, district names and cached texts without the pipeline."""
+
+    @staticmethod
+    def get_default_config() -> Dict[Text, Any]:
+        return {
+            'cache_size': DEFAULT_CACHE_SIZE,
+            'report_every': DEFAULT_REPORT_EVERY,
+            'district_intent': 'inform_location',
+            'district_entity': 'district',
+        }
+
+    def __init__(self, config: Dict[Text, Any], model_storage: ModelStorage, resource: Resource,
+                 table: Optional[Dict[Text, Any]] = None) -> None:
+        self.config = config
+        self._model_storage = model_storage
+        self._resource = resource
+        table = table or {}
+        # normalised text -> {'intent': name} or {'intent': name, 'district': canonical name}
+        self.entries: Dict[Text, Dict[Text, Text]] = table.get('entries', {})
+        self.intents = set(table.get('intents', []))
+        PARSE_CACHE.configure(int(config['cache_size']))
+        FAST_PATH_STATS.report_every = int(config['report_every'])
+
+    @classmethod
+    def create(cls, config: Dict[Text, Any], model_storage: ModelStorage, resource: Resource,
+               execution_context: ExecutionContext) -> 'FastPathResolver':
+        return cls(config, model_storage, resource)
+
+    @classmethod
+    def load(cls, config: Dict[Text, Any], model_storage: ModelStorage, resource: Resource,
+             execution_context: ExecutionContext, **kwargs: Any) -> 'FastPathResolver':
+        try:
+            with model_storage.read_from(resource) as directory:
+                table = rasa.shared.utils.io.read_json_file(directory / TABLE_FILE_NAME)
+        except (ValueError, FileNotFoundError):
+            logger.warning("No fast path table in the model; only the parse cache is used")
+            table = None
+        return cls(config, model_storage, resource, table)
+
+    def train(self, training_data: TrainingData, domain: Domain) -> Resource:
+        self.intents = set(domain.intents)
+        self.entries = self.compile(domain)
+        with self._model_storage.write_to(self._resource) as directory:
+            rasa.shared.utils.io.dump_obj_as_json_to_file(
+                directory / TABLE_FILE_NAME, {'entries': self.entries, 'intents': sorted(self.intents)})
+        logger.info("Compiled %d fast path entries", len(self.entries))
+        return self._resource
+
+    def compile(self, domain: Domain) -> Dict[Text, Dict[Text, Text]]:
+        """Normalised button titles and district names mapped to what they resolve to."""
+        districts = {normalise(name): name for name in standard_districts()}
+        entries: Dict[Text, Dict[Text, Text]] = {}
+        ambiguous = set()
+
+        def add(text: Text, entry: Dict[Text, Text]) -> None:
+            key = normalise(text)
+            if not key or key in ambiguous:
+                return
+            if entries.setdefault(key, entry) != entry:
+                logger.warning("'%s' resolves to both %s and %s; leaving it to the pipeline", text, entries[key], entry)
+                del entries[key]
+                ambiguous.add(key)
+
+        def resolve(payload: Text) -> Optional[Dict[Text, Text]]:
+            match = PAYLOAD.match(payload.strip())
+            if match:
+                intent = match.group('intent')
+                # Titles of buttons whose payloads carry entities or a confidence are left to the pipeline
+                if payload.strip() == INTENT_MESSAGE_PREFIX + intent and intent in self.intents:
+                    return {'intent': intent}
+                return None
+            district = districts.get(normalise(payload))
+            if district is not None and self.config['district_intent'] in self.intents:
+                return {'intent': self.config['district_intent'], 'district': district}
+            return None
+
+        if self.config['district_intent'] in self.intents:
+            for name in districts.values():
+                add(name, {'intent': self.config['district_intent'], 'district': name})
+
+        buttons = [button for responses in domain.responses.values() for response in responses
+                   for button in response.get('buttons') or []]
+        for button in buttons + template_buttons():
+            payload, title = button.get('payload') or '', button.get('title') or ''
+            entry = resolve(payload)
+            if entry is None:
+                continue
+            if not payload.startswith(INTENT_MESSAGE_PREFIX):
+                add(payload, entry)
+            add(title, entry)
+        return entries
+
+    def lookup(self, message: Message) -> Optional[Text]:
+        """Fill message in if the fast path can answer it; returns the kind of hit, or None."""
+        text = message.get(TEXT) or ''
+        stripped = text.strip()
+        if stripped.startswith(INTENT_MESSAGE_PREFIX):
+            match = PAYLOAD.match(stripped)
+            # Left untouched for RegexMessageHandler, after the collector
+            return 'payload' if match and match.group('intent') in self.intents else None
+        key = normalise(text)
+        if not key:
+            return None
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.fill(message, text, entry)
+            return 'table'
+        parse = PARSE_CACHE.get(key, text)
+        if parse is not None:
+            for name, value in parse.items():
+                message.set(name, value, add_to_output=True)
+            return 'cache'
+        return None
+
+    def fill(self, message: Message, text: Text, entry: Dict[Text, Text]) -> None:
+        intent = {INTENT_NAME_KEY: entry['intent'], PREDICTED_CONFIDENCE_KEY: 1.0}
+        entities = []
+        if 'district' in entry:
+            # The entity spans the text from its first to its last letter or digit
+            alphanumeric = [i for i, char in enumerate(text) if char.isalnum()]
+            entities.append({
+                ENTITY_ATTRIBUTE_TYPE: self.config['district_entity'],
+                ENTITY_ATTRIBUTE_START: alphanumeric[0],
+                ENTITY_ATTRIBUTE_END: alphanumeric[-1] + 1,
+                ENTITY_ATTRIBUTE_VALUE: entry['district'],
+                EXTRACTOR: self.__class__.__name__,
+            })
+        message.set(INTENT, intent, add_to_output=True)
+        message.set(INTENT_RANKING_KEY, [dict(intent)], add_to_output=True)
+        message.set(ENTITIES, entities, add_to_output=True)
+
+    def process(self, messages: List[Message]) -> List[Message]:
+        _RUN.begin(len(messages))
+        passed = []
+        for index, message in enumerate(messages):
+            hit = self.lookup(message)
+            FAST_PATH_STATS.record_lookup(hit)
+            if hit is None:
+                passed.append(message)
+            else:
+                _RUN.held.append((index, message))
+        return passed
+
+
+@DefaultV1Recipe.register([DefaultV1Recipe.ComponentType.INTENT_CLASSIFIER], is_trainable=False)
+class FastPathCollector(GraphComponent):
+    """Puts the messages FastPathResolver answered back in place and caches the full parses of the others."""
+
+    @classmethod
+    def create(cls, config: Dict[Text, Any], model_storage: ModelStorage, resource: Resource,
+               execution_context: ExecutionContext) -> 'FastPathCollector':
+        return cls()
+
+    def process(self, messages: List[Message]) -> List[Message]:
+        size, held = _RUN.finish()
+        if len(messages) + len(held) != size:
+            # No resolver ran before us in this graph run
+            return messages
+        for message in messages:
+            text = message.get(TEXT) or ''
+            key = normalise(text)
+            if key and not text.strip().startswith(INTENT_MESSAGE_PREFIX):
+                parse = message.as_dict(only_output_properties=True)
+                parse.pop(TEXT, None)
+                parse.pop(TEXT_TOKENS, None)
+                PARSE_CACHE.put(key, text, parse)
+        merged = list(messages)
+        for index, message in held:
+            merged.insert(index, message)
+        FAST_PATH_STATS.record_run(time.perf_counter() - _RUN.started, len(messages), len(held))
+        return merged
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Builds data/berlin_districts.json - district boundary polygons used by the
+offline district resolver.
+
+With --boundaries, the polygons come from official Ortsteil (locality)
+boundaries as GeoJSON in WGS84: the "ALKIS Berlin Ortsteile" dataset of
+Geoportal Berlin, or the OpenStreetMap admin_level=10 boundaries of Berlin.
+Each Ortsteil is assigned to the district the bot uses (the pre-2001
+boroughs, with Wedding, Prenzlauer Berg, Friedrichshain and Kreuzberg on
+their own) and simplified to --tolerance-m. The file records that accuracy,
+so the resolver only asks the geocoder about points within GPS accuracy of a
+border.
+
+Without it, each district is the union of Voronoi cells around a few
+neighbourhood reference points, clipped to a simplified Berlin city outline.
+That approximation is off by up to a kilometre or two near the borders, and
+the file says so: the resolver then confirms points within
+VORONOI_ACCURACY_METRES of a border with Nominatim.
+
+Usage:
+    python scripts/build_district_boundaries.py --boundaries ortsteile.geojson
+    python scripts/build_district_boundaries.py
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+OUTPUT_PATH = os.path.join(PROJECT_DIR, 'data', 'berlin_districts.json')
+
+# Simplified Berlin outline as (lat, lng), clockwise from the northern tip
+BERLIN_OUTLINE = [
+    (52.6755, 13.4850), (52.6450, 13.5170), (52.6200, 13.5300), (52.5800, 13.5700),
+    (52.5750, 13.6500), (52.5400, 13.6600), (52.5100, 13.6900), (52.4900, 13.7000),
+    (52.4700, 13.7600), (52.4200, 13.7500), (52.3800, 13.7000), (52.3700, 13.6400),
+    (52.3380, 13.6500), (52.3900, 13.5500), (52.3900, 13.4800), (52.3800, 13.4200),
+    (52.3900, 13.3500), (52.4100, 13.3000), (52.4000, 13.2500), (52.4000, 13.1600),
+    (52.4100, 13.1100), (52.4600, 13.1500), (52.5000, 13.1100), (52.5300, 13.1200),
+    (52.5600, 13.1300), (52.5900, 13.2000), (52.6300, 13.2500), (52.6600, 13.3000),
+    (52.6500, 13.3700), (52.6600, 13.4300),
+]
+
+# Reference points (lat, lng) per district - roughly the centres of the
+# neighbourhoods (Ortsteile) that make up each former borough
+DISTRICT_SEEDS = {
+    'Mitte': [(52.5200, 13.4050), (52.5130, 13.3570), (52.5300, 13.3350), (52.5180, 13.3420)],
+    'Wedding': [(52.5500, 13.3500), (52.5520, 13.3900)],
+    'Prenzlauer Berg': [(52.5390, 13.4240), (52.5480, 13.4150)],
+    'Friedrichshain': [(52.5150, 13.4540), (52.5080, 13.4350)],
+    'Kreuzberg': [(52.4980, 13.4030), (52.5000, 13.4250), (52.4920, 13.3800)],
+    'Charlottenburg': [(52.5160, 13.3050), (52.5150, 13.2600), (52.5350, 13.2950), (52.5030, 13.2720)],
+    'Wilmersdorf': [(52.4870, 13.3180), (52.4970, 13.2900), (52.4800, 13.2400), (52.4750, 13.2900),
+                    (52.4650, 13.2150)],
+    'Schöneberg': [(52.4830, 13.3520), (52.4720, 13.3300)],
+    'Tempelhof': [(52.4630, 13.3850), (52.4400, 13.3850), (52.4180, 13.3680), (52.3930, 13.4000)],
+    'Neukölln': [(52.4770, 13.4380), (52.4430, 13.4320), (52.4200, 13.4450), (52.4170, 13.4900),
+                 (52.4250, 13.4630)],
+    'Treptow': [(52.4900, 13.4660), (52.4780, 13.4780), (52.4650, 13.4870), (52.4460, 13.5070),
+                (52.4350, 13.5450), (52.4550, 13.5100), (52.4100, 13.5400), (52.3950, 13.5650)],
+    'Köpenick': [(52.4450, 13.5780), (52.4500, 13.6300), (52.4400, 13.7000), (52.4120, 13.6650),
+                 (52.4150, 13.5800), (52.3750, 13.6500), (52.4650, 13.5250)],
+    'Lichtenberg': [(52.5150, 13.4850), (52.5050, 13.5150), (52.4820, 13.5280), (52.4970, 13.4900),
+                    (52.5300, 13.4750), (52.5450, 13.5000), (52.5650, 13.5100), (52.5750, 13.4900)],
+    'Marzahn': [(52.5450, 13.5600), (52.5100, 13.5550)],
+    'Hellersdorf': [(52.5350, 13.6050), (52.5100, 13.5850), (52.5050, 13.6150)],
+    'Pankow': [(52.5700, 13.4050), (52.5850, 13.3850), (52.5550, 13.4650), (52.5700, 13.4400),
+               (52.5900, 13.4450), (52.6100, 13.4300), (52.6200, 13.4750), (52.6350, 13.4950),
+               (52.5980, 13.3780), (52.6200, 13.3950)],
+    'Reinickendorf': [(52.5750, 13.3400), (52.5850, 13.2850), (52.5900, 13.3250), (52.6000, 13.3550),
+                      (52.6200, 13.3100), (52.6350, 13.2900), (52.6150, 13.2300), (52.6000, 13.2400),
+                      (52.6150, 13.3550), (52.6050, 13.3200), (52.5750, 13.3000)],
+    'Spandau': [(52.5370, 13.2000), (52.5400, 13.2400), (52.5400, 13.2650), (52.5350, 13.1400),
+                (52.5600, 13.2050), (52.5150, 13.1850), (52.4800, 13.1800), (52.4550, 13.1450),
+                (52.5550, 13.1650)],
+    'Steglitz': [(52.4570, 13.3220), (52.4300, 13.3100), (52.4370, 13.3450)],
+    'Zehlendorf': [(52.4330, 13.2580), (52.4580, 13.2900), (52.4300, 13.2000), (52.4200, 13.1600)],
+}
+
+# Ortsteile of each district, for --boundaries
+DISTRICT_ORTSTEILE = {
+    'Mitte': ['Mitte', 'Moabit', 'Hansaviertel', 'Tiergarten'],
+    'Wedding': ['Wedding', 'Gesundbrunnen'],
+    'Prenzlauer Berg': ['Prenzlauer Berg'],
+    'Friedrichshain': ['Friedrichshain'],
+    'Kreuzberg': ['Kreuzberg'],
+    'Charlottenburg': ['Charlottenburg', 'Charlottenburg-Nord', 'Westend'],
+    'Wilmersdorf': ['Wilmersdorf', 'Schmargendorf', 'Grunewald', 'Halensee'],
+    'Schöneberg': ['Schöneberg', 'Friedenau'],
+    'Tempelhof': ['Tempelhof', 'Mariendorf', 'Marienfelde', 'Lichtenrade'],
+    'Neukölln': ['Neukölln', 'Britz', 'Buckow', 'Rudow', 'Gropiusstadt'],
+    'Treptow': ['Alt-Treptow', 'Plänterwald', 'Baumschulenweg', 'Johannisthal', 'Niederschöneweide',
+                'Altglienicke', 'Adlershof', 'Bohnsdorf'],
+    'Köpenick': ['Oberschöneweide', 'Köpenick', 'Friedrichshagen', 'Rahnsdorf', 'Grünau', 'Müggelheim',
+                 'Schmöckwitz'],
+    'Lichtenberg': ['Lichtenberg', 'Friedrichsfelde', 'Karlshorst', 'Rummelsburg', 'Fennpfuhl',
+                    'Alt-Hohenschönhausen', 'Neu-Hohenschönhausen', 'Falkenberg', 'Malchow', 'Wartenberg'],
+    'Marzahn': ['Marzahn', 'Biesdorf'],
+    'Hellersdorf': ['Hellersdorf', 'Kaulsdorf', 'Mahlsdorf'],
+    'Pankow': ['Pankow', 'Weißensee', 'Blankenburg', 'Heinersdorf', 'Karow', 'Stadtrandsiedlung Malchow',
+               'Blankenfelde', 'Buch', 'Französisch Buchholz', 'Niederschönhausen', 'Rosenthal', 'Wilhelmsruh'],
+    'Reinickendorf': ['Reinickendorf', 'Tegel', 'Konradshöhe', 'Heiligensee', 'Frohnau', 'Hermsdorf',
+                      'Waidmannslust', 'Lübars', 'Wittenau', 'Märkisches Viertel', 'Borsigwalde'],
+    'Spandau': ['Spandau', 'Haselhorst', 'Siemensstadt', 'Staaken', 'Gatow', 'Kladow', 'Hakenfelde',
+                'Falkenhagener Feld', 'Wilhelmstadt'],
+    'Steglitz': ['Steglitz', 'Lichterfelde', 'Lankwitz'],
+    'Zehlendorf': ['Zehlendorf', 'Dahlem', 'Nikolassee', 'Wannsee'],
+}
+
+# Feature properties that may hold the Ortsteil name (Geoportal, OSM, common exports)
+NAME_PROPERTIES = ('nam', 'name', 'ortsteil', 'ortsteilname', 'OTEIL', 'spatial_alias')
+
+# How far off the Voronoi approximation can be near a border
+VORONOI_ACCURACY_METRES = 1500
+METRES_PER_DEGREE = 111320.0
+
+# Longitude degrees are shorter than latitude degrees at Berlin's latitude
+LNG_SCALE = math.cos(math.radians(52.5))
+
+
+def _project(point):
+    lat, lng = point
+    return lng * LNG_SCALE, lat
+
+
+def _unproject(point):
+    x, y = point
+    return round(y, 5), round(x / LNG_SCALE, 5)
+
+
+def _clip(polygon, a, b, c):
+    """Keep the part of polygon where a*x + b*y <= c (Sutherland-Hodgman)."""
+    result = []
+    count = len(polygon)
+    for i in range(count):
+        current = polygon[i]
+        previous = polygon[i - 1]
+        current_inside = a * current[0] + b * current[1] <= c
+        previous_inside = a * previous[0] + b * previous[1] <= c
+        if current_inside != previous_inside:
+            dx = current[0] - previous[0]
+            dy = current[1] - previous[1]
+            t = (c - a * previous[0] - b * previous[1]) / (a * dx + b * dy)
+            result.append((previous[0] + t * dx, previous[1] + t * dy))
+        if current_inside:
+            result.append(current)
+    return result
+
+
+def build_cells():
+    outline = [_project(p) for p in BERLIN_OUTLINE]
+    seeds = [(name, _project(p)) for name, points in DISTRICT_SEEDS.items() for p in points]
+    cells = {name: [] for name in DISTRICT_SEEDS}
+    for index, (name, (sx, sy)) in enumerate(seeds):
+        cell = outline
+        for other_index, (_, (ox, oy)) in enumerate(seeds):
+            if other_index == index:
+                continue
+            # Points closer to this seed than to the other one
+            a = ox - sx
+            b = oy - sy
+            c = (ox * ox + oy * oy - sx * sx - sy * sy) / 2
+            cell = _clip(cell, a, b, c)
+        if len(cell) >= 3:
+            cells[name].append([_unproject(p) for p in cell])
+    return cells
+
+
+def _simplify(points, tolerance):
+    """Douglas-Peucker on (x, y) points in metres, keeping both end points."""
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x0, y0), (x1, y1) = points[first], points[last]
+        dx, dy = x1 - x0, y1 - y0
+        length = math.hypot(dx, dy)
+        farthest, distance = None, tolerance
+        for i in range(first + 1, last):
+            x, y = points[i]
+            d = abs(dy * (x - x0) - dx * (y - y0)) / length if length else math.hypot(x - x0, y - y0)
+            if d > distance:
+                farthest, distance = i, d
+        if farthest is not None:
+            keep[farthest] = True
+            stack.extend(((first, farthest), (farthest, last)))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def _ring_to_polygon(ring, tolerance_m):
+    """GeoJSON (lng, lat) ring to a simplified, open list of (lat, lng)."""
+    points = [(lng * METRES_PER_DEGREE * LNG_SCALE, lat * METRES_PER_DEGREE) for lng, lat, *_ in ring]
+    if len(points) > 1 and points[0] == points[-1]:
+        points = points[:-1]
+    # Split the closed ring in two so Douglas-Peucker has fixed ends on both halves
+    middle = len(points) // 2
+    simplified = _simplify(points[:middle + 1], tolerance_m)[:-1] + _simplify(points[middle:] + points[:1],
+                                                                             tolerance_m)[:-1]
+    return [(round(y / METRES_PER_DEGREE, 6), round(x / (METRES_PER_DEGREE * LNG_SCALE), 6)) for x, y in simplified]
+
+
+def _feature_name(feature):
+    properties = feature.get('properties') or {}
+    return next((str(properties[key]) for key in NAME_PROPERTIES if properties.get(key)), None)
+
+
+def load_ortsteile(path, tolerance_m):
+    """District polygons from an Ortsteil (or district) GeoJSON FeatureCollection."""
+    district_of = {name.casefold(): name for name in DISTRICT_ORTSTEILE}
+    for district, ortsteile in DISTRICT_ORTSTEILE.items():
+        district_of.update((ortsteil.casefold(), district) for ortsteil in ortsteile)
+
+    with open(path, 'r', encoding='utf-8') as f:
+        features = json.load(f)['features']
+    districts = {name: [] for name in DISTRICT_ORTSTEILE}
+    unknown, holes = set(), 0
+    for feature in features:
+        name = _feature_name(feature)
+        district = district_of.get((name or '').strip().casefold())
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+            continue
+        if district is None:
+            unknown.add(name)
+            continue
+        polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+        for rings in polygons:
+            holes += len(rings) - 1
+            polygon = _ring_to_polygon(rings[0], tolerance_m)
+            if len(polygon) >= 3:
+                districts[district].append(polygon)
+
+    if unknown:
+        sys.exit(f"No district for these features: {', '.join(sorted(map(str, unknown)))}")
+    missing = [name for name, parts in districts.items() if not parts]
+    if missing:
+        sys.exit(f"No boundaries found for: {', '.join(missing)}")
+    if holes:
+        print(f"Warning: dropped {holes} polygon holes; the resolver only reads outer rings")
+    return districts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--boundaries', help='GeoJSON of the official Ortsteil boundaries (WGS84)')
+    parser.add_argument('--tolerance-m', type=float, default=2.0,
+                        help="simplification tolerance in metres; keep it below the resolver's 5 m edge probe")
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    if args.boundaries:
+        cells = load_ortsteile(args.boundaries, args.tolerance_m)
+        outline = None
+        metadata = {
+            'description': 'Berlin district boundaries for offline reverse geocoding',
+            'source': f'scripts/build_district_boundaries.py (Ortsteile from {os.path.basename(args.boundaries)}, '
+                      f'simplified to {args.tolerance_m:g} m)',
+            'boundary_accuracy_m': args.tolerance_m,
+        }
+    else:
+        cells = build_cells()
+        outline = BERLIN_OUTLINE
+        metadata = {
+            'description': 'Simplified Berlin district boundaries for offline reverse geocoding',
+            'source': 'scripts/build_district_boundaries.py (Voronoi cells clipped to a simplified city outline)',
+            'boundary_accuracy_m': VORONOI_ACCURACY_METRES,
+        }
+    metadata.update({'coordinate_order': 'lat,lng', 'geometry': 'each district is a list of polygons'})
+
+    # One polygon per line keeps the file compact and diff-friendly
+    lines = ['{']
+    lines.append(f' "metadata": {json.dumps(metadata, ensure_ascii=False)},')
+    if outline:
+        lines.append(f' "outline": {json.dumps([list(p) for p in outline])},')
+    lines.append(' "districts": {')
+    names = list(cells.keys())
+    for name in names:
+        lines.append(f'  {json.dumps(name, ensure_ascii=False)}: [')
+        parts = cells[name]
+        for i, cell in enumerate(parts):
+            separator = ',' if i < len(parts) - 1 else ''
+            lines.append(f'   {json.dumps([list(p) for p in cell])}{separator}')
+        lines.append('  ],' if name != names[-1] else '  ]')
+    lines.append(' }')
+    lines.append('}')
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    print(f"Wrote {len(cells)} districts ({sum(len(parts) for parts in cells.values())} polygons) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
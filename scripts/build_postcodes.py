@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Builds data/berlin_postcodes.json - every Berlin postcode with its primary
+district, an approximate centroid and the districts the postcode area overlaps.
+
+Primary districts and centroids are maintained by hand below. Overlapping
+districts are derived from the bundled district boundaries by resolving a
+ring of points around each centroid, so rerun this script after regenerating
+data/berlin_districts.json.
+
+Usage:
+    python scripts/build_postcodes.py
+"""
+
+import json
+import math
+import os
+import sys
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+OUTPUT_PATH = os.path.join(PROJECT_DIR, 'data', 'berlin_postcodes.json')
+
+sys.path.insert(0, PROJECT_DIR)
+
+from actions.utils.district_resolver import DistrictResolver  # noqa: E402
+
+# Radius (km) of the ring sampled around each centroid to find overlapping districts
+OVERLAP_RADIUS_KM = 0.9
+OVERLAP_SAMPLES = 12
+
+# postcode: (primary district, centroid lat, centroid lng)
+POSTCODES = {
+    # Mitte
+    '10115': ('Mitte', 52.5323, 13.3846), '10117': ('Mitte', 52.5170, 13.3880),
+    '10119': ('Mitte', 52.5306, 13.4052), '10178': ('Mitte', 52.5220, 13.4100),
+    '10179': ('Mitte', 52.5120, 13.4160),
+    # Friedrichshain
+    '10243': ('Friedrichshain', 52.5125, 13.4390), '10245': ('Friedrichshain', 52.5005, 13.4600),
+    '10247': ('Friedrichshain', 52.5160, 13.4650), '10249': ('Friedrichshain', 52.5240, 13.4420),
+    # Lichtenberg
+    '10315': ('Lichtenberg', 52.5150, 13.5150), '10317': ('Lichtenberg', 52.5000, 13.4900),
+    '10318': ('Lichtenberg', 52.4850, 13.5250), '10319': ('Lichtenberg', 52.5050, 13.5250),
+    '10365': ('Lichtenberg', 52.5190, 13.4950), '10367': ('Lichtenberg', 52.5250, 13.4750),
+    '10369': ('Lichtenberg', 52.5290, 13.4640),
+    # Prenzlauer Berg
+    '10405': ('Prenzlauer Berg', 52.5340, 13.4250), '10407': ('Prenzlauer Berg', 52.5370, 13.4480),
+    '10409': ('Prenzlauer Berg', 52.5470, 13.4430), '10435': ('Prenzlauer Berg', 52.5380, 13.4110),
+    '10437': ('Prenzlauer Berg', 52.5450, 13.4140), '10439': ('Prenzlauer Berg', 52.5520, 13.4110),
+    # Moabit (Mitte borough) - 10551-10555 keep their historical Charlottenburg mapping
+    '10551': ('Charlottenburg', 52.5320, 13.3370), '10553': ('Charlottenburg', 52.5300, 13.3250),
+    '10555': ('Charlottenburg', 52.5210, 13.3290), '10557': ('Mitte', 52.5230, 13.3600),
+    '10559': ('Mitte', 52.5290, 13.3480),
+    # Charlottenburg
+    '10585': ('Charlottenburg', 52.5170, 13.3000), '10587': ('Charlottenburg', 52.5190, 13.3170),
+    '10589': ('Charlottenburg', 52.5300, 13.3000), '10623': ('Charlottenburg', 52.5080, 13.3260),
+    '10625': ('Charlottenburg', 52.5100, 13.3110), '10627': ('Charlottenburg', 52.5070, 13.3000),
+    '10629': ('Charlottenburg', 52.5030, 13.3090),
+    # Wilmersdorf
+    '10707': ('Wilmersdorf', 52.4960, 13.3080), '10709': ('Wilmersdorf', 52.4950, 13.2960),
+    '10711': ('Wilmersdorf', 52.4980, 13.2860), '10713': ('Wilmersdorf', 52.4850, 13.3130),
+    '10715': ('Wilmersdorf', 52.4800, 13.3280), '10717': ('Wilmersdorf', 52.4900, 13.3210),
+    '10719': ('Wilmersdorf', 52.4990, 13.3240),
+    # Schöneberg and southern Tiergarten
+    '10777': ('Schöneberg', 52.4990, 13.3420), '10779': ('Schöneberg', 52.4930, 13.3390),
+    '10781': ('Schöneberg', 52.4930, 13.3530), '10783': ('Schöneberg', 52.4960, 13.3630),
+    '10785': ('Mitte', 52.5060, 13.3650), '10787': ('Mitte', 52.5060, 13.3430),
+    '10789': ('Schöneberg', 52.5010, 13.3380), '10823': ('Schöneberg', 52.4870, 13.3500),
+    '10825': ('Schöneberg', 52.4840, 13.3390), '10827': ('Schöneberg', 52.4840, 13.3560),
+    '10829': ('Schöneberg', 52.4780, 13.3660),
+    # Kreuzberg
+    '10961': ('Kreuzberg', 52.4910, 13.3940), '10963': ('Kreuzberg', 52.5000, 13.3830),
+    '10965': ('Kreuzberg', 52.4870, 13.3880), '10967': ('Kreuzberg', 52.4900, 13.4200),
+    '10969': ('Kreuzberg', 52.5040, 13.4000), '10997': ('Kreuzberg', 52.5010, 13.4370),
+    '10999': ('Kreuzberg', 52.4980, 13.4240),
+    # Neukölln
+    '12043': ('Neukölln', 52.4790, 13.4390), '12045': ('Neukölln', 52.4860, 13.4370),
+    '12047': ('Neukölln', 52.4900, 13.4260), '12049': ('Neukölln', 52.4760, 13.4230),
+    '12051': ('Neukölln', 52.4650, 13.4340), '12053': ('Neukölln', 52.4780, 13.4290),
+    '12055': ('Neukölln', 52.4710, 13.4500), '12057': ('Neukölln', 52.4720, 13.4650),
+    '12059': ('Neukölln', 52.4810, 13.4530),
+    # Tempelhof, Mariendorf
+    '12099': ('Tempelhof', 52.4640, 13.4020), '12101': ('Tempelhof', 52.4800, 13.3920),
+    '12103': ('Tempelhof', 52.4650, 13.3800), '12105': ('Tempelhof', 52.4490, 13.3830),
+    '12107': ('Tempelhof', 52.4300, 13.3900), '12109': ('Tempelhof', 52.4420, 13.4050),
+    # Steglitz, Friedenau, Lichterfelde, Lankwitz
+    '12157': ('Steglitz', 52.4640, 13.3360), '12159': ('Steglitz', 52.4700, 13.3340),
+    '12161': ('Steglitz', 52.4710, 13.3240), '12163': ('Steglitz', 52.4580, 13.3210),
+    '12165': ('Steglitz', 52.4530, 13.3120), '12167': ('Steglitz', 52.4490, 13.3350),
+    '12169': ('Steglitz', 52.4560, 13.3410), '12203': ('Steglitz', 52.4450, 13.3030),
+    '12205': ('Steglitz', 52.4310, 13.3000), '12207': ('Steglitz', 52.4180, 13.3140),
+    '12209': ('Steglitz', 52.4180, 13.3300), '12247': ('Steglitz', 52.4400, 13.3500),
+    '12249': ('Steglitz', 52.4260, 13.3450),
+    # Marienfelde, Lichtenrade
+    '12277': ('Tempelhof', 52.4120, 13.3700), '12279': ('Tempelhof', 52.4170, 13.3500),
+    '12305': ('Tempelhof', 52.3980, 13.4030), '12307': ('Tempelhof', 52.3850, 13.3930),
+    '12309': ('Tempelhof', 52.3990, 13.4200),
+    # Britz, Buckow, Gropiusstadt, Rudow
+    '12347': ('Neukölln', 52.4490, 13.4330), '12349': ('Neukölln', 52.4300, 13.4230),
+    '12351': ('Neukölln', 52.4330, 13.4560), '12353': ('Neukölln', 52.4230, 13.4650),
+    '12355': ('Neukölln', 52.4130, 13.4950), '12357': ('Neukölln', 52.4230, 13.4950),
+    '12359': ('Neukölln', 52.4500, 13.4500),
+    # Treptow, Schöneweide, Johannisthal, Adlershof, Altglienicke, Bohnsdorf
+    '12435': ('Treptow', 52.4880, 13.4620), '12437': ('Treptow', 52.4680, 13.4790),
+    '12439': ('Treptow', 52.4620, 13.5150), '12459': ('Köpenick', 52.4620, 13.5300),
+    '12487': ('Treptow', 52.4460, 13.5070), '12489': ('Treptow', 52.4300, 13.5300),
+    '12524': ('Treptow', 52.4100, 13.5300), '12526': ('Treptow', 52.3950, 13.5550),
+    '12527': ('Köpenick', 52.3900, 13.6300),
+    # Köpenick, Friedrichshagen, Rahnsdorf
+    '12555': ('Köpenick', 52.4480, 13.5800), '12557': ('Köpenick', 52.4250, 13.5900),
+    '12559': ('Köpenick', 52.4350, 13.6400), '12587': ('Köpenick', 52.4550, 13.6250),
+    '12589': ('Köpenick', 52.4450, 13.7000),
+    # Hellersdorf, Kaulsdorf, Mahlsdorf
+    '12619': ('Hellersdorf', 52.5350, 13.5850), '12621': ('Hellersdorf', 52.5130, 13.5900),
+    '12623': ('Hellersdorf', 52.5100, 13.6200), '12627': ('Hellersdorf', 52.5400, 13.6100),
+    '12629': ('Hellersdorf', 52.5450, 13.5900),
+    # Marzahn, Biesdorf
+    '12679': ('Marzahn', 52.5550, 13.5600), '12681': ('Marzahn', 52.5370, 13.5350),
+    '12683': ('Marzahn', 52.5130, 13.5600), '12685': ('Marzahn', 52.5450, 13.5600),
+    '12687': ('Marzahn', 52.5600, 13.5550), '12689': ('Marzahn', 52.5680, 13.5650),
+    # Hohenschönhausen
+    '13051': ('Lichtenberg', 52.5700, 13.5000), '13053': ('Lichtenberg', 52.5550, 13.4900),
+    '13055': ('Lichtenberg', 52.5400, 13.4900), '13057': ('Lichtenberg', 52.5500, 13.5300),
+    '13059': ('Lichtenberg', 52.5750, 13.5150),
+    # Weißensee, Heinersdorf, Buch, Buchholz, Blankenburg, Niederschönhausen, Rosenthal
+    '13086': ('Pankow', 52.5520, 13.4600), '13088': ('Pankow', 52.5600, 13.4700),
+    '13089': ('Pankow', 52.5650, 13.4350), '13125': ('Pankow', 52.6250, 13.4900),
+    '13127': ('Pankow', 52.5950, 13.4200), '13129': ('Pankow', 52.5800, 13.4500),
+    '13156': ('Pankow', 52.5800, 13.3950), '13158': ('Pankow', 52.5900, 13.3750),
+    '13159': ('Pankow', 52.6150, 13.3900), '13187': ('Pankow', 52.5700, 13.4100),
+    '13189': ('Pankow', 52.5600, 13.4200),
+    # Wedding, Gesundbrunnen
+    '13347': ('Wedding', 52.5450, 13.3650), '13349': ('Wedding', 52.5550, 13.3470),
+    '13351': ('Wedding', 52.5520, 13.3350), '13353': ('Wedding', 52.5400, 13.3450),
+    '13355': ('Wedding', 52.5400, 13.3900), '13357': ('Wedding', 52.5500, 13.3850),
+    '13359': ('Wedding', 52.5580, 13.3820),
+    # Reinickendorf, Tegel, Wittenau, Märkisches Viertel, Frohnau, Hermsdorf, Heiligensee
+    '13403': ('Reinickendorf', 52.5700, 13.3200), '13405': ('Reinickendorf', 52.5600, 13.3000),
+    '13407': ('Reinickendorf', 52.5750, 13.3450), '13409': ('Reinickendorf', 52.5700, 13.3650),
+    '13435': ('Reinickendorf', 52.6000, 13.3450), '13437': ('Reinickendorf', 52.5900, 13.3300),
+    '13439': ('Reinickendorf', 52.5950, 13.3650), '13465': ('Reinickendorf', 52.6350, 13.2850),
+    '13467': ('Reinickendorf', 52.6150, 13.3050), '13469': ('Reinickendorf', 52.6100, 13.3450),
+    '13503': ('Reinickendorf', 52.6050, 13.2500), '13505': ('Reinickendorf', 52.5850, 13.2500),
+    '13507': ('Reinickendorf', 52.5850, 13.2850), '13509': ('Reinickendorf', 52.5900, 13.3100),
+    # Spandau, Hakenfelde, Staaken, Wilhelmstadt, Haselhorst, Siemensstadt
+    '13581': ('Spandau', 52.5300, 13.1900), '13583': ('Spandau', 52.5450, 13.1850),
+    '13585': ('Spandau', 52.5450, 13.2050), '13587': ('Spandau', 52.5650, 13.2000),
+    '13589': ('Spandau', 52.5550, 13.1650), '13591': ('Spandau', 52.5350, 13.1450),
+    '13593': ('Spandau', 52.5200, 13.1600), '13595': ('Spandau', 52.5100, 13.1900),
+    '13597': ('Spandau', 52.5300, 13.2150), '13599': ('Spandau', 52.5400, 13.2400),
+    '13627': ('Charlottenburg', 52.5350, 13.2900), '13629': ('Spandau', 52.5400, 13.2650),
+    # Westend
+    '14050': ('Charlottenburg', 52.5150, 13.2750), '14052': ('Charlottenburg', 52.5150, 13.2600),
+    '14053': ('Charlottenburg', 52.5150, 13.2400), '14055': ('Charlottenburg', 52.5000, 13.2600),
+    '14057': ('Charlottenburg', 52.5050, 13.2900), '14059': ('Charlottenburg', 52.5200, 13.2850),
+    # Kladow, Gatow
+    '14089': ('Spandau', 52.4400, 13.1700),
+    # Zehlendorf, Wannsee, Nikolassee, Dahlem
+    '14109': ('Zehlendorf', 52.4200, 13.1500), '14129': ('Zehlendorf', 52.4350, 13.2100),
+    '14163': ('Zehlendorf', 52.4350, 13.2500), '14165': ('Zehlendorf', 52.4150, 13.2650),
+    '14167': ('Zehlendorf', 52.4200, 13.2900), '14169': ('Zehlendorf', 52.4450, 13.2650),
+    '14195': ('Zehlendorf', 52.4600, 13.2900),
+    # Grunewald, Schmargendorf
+    '14193': ('Wilmersdorf', 52.4850, 13.2700), '14197': ('Wilmersdorf', 52.4800, 13.3150),
+    '14199': ('Wilmersdorf', 52.4750, 13.2950),
+}
+
+
+def overlapping_districts(resolver, district, lat, lng):
+    """Primary district first, then every other district met on a ring around the centroid."""
+    found = [district]
+    points = [(lat, lng)]
+    d_lat = OVERLAP_RADIUS_KM / 111.32
+    d_lng = d_lat / math.cos(math.radians(lat))
+    for i in range(OVERLAP_SAMPLES):
+        angle = 2 * math.pi * i / OVERLAP_SAMPLES
+        points.append((lat + d_lat * math.sin(angle), lng + d_lng * math.cos(angle)))
+    for point_lat, point_lng in points:
+        match = resolver.resolve(point_lat, point_lng)
+        if match.inside_berlin and match.district not in found:
+            found.append(match.district)
+    return found
+
+
+def main():
+    resolver = DistrictResolver.from_file()
+    rows = []
+    for postcode in sorted(POSTCODES):
+        district, lat, lng = POSTCODES[postcode]
+        rows.append([postcode, district, lat, lng, overlapping_districts(resolver, district, lat, lng)])
+
+    data = {
+        'metadata': {
+            'description': 'Berlin postcodes with primary district, approximate centroid and overlapping districts',
+            'source': 'scripts/build_postcodes.py',
+            'columns': ['postcode', 'district', 'lat', 'lng', 'districts'],
+        },
+        'postcodes': rows,
+    }
+
+    # One postcode per line keeps diffs readable
+    lines = ['{']
+    lines.append(f'  "metadata": {json.dumps(data["metadata"], ensure_ascii=False)},')
+    lines.append('  "postcodes": [')
+    for i, row in enumerate(rows):
+        comma = ',' if i < len(rows) - 1 else ''
+        lines.append(f'    {json.dumps(row, ensure_ascii=False)}{comma}')
+    lines.append('  ]')
+    lines.append('}')
+    with open(OUTPUT_PATH, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+    overlapping = sum(1 for row in rows if len(row[4]) > 1)
+    print(f"Wrote {len(rows)} postcodes ({overlapping} spanning several districts) to {OUTPUT_PATH}")
+
+
+if __name__ == '__main__':
+    main()
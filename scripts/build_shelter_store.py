@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Builds a prebuilt columnar shelter store from data/berlin_shelters.json (or
+another emergency data file), so large deployments skip parsing the shelter
+dicts at start-up and on every reload.
+
+The store records the data version it was built from; the actions server only
+uses it while that matches the JSON, so rebuild after editing the shelters.
+
+Usage:
+    python scripts/build_shelter_store.py --output data/berlin_shelters.npz
+    ACTIONS_SHELTER_STORE=data/berlin_shelters.npz ./scripts/start_actions_server.sh
+"""
+
+import argparse
+import os
+import sys
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+sys.path.insert(0, PROJECT_DIR)
+
+from actions.shelters.shelter_store import ShelterStore  # noqa: E402
+from actions.utils.constants import DATA_PATH, data_version, read_emergency_data  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default=DATA_PATH)
+    parser.add_argument('--output', default=os.path.join(PROJECT_DIR, 'data', 'berlin_shelters.npz'))
+    args = parser.parse_args()
+
+    data = read_emergency_data(args.input)
+    store = ShelterStore.from_data(data, data_version(data))
+    store.save(args.output)
+    print(f"Wrote {len(store)} shelters in {len(store.districts)} districts "
+          f"({len(store.facilities)} facilities, data version {store.version}) to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
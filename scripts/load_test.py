@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Load generator that replays the test stories as concurrent conversations.
+
+Every story in testing/test_conversations.yml becomes a scripted conversation:
+each user step is given a message from the NLU examples of its intent (or from
+its entities, an unresolvable place where the story expects validation to fail,
+gibberish for nlu_fallback), and a share of location turns is sent as shared
+GPS points instead. Conversations arrive at --rate per second following a
+steady, ramp or spike profile, at most --concurrency at a time, and post their
+turns to the REST webhook with a short think time in between.
+
+Reports p50/p95/p99 per-turn latency overall and per intent, error rates and
+throughput, and writes everything to a JSON results file; --baseline prints
+the differences to an earlier results file. A local Nominatim stand-in is
+always started, and --start-stack also launches the action server (pointed at
+it) and the Rasa server, so a run needs no network access.
+
+Usage:
+    python scripts/load_test.py --start-stack --profile steady --rate 5 --duration 60
+    python scripts/load_test.py --url http://localhost:7860 --profile spike --rate 2 --spike-factor 10
+    python scripts/load_test.py --profile ramp --rate 20 --baseline load-results/steady-20260101-120000.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import yaml
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, PROJECT_DIR)
+
+from actions.utils.district_resolver import BORDER_MARGIN, DistrictResolver  # noqa: E402
+from nominatim_stub import NominatimStub  # noqa: E402
+
+STORIES_PATH = os.path.join(PROJECT_DIR, 'testing', 'test_conversations.yml')
+NLU_PATH = os.path.join(PROJECT_DIR, 'data', 'nlu.yml')
+RESULTS_DIR = os.path.join(PROJECT_DIR, 'load-results')
+MODEL_PATH = os.path.join(PROJECT_DIR, 'models', 'crisis-bot.tar.gz')
+
+# [text](entity) and [text]{"entity": ...} annotations in NLU examples
+ANNOTATION = re.compile(r'\[([^\]]+)\](?:\([^)]*\)|\{[^}]*\})')
+
+ENTITY_TEMPLATES = {
+    'district': "i'm in {}",
+    'postcode': 'my postcode is {}',
+}
+# Places the location validation cannot resolve, for steps that expect it to fail
+UNRESOLVABLE_LOCATIONS = ['somewhere near the big tower', 'Atlantis', 'by the old factory', 'Hamburg Altona']
+FALLBACK_TEXTS = ['asdf qwerty', 'blorp zang wibble', 'the purple elephant sings', '???']
+GPS_TEXT = 'sharing my gps location'
+LOCATION_INTENT = 'inform_location'
+
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class Turn:
+    intent: str
+    text: str
+    metadata: Optional[Dict[str, Any]] = None
+    # A location turn that may be sent as a shared GPS point instead
+    gps_eligible: bool = False
+
+
+@dataclass
+class Script:
+    story: str
+    turns: List[Turn]
+
+
+@dataclass
+class TurnResult:
+    story: str
+    intent: str
+    # Seconds since the start of the run
+    sent_at: float
+    latency_ms: float
+    # 'ok', 'empty' (no bot message), 'http_<status>', 'timeout' or 'error'
+    outcome: str
+
+
+@dataclass
+class RunState:
+    results: List[TurnResult] = field(default_factory=list)
+    started: int = 0
+    completed: int = 0
+    queue_ms: List[float] = field(default_factory=list)
+
+
+def load_examples(path: str = NLU_PATH) -> Dict[str, List[str]]:
+    """NLU examples by lower-cased intent name, with entity annotations reduced to their text."""
+    with open(path, 'r', encoding='utf-8') as f:
+        nlu = yaml.safe_load(f).get('nlu', [])
+    examples = {}
+    for item in nlu:
+        if 'intent' not in item:
+            continue
+        lines = [line.strip()[2:].strip() for line in item.get('examples', '').splitlines()
+                 if line.strip().startswith('- ')]
+        examples[item['intent'].lower()] = [ANNOTATION.sub(r'\1', line) for line in lines]
+    return examples
+
+
+def _expects_failed_validation(steps: List[Dict[str, Any]], index: int) -> bool:
+    """True if the story records location_validated: false before the next user step."""
+    for step in steps[index + 1:]:
+        if 'intent' in step:
+            return False
+        for slot in step.get('slot_was_set', []) or []:
+            if isinstance(slot, dict) and slot.get('location_validated') is False:
+                return True
+    return False
+
+
+def _gps_point(rng: random.Random, resolver: DistrictResolver) -> Dict[str, float]:
+    # Across the city outline plus its border margin, so some points need the geocoder
+    return {'lat': rng.uniform(resolver.min_lat - BORDER_MARGIN / 2, resolver.max_lat + BORDER_MARGIN / 2),
+            'lng': rng.uniform(resolver.min_lng - BORDER_MARGIN / 2, resolver.max_lng + BORDER_MARGIN / 2)}
+
+
+def build_scripts(examples: Dict[str, List[str]], rng: random.Random, path: str = STORIES_PATH) -> List[Script]:
+    with open(path, 'r', encoding='utf-8') as f:
+        stories = yaml.safe_load(f).get('stories', [])
+    scripts = []
+    for story in stories:
+        steps = story.get('steps', [])
+        turns = []
+        for index, step in enumerate(steps):
+            if 'intent' not in step:
+                continue
+            intent = step['intent'].lower()
+            entities = [(name, value) for entity in step.get('entities', []) or [] for name, value in entity.items()]
+            if entities:
+                name, value = entities[0]
+                turns.append(Turn(intent, ENTITY_TEMPLATES.get(name, '{}').format(value)))
+            elif intent == 'nlu_fallback':
+                turns.append(Turn(intent, rng.choice(FALLBACK_TEXTS)))
+            elif intent == LOCATION_INTENT and _expects_failed_validation(steps, index):
+                turns.append(Turn(intent, rng.choice(UNRESOLVABLE_LOCATIONS)))
+            else:
+                turns.append(Turn(intent, rng.choice(examples.get(intent) or [intent.replace('_', ' ')]),
+                                  gps_eligible=intent == LOCATION_INTENT))
+        if turns:
+            scripts.append(Script(story.get('story', f'story_{len(scripts)}'), turns))
+    return scripts
+
+
+def arrival_times(profile: str, rate: float, duration: float, rng: random.Random,
+                  spike_factor: float, spike_at: float, spike_length: float) -> List[float]:
+    """Poisson arrival offsets in seconds for a time-varying rate, by thinning."""
+    def rate_at(t):
+        if profile == 'ramp':
+            return rate * t / duration
+        if profile == 'spike' and spike_at <= t < spike_at + spike_length:
+            return rate * spike_factor
+        return rate
+
+    peak = rate * (spike_factor if profile == 'spike' else 1.0)
+    times, t = [], 0.0
+    while peak > 0:
+        t += rng.expovariate(peak)
+        if t >= duration:
+            break
+        if rng.random() * peak < rate_at(t):
+            times.append(t)
+    return times
+
+
+def with_gps(script: Script, rng: random.Random, gps_share: float, resolver: DistrictResolver) -> Script:
+    """The script for one conversation, with a share of its location turns sent as GPS points."""
+    turns = [Turn('share_gps_location', GPS_TEXT, {'location_coords': _gps_point(rng, resolver)})
+             if turn.gps_eligible and rng.random() < gps_share else turn
+             for turn in script.turns]
+    return Script(script.story, turns)
+
+
+async def send_turn(session: aiohttp.ClientSession, webhook: str, sender: str, turn: Turn) -> str:
+    payload = {'sender': sender, 'message': turn.text}
+    if turn.metadata:
+        payload['metadata'] = turn.metadata
+    async with session.post(webhook, json=payload) as response:
+        if response.status != 200:
+            return f'http_{response.status}'
+        messages = await response.json(content_type=None)
+    return 'ok' if messages else 'empty'
+
+
+async def run_conversation(session: aiohttp.ClientSession, webhook: str, script: Script, sender: str,
+                           think_time: float, rng: random.Random, run_started: float, state: RunState) -> None:
+    state.started += 1
+    for index, turn in enumerate(script.turns):
+        if index and think_time:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * think_time)
+        sent = time.perf_counter()
+        try:
+            outcome = await send_turn(session, webhook, sender, turn)
+        except asyncio.TimeoutError:
+            outcome = 'timeout'
+        except aiohttp.ClientError:
+            outcome = 'error'
+        state.results.append(TurnResult(script.story, turn.intent, sent - run_started,
+                                        (time.perf_counter() - sent) * 1e3, outcome))
+    state.completed += 1
+
+
+async def drive(args: argparse.Namespace, scripts: List[Script], arrivals: List[float],
+                resolver: DistrictResolver) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    state = RunState()
+    run_id = time.strftime('%Y%m%d%H%M%S')
+    semaphore = asyncio.Semaphore(args.concurrency)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    webhook = args.url.rstrip('/') + '/webhooks/rest/webhook'
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        run_started = time.perf_counter()
+
+        async def arrive(number, offset):
+            await asyncio.sleep(max(0.0, offset - (time.perf_counter() - run_started)))
+            arrived = time.perf_counter()
+            async with semaphore:
+                state.queue_ms.append((time.perf_counter() - arrived) * 1e3)
+                conversation_rng = random.Random(rng.random())
+                script = with_gps(scripts[number % len(scripts)], conversation_rng, args.gps_share, resolver)
+                await run_conversation(session, webhook, script, f'load-{run_id}-{number}',
+                                       args.think_time, conversation_rng, run_started, state)
+
+        await asyncio.gather(*(arrive(number, offset) for number, offset in enumerate(arrivals)))
+        elapsed = time.perf_counter() - run_started
+    return summarise(state, elapsed)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    summary = {f'p{q}': round(ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))], 2) for q in PERCENTILES}
+    summary['mean'] = round(statistics.fmean(ordered), 2)
+    summary['max'] = round(ordered[-1], 2)
+    return summary
+
+
+def summarise(state: RunState, elapsed: float) -> Dict[str, Any]:
+    results = state.results
+    outcomes: Dict[str, int] = {}
+    for result in results:
+        outcomes[result.outcome] = outcomes.get(result.outcome, 0) + 1
+    failed = [result for result in results if result.outcome not in ('ok', 'empty')]
+    per_intent = {}
+    for intent in sorted({result.intent for result in results}):
+        matching = [result for result in results if result.intent == intent]
+        per_intent[intent] = {
+            'turns': len(matching),
+            'errors': sum(1 for result in matching if result.outcome not in ('ok', 'empty')),
+            'latency_ms': percentiles([result.latency_ms for result in matching]),
+        }
+    timeline = []
+    for second in range(int(elapsed) + 1):
+        window = [result for result in results if second <= result.sent_at < second + 1]
+        if window:
+            timeline.append({'second': second, 'turns': len(window),
+                             'errors': sum(1 for result in window if result.outcome not in ('ok', 'empty')),
+                             'latency_ms': percentiles([result.latency_ms for result in window])})
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'conversations_started': state.started,
+        'conversations_completed': state.completed,
+        'turns': len(results),
+        'outcomes': outcomes,
+        'error_rate': round(len(failed) / len(results), 4) if results else 0.0,
+        'empty_rate': round(outcomes.get('empty', 0) / len(results), 4) if results else 0.0,
+        'throughput_turns_per_s': round(len(results) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': percentiles([result.latency_ms for result in results if result.outcome in ('ok', 'empty')]),
+        'queue_ms': percentiles(state.queue_ms),
+        'per_intent': per_intent,
+        'timeline': timeline,
+    }
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    latency = summary['latency_ms']
+    print(f"conversations: {summary['conversations_completed']}/{summary['conversations_started']} completed  "
+          f"turns: {summary['turns']}  wall time: {summary['elapsed_s']:.1f}s  "
+          f"throughput: {summary['throughput_turns_per_s']:.1f} turns/s")
+    print(f"errors: {summary['error_rate']:.2%}  empty replies: {summary['empty_rate']:.2%}  "
+          f"outcomes: {summary['outcomes']}")
+    if latency:
+        print(f"turn latency ms  p50={latency['p50']:.1f}  p95={latency['p95']:.1f}  p99={latency['p99']:.1f}  "
+              f"max={latency['max']:.1f}")
+    print(f"\n{'intent':<28} {'turns':>6} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for intent, row in summary['per_intent'].items():
+        row_latency = row['latency_ms']
+        print(f"{intent:<28} {row['turns']:>6} {row['errors']:>7} {row_latency['p50']:>8.1f} "
+              f"{row_latency['p95']:>8.1f} {row_latency['p99']:>8.1f}")
+
+
+def print_comparison(summary: Dict[str, Any], baseline_path: str) -> None:
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['summary']
+    print(f"\ncompared with {baseline_path}:")
+    rows = [(f'latency {name}', ['latency_ms', name]) for name in ('p50', 'p95', 'p99')]
+    rows += [('throughput turns/s', ['throughput_turns_per_s']), ('error rate', ['error_rate'])]
+    for label, path in rows:
+        before, after = baseline, summary
+        for key in path:
+            before, after = (before or {}).get(key), (after or {}).get(key)
+        if before is None or after is None:
+            continue
+        change = f"{(after - before) / before:+.1%}" if before else 'n/a'
+        print(f"  {label:<20} {before:>10.2f} -> {after:>10.2f}  ({change})")
+
+
+def wait_until_up(url: str, deadline: float, process: subprocess.Popen) -> None:
+    while time.time() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"{' '.join(process.args)} exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=2):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(1)
+    sys.exit(f"{url} did not come up in time")
+
+
+def start_stack(args: argparse.Namespace) -> List[subprocess.Popen]:
+    """Start the action server against the Nominatim stand-in and the Rasa server, and wait until both answer."""
+    env = dict(os.environ, NOMINATIM_URL=f'http://127.0.0.1:{args.nominatim_port}')
+    actions = subprocess.Popen([sys.executable, '-m', 'actions.server', '--port', str(args.actions_port)],
+                               cwd=PROJECT_DIR, env=env)
+    port = args.url.rstrip('/').rsplit(':', 1)[-1]
+    command = [sys.executable, '-m', 'rasa', 'run', '--enable-api', '--port', port]
+    if os.path.exists(MODEL_PATH):
+        command += ['--model', MODEL_PATH]
+    rasa = subprocess.Popen(command, cwd=PROJECT_DIR, env=env)
+    deadline = time.time() + args.startup_timeout
+    wait_until_up(f'http://127.0.0.1:{args.actions_port}/health', deadline, actions)
+    wait_until_up(args.url.rstrip('/') + '/', deadline, rasa)
+    return [rasa, actions]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:7860', help='Rasa server')
+    parser.add_argument('--profile', choices=('steady', 'ramp', 'spike'), default='steady')
+    parser.add_argument('--rate', type=float, default=5.0,
+                        help='new conversations per second (steady, the ramp peak, the spike base)')
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds over which conversations arrive')
+    parser.add_argument('--concurrency', type=int, default=100, help='conversations in flight at most')
+    parser.add_argument('--spike-factor', type=float, default=10.0, help='rate multiplier during the spike')
+    parser.add_argument('--spike-at', type=float, default=None, help='spike start in seconds (default: a third in)')
+    parser.add_argument('--spike-length', type=float, default=None, help='spike length (default: a sixth of the run)')
+    parser.add_argument('--think-time', type=float, default=1.0, help='mean pause between a conversation\'s turns')
+    parser.add_argument('--gps-share', type=float, default=0.3, help='share of location turns sent as GPS points')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds before a turn counts as timed out')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--nominatim-port', type=int, default=8088)
+    parser.add_argument('--nominatim-latency', type=float, default=0.2)
+    parser.add_argument('--start-stack', action='store_true', help='start the action and Rasa servers too')
+    parser.add_argument('--actions-port', type=int, default=5055)
+    parser.add_argument('--startup-timeout', type=float, default=300.0)
+    parser.add_argument('--output', help='results file (default: load-results/<profile>-<time>.json)')
+    parser.add_argument('--baseline', help='earlier results file to compare with')
+    parser.add_argument('--max-p95-ms', type=float, help='exit non-zero if p95 turn latency is above this')
+    parser.add_argument('--max-error-rate', type=float, help='exit non-zero if the error rate is above this')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    resolver = DistrictResolver.from_file()
+    scripts = build_scripts(load_examples(), rng)
+    spike_at = args.duration / 3 if args.spike_at is None else args.spike_at
+    spike_length = args.duration / 6 if args.spike_length is None else args.spike_length
+    arrivals = arrival_times(args.profile, args.rate, args.duration, rng, args.spike_factor, spike_at, spike_length)
+    print(f"{len(scripts)} scripted conversations from {os.path.relpath(STORIES_PATH, PROJECT_DIR)}, "
+          f"{len(arrivals)} arrivals over {args.duration:.0f}s ({args.profile})", flush=True)
+
+    stub = NominatimStub(latency=args.nominatim_latency)
+    stub_server = stub.serve(port=args.nominatim_port)
+    processes = start_stack(args) if args.start_stack else []
+    if not processes:
+        print(f"Nominatim stand-in on http://127.0.0.1:{args.nominatim_port}; start the action server with "
+              f"NOMINATIM_URL pointing there to keep the run offline", flush=True)
+    try:
+        summary = asyncio.run(drive(args, scripts, arrivals, resolver))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        stub_server.shutdown()
+    summary['nominatim_requests'] = stub.requests
+
+    print_summary(summary)
+    output = args.output or os.path.join(RESULTS_DIR, f"{args.profile}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')}
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'config': config, 'summary': summary}, f, indent=2)
+    print(f"\nresults written to {os.path.relpath(output)}")
+    if args.baseline:
+        print_comparison(summary, args.baseline)
+
+    latency = summary['latency_ms']
+    if args.max_p95_ms is not None and latency and latency['p95'] > args.max_p95_ms:
+        sys.exit(f"p95 turn latency {latency['p95']:.1f} ms is above {args.max_p95_ms:.1f} ms")
+    if args.max_error_rate is not None and summary['error_rate'] > args.max_error_rate:
+        sys.exit(f"error rate {summary['error_rate']:.2%} is above {args.max_error_rate:.2%}")
+
+
+if __name__ == '__main__':
+    main()
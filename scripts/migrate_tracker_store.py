@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Copies the conversations kept by Rasa's SQL tracker store in tracker.db (the
+tracker store endpoints.yml configured before the sharded store in
+stores/tracker_store.py) into the sharded store's files, so switching stores
+does not abandon them.
+
+Events are copied as stored, in order. A conversation the sharded store
+already has, because the user came back after the switch, gets its old events
+put in front of the new ones; if it has been compacted since, it is skipped
+and listed. 'warmup-' conversations are not copied. db_dir and shards are
+read from endpoints.yml. tracker.db is only read, and conversations already
+copied are recorded in each shard, so running the script again copies
+nothing twice. Stop the Rasa server first: it would not see the copied
+events of conversations it holds in memory.
+
+Usage:
+    python scripts/migrate_tracker_store.py [--source tracker.db] [--dry-run]
+"""
+
+import argparse
+import itertools
+import os
+import sqlite3
+import sys
+
+import yaml
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+sys.path.insert(0, PROJECT_DIR)
+
+from stores.tracker_store import (  # noqa: E402
+    DEFAULT_EPHEMERAL_PREFIX, DEFAULT_SHARDS, INSERT_EVENT, SCHEMA, ShardedSQLiteTrackerStore, shard_index, shard_path,
+)
+
+MIGRATIONS_SCHEMA = "CREATE TABLE IF NOT EXISTS migrated_senders (sender_id TEXT PRIMARY KEY, events INTEGER NOT NULL)"
+
+SOURCE_EVENTS_QUERY = "SELECT sender_id, type_name, timestamp, data FROM events ORDER BY sender_id, id"
+
+
+def sharded_store_config(endpoints_path):
+    with open(endpoints_path, 'r', encoding='utf-8') as f:
+        config = (yaml.safe_load(f) or {}).get('tracker_store') or {}
+    expected = f'{ShardedSQLiteTrackerStore.__module__}.{ShardedSQLiteTrackerStore.__name__}'
+    if config.get('type') != expected:
+        sys.exit(f"{endpoints_path} does not configure {expected} as the tracker store")
+    db_dir = os.path.join(os.path.dirname(os.path.abspath(endpoints_path)), config.get('db_dir', 'trackers'))
+    prefix = config.get('ephemeral_prefix', DEFAULT_EPHEMERAL_PREFIX)
+    return db_dir, int(config.get('shards', DEFAULT_SHARDS)), prefix or None
+
+
+def open_shards(db_dir, shards):
+    os.makedirs(db_dir, exist_ok=True)
+    connections = []
+    for index in range(shards):
+        connection = sqlite3.connect(shard_path(db_dir, index), isolation_level=None)
+        connection.execute('PRAGMA busy_timeout=5000')
+        connection.executescript(SCHEMA)
+        connection.execute(MIGRATIONS_SCHEMA)
+        connection.execute('BEGIN')
+        connections.append(connection)
+    return connections
+
+
+def migrate_sender(connection, sender_id, rows):
+    """Copy one conversation into its shard. Returns 'copied', 'merged', 'done' or 'compacted'."""
+    if connection.execute('SELECT 1 FROM migrated_senders WHERE sender_id = ?', (sender_id,)).fetchone():
+        return 'done'
+    if connection.execute('SELECT 1 FROM snapshots WHERE sender_id = ? UNION ALL '
+                          'SELECT 1 FROM archives WHERE sender_id = ?', (sender_id, sender_id)).fetchone():
+        return 'compacted'
+    # Event order is id order, so the old events are inserted first and the newer ones again after them
+    newer = connection.execute('SELECT type_name, timestamp, data FROM events WHERE sender_id = ? ORDER BY id',
+                               (sender_id,)).fetchall()
+    connection.execute('DELETE FROM events WHERE sender_id = ?', (sender_id,))
+    connection.executemany(INSERT_EVENT, [(sender_id,) + tuple(row) for row in rows + newer])
+    connection.execute('INSERT INTO migrated_senders (sender_id, events) VALUES (?, ?)', (sender_id, len(rows)))
+    return 'merged' if newer else 'copied'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=os.path.join(PROJECT_DIR, 'tracker.db'),
+                        help="SQLite file of Rasa's SQL tracker store")
+    parser.add_argument('--endpoints', default=os.path.join(PROJECT_DIR, 'endpoints.yml'))
+    parser.add_argument('--dry-run', action='store_true', help='report what would be copied without writing')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        sys.exit(f"{args.source} not found; there is nothing to migrate")
+    db_dir, shards, ephemeral_prefix = sharded_store_config(args.endpoints)
+    source = sqlite3.connect(f'file:{args.source}?mode=ro', uri=True)
+    connections = open_shards(db_dir, shards)
+
+    outcomes = {'copied': 0, 'merged': 0, 'done': 0, 'compacted': 0, 'ephemeral': 0}
+    events = 0
+    compacted = []
+    try:
+        for sender_id, group in itertools.groupby(source.execute(SOURCE_EVENTS_QUERY), key=lambda row: row[0]):
+            rows = [row[1:] for row in group]
+            if ephemeral_prefix and sender_id.startswith(ephemeral_prefix):
+                outcomes['ephemeral'] += 1
+                continue
+            outcome = migrate_sender(connections[shard_index(sender_id, shards)], sender_id, rows)
+            outcomes[outcome] += 1
+            if outcome in ('copied', 'merged'):
+                events += len(rows)
+            elif outcome == 'compacted':
+                compacted.append(sender_id)
+        for connection in connections:
+            connection.execute('ROLLBACK' if args.dry_run else 'COMMIT')
+    except BaseException:
+        for connection in connections:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+        raise
+    finally:
+        source.close()
+        for connection in connections:
+            connection.close()
+
+    print(f"{'Would copy' if args.dry_run else 'Copied'} {events} events of "
+          f"{outcomes['copied'] + outcomes['merged']} conversations from {args.source} to {shards} shards in {db_dir} "
+          f"({outcomes['merged']} merged with newer events, {outcomes['done']} already copied, "
+          f"{outcomes['ephemeral']} warm-up conversations left out)")
+    if compacted:
+        print(f"{len(compacted)} conversations were compacted in the sharded store since the switch and were not "
+              f"merged:")
+        for sender_id in compacted:
+            print(f"  {sender_id}")
+
+
+if __name__ == '__main__':
+    main()
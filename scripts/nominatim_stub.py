@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Nominatim's /reverse endpoint.
+
+Answers from the bundled district boundaries so the reverse-geocoding client
+can be tested, benchmarked and load-tested without touching the public
+service. Latency and error rate are configurable to exercise the cache,
+rate limiter and circuit breaker.
+
+Usage:
+    python scripts/nominatim_stub.py --port 8088 --latency 0.2 --error-rate 0.0
+    NOMINATIM_URL=http://localhost:8088 python -m rasa run actions --port 5055
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from actions.utils.district_resolver import DistrictResolver  # noqa: E402
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 makes bursts of connections wait on SYN retries
+    request_queue_size = 512
+
+
+class NominatimStub:
+    """Configurable fake upstream; counts the requests it served."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.resolver = DistrictResolver.from_file()
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def reverse(self, lat: float, lng: float) -> dict:
+        match = self.resolver.resolve(lat, lng)
+        if match.inside_berlin:
+            address = {'suburb': match.district, 'city': 'Berlin', 'state': 'Berlin', 'country': 'Germany'}
+        else:
+            address = {'town': 'Potsdam', 'state': 'Brandenburg', 'country': 'Germany'}
+        return {'lat': str(lat), 'lon': str(lng), 'address': address}
+
+    def make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                url = urlparse(self.path)
+                if url.path != '/reverse':
+                    self.send_error(404)
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if random.random() < stub.error_rate:
+                    self.send_error(503, 'Service Unavailable')
+                    return
+                params = parse_qs(url.query)
+                try:
+                    lat = float(params['lat'][0])
+                    lng = float(params['lon'][0])
+                except (KeyError, ValueError):
+                    self.send_error(400, 'lat and lon are required')
+                    return
+                body = json.dumps(stub.reverse(lat, lng)).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve(self, host: str = '127.0.0.1', port: int = 8088) -> StubServer:
+        """Start serving in a daemon thread and return the server."""
+        server = StubServer((host, port), self.make_handler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8088)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    args = parser.parse_args()
+
+    stub = NominatimStub(latency=args.latency, error_rate=args.error_rate)
+    server = StubServer((args.host, args.port), stub.make_handler())
+    print(f"Nominatim stub listening on http://{args.host}:{args.port}/reverse", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -10,4 +10,4 @@ if [ -d "venv" ]; then
 fi
 
 echo "Starting Rasa actions server on port 5055..."
-python -m rasa run actions --port 5055
+python -m actions.server --port 5055
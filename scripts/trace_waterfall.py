@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Per-turn latency waterfall from the spans in TRACE_FILE.
+
+Each trace is one turn: the Rasa server's 'turn' span with its tracker store,
+NLU and predict_and_run:<action> spans, and the action server's run:<action>
+spans with their outbound HTTP calls. Spans marked ~ are derived from event
+timestamps rather than timed directly (see tracing/channel.py).
+
+Shows the last --last turns by default, or the --slowest turns, or a single
+--trace / all turns of one --sender.
+
+Usage:
+    python scripts/trace_waterfall.py [--file traces/spans.jsonl] [--last 5]
+    python scripts/trace_waterfall.py --slowest 3
+    python scripts/trace_waterfall.py --sender 1f0c2e --width 60
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def load_traces(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    traces = defaultdict(list)
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                span = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash
+                continue
+            traces[span['trace_id']].append(span)
+    return traces
+
+
+def ordered(spans: List[Dict[str, Any]]) -> List[Any]:
+    """(depth, span) in waterfall order: children under their parent, by start time."""
+    ids = {span['span_id'] for span in spans}
+    children = defaultdict(list)
+    roots = []
+    for span in spans:
+        if span['parent_id'] in ids:
+            children[span['parent_id']].append(span)
+        else:
+            roots.append(span)
+    rows = []
+
+    def visit(span, depth):
+        rows.append((depth, span))
+        for child in sorted(children[span['span_id']], key=lambda s: (s['start'], -s['end'])):
+            visit(child, depth + 1)
+
+    for root in sorted(roots, key=lambda s: s['start']):
+        visit(root, 0)
+    return rows
+
+
+def print_trace(trace_id: str, spans: List[Dict[str, Any]], width: int) -> None:
+    start = min(span['start'] for span in spans)
+    end = max(span['end'] for span in spans)
+    total = max(end - start, 1e-9)
+    turn = next((span for span in spans if span['name'] == 'turn'), spans[0])
+    nlu = next((span for span in spans if span['name'] == 'nlu'), None)
+    intent = nlu['attributes'].get('intent') if nlu else None
+    print(f"trace {trace_id}  sender {turn['attributes'].get('sender_id')}  intent {intent}  "
+          f"{total * 1e3:.1f} ms")
+    for depth, span in ordered(spans):
+        offset = span['start'] - start
+        first = int(offset / total * width)
+        length = max(1, int(round((span['end'] - span['start']) / total * width)))
+        bar = ' ' * first + '█' * min(length, width - first)
+        marker = '~' if span['attributes'].get('derived') else ' '
+        label = f"{'  ' * depth}{span['name']}"
+        print(f"  {offset * 1e3:8.1f} {span['duration_ms']:8.1f} ms {span['service']:<8}{marker}"
+              f"{label:<44.44} |{bar:<{width}}|")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', default=os.environ.get('TRACE_FILE') or os.path.join(PROJECT_DIR, 'traces',
+                                                                                         'spans.jsonl'))
+    parser.add_argument('--trace', help='trace id to show')
+    parser.add_argument('--sender', help='show every turn of this conversation')
+    parser.add_argument('--last', type=int, default=5, help='number of most recent turns')
+    parser.add_argument('--slowest', type=int, help='show the N slowest turns instead')
+    parser.add_argument('--width', type=int, default=40, help='width of the bars')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        sys.exit(f"no trace file at {args.file}; start the servers with TRACE_FILE set")
+    traces = load_traces(args.file)
+
+    def duration(spans):
+        return max(span['end'] for span in spans) - min(span['start'] for span in spans)
+
+    if args.trace:
+        selected = [args.trace] if args.trace in traces else []
+    else:
+        candidates = list(traces)
+        if args.sender:
+            candidates = [trace_id for trace_id in candidates if any(
+                span['attributes'].get('sender_id') == args.sender for span in traces[trace_id])]
+        if args.slowest:
+            selected = sorted(candidates, key=lambda trace_id: duration(traces[trace_id]), reverse=True)
+            selected = selected[:args.slowest]
+        else:
+            selected = sorted(candidates, key=lambda trace_id: min(span['start'] for span in traces[trace_id]))
+            if not args.sender:
+                selected = selected[-args.last:]
+    if not selected:
+        sys.exit("no matching traces")
+    print(f"{'start':>10} {'duration':>11} {'service':<9}{'span':<44} waterfall\n")
+    for trace_id in selected:
+        print_trace(trace_id, traces[trace_id], args.width)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+from .lock_store import SQLiteLockStore
+from .tracker_store import ShardedSQLiteTrackerStore
+
+__all__ = [
+    'SQLiteLockStore',
+    'ShardedSQLiteTrackerStore',
+]
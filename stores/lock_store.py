@@ -0,0 +1,170 @@
+"""
+Ticket lock store in a SQLite file, for several Rasa server processes on one node.
+
+Rasa holds a conversation's lock while it handles a message, so two messages
+from the same sender are never processed at once. The stock in-memory store
+only works within one process and the Redis one needs a Redis server; this
+one keeps the tickets in a table every process on the node opens.
+
+Each ticket is a row issued in its own IMMEDIATE transaction, numbered by
+AUTOINCREMENT, so tickets for a conversation are served strictly in the
+order they were issued (first come, first served per sender) and numbers
+are never reused. A ticket expires lock_lifetime seconds after it was issued
+(TICKET_LOCK_LIFETIME, default 60), so a process that dies while holding a
+lock blocks that conversation for at most that long. Waiters poll the head of
+their conversation's queue, starting at poll_interval and backing off to
+max_poll_interval.
+
+Configure in endpoints.yml:
+
+    lock_store:
+      type: stores.lock_store.SQLiteLockStore
+      db_path: trackers/locks.db
+
+Together with the tracker store in shared mode (see tracker_store.py).
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Text
+
+from rasa.core.lock import Ticket, TicketLock
+from rasa.core.lock_store import LOCK_LIFETIME, LockError, LockStore
+from rasa.utils.endpoints import EndpointConfig
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join('trackers', 'locks.db')
+DEFAULT_POLL_INTERVAL_SECONDS = 0.002
+DEFAULT_MAX_POLL_INTERVAL_SECONDS = 0.01
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    number INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tickets_conversation ON tickets (conversation_id, number);
+"""
+
+LIVE_TICKETS_QUERY = "SELECT number, expires FROM tickets WHERE conversation_id = ? AND expires > ? ORDER BY number"
+
+NOW_SERVING_QUERY = "SELECT MIN(number) FROM tickets WHERE conversation_id = ? AND expires > ?"
+
+TICKET_QUERY = "SELECT 1 FROM tickets WHERE number = ? AND expires > ?"
+
+DELETE_EXPIRED = "DELETE FROM tickets WHERE conversation_id = ? AND expires <= ?"
+
+
+class SQLiteLockStore(LockStore):
+    """Ticket locks in one SQLite file shared by every process that opens it."""
+
+    def __init__(self, endpoint_config: Optional[EndpointConfig] = None, db_path: Text = DEFAULT_DB_PATH,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+                 max_poll_interval: float = DEFAULT_MAX_POLL_INTERVAL_SECONDS, **kwargs: Any) -> None:
+        # Loaded from endpoints.yml, Rasa passes the whole endpoint config
+        options = dict(endpoint_config.kwargs) if endpoint_config is not None else {}
+        self.db_path = options.get('db_path', db_path)
+        self.poll_interval = float(options.get('poll_interval', poll_interval))
+        self.max_poll_interval = float(options.get('max_poll_interval', max_poll_interval))
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+        self.acquired = 0
+        self.waits = 0
+        self.expired = 0
+        self._db().executescript(SCHEMA)
+        super().__init__()
+
+    def _db(self) -> sqlite3.Connection:
+        # A connection must not be used across fork, so each process opens its own
+        if self._connection_pid != os.getpid():
+            self._connection = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute('PRAGMA busy_timeout=5000')
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _write(self, *statements: Any) -> sqlite3.Cursor:
+        """Run (sql, params) statements in one IMMEDIATE transaction; returns the last cursor."""
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, params in statements:
+                cursor = db.execute(sql, params)
+            db.execute('COMMIT')
+        except sqlite3.Error:
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+            raise
+        return cursor
+
+    def issue_ticket(self, conversation_id: Text, lock_lifetime: float = LOCK_LIFETIME) -> int:
+        """Append a ticket to the conversation's queue; returns its number."""
+        now = time.time()
+        try:
+            cursor = self._write((DELETE_EXPIRED, (conversation_id, now)),
+                                 ('INSERT INTO tickets (conversation_id, expires) VALUES (?, ?)',
+                                  (conversation_id, now + lock_lifetime)))
+        except sqlite3.Error as e:
+            raise LockError(f"Error while acquiring lock. Error:\n{e}")
+        return cursor.lastrowid
+
+    async def _acquire_lock(self, conversation_id: Text, ticket: int, wait_time_in_seconds: float) -> TicketLock:
+        delay = self.poll_interval
+        waited = False
+        while True:
+            now = time.time()
+            db = self._db()
+            (now_serving,) = db.execute(NOW_SERVING_QUERY, (conversation_id, now)).fetchone()
+            if now_serving == ticket:
+                self.acquired += 1
+                if waited:
+                    self.waits += 1
+                return self.get_lock(conversation_id) or self.create_lock(conversation_id)
+            if now_serving is None or db.execute(TICKET_QUERY, (ticket, now)).fetchone() is None:
+                # Our ticket expired while waiting
+                self.expired += 1
+                raise LockError(f"Could not acquire lock for conversation_id '{conversation_id}'.")
+            waited = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll_interval, wait_time_in_seconds)
+
+    def get_lock(self, conversation_id: Text) -> Optional[TicketLock]:
+        rows = self._db().execute(LIVE_TICKETS_QUERY, (conversation_id, time.time())).fetchall()
+        if not rows:
+            return None
+        return TicketLock(conversation_id, deque(Ticket(number, expires) for number, expires in rows))
+
+    def save_lock(self, lock: TicketLock) -> None:
+        self._write(('DELETE FROM tickets WHERE conversation_id = ?', (lock.conversation_id,)),
+                    *(('INSERT INTO tickets (number, conversation_id, expires) VALUES (?, ?, ?)',
+                       (ticket.number, lock.conversation_id, ticket.expires)) for ticket in lock.tickets))
+
+    def delete_lock(self, conversation_id: Text) -> None:
+        cursor = self._write(('DELETE FROM tickets WHERE conversation_id = ?', (conversation_id,)))
+        self._log_deletion(conversation_id, cursor.rowcount > 0)
+
+    def update_lock(self, conversation_id: Text) -> None:
+        self._write((DELETE_EXPIRED, (conversation_id, time.time())))
+
+    def is_someone_waiting(self, conversation_id: Text) -> bool:
+        return self._db().execute(NOW_SERVING_QUERY, (conversation_id, time.time())).fetchone()[0] is not None
+
+    def finish_serving(self, conversation_id: Text, ticket_number: int) -> None:
+        self._write(('DELETE FROM tickets WHERE number = ?', (ticket_number,)))
+
+    def cleanup(self, conversation_id: Text, ticket_number: int) -> None:
+        # Tickets are the only state, so removing ours (and any expired ones) releases the lock
+        self._write(('DELETE FROM tickets WHERE number = ?', (ticket_number,)),
+                    (DELETE_EXPIRED, (conversation_id, time.time())))
+
+    def stats(self) -> Dict[Text, Any]:
+        return {'acquired': self.acquired, 'waits': self.waits, 'expired': self.expired}
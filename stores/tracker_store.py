@@ -0,0 +1,555 @@
+"""
+Sharded SQLite tracker store with an in-memory tier and write-behind batching.
+
+Hot conversations are served from an LRU of serialised events, so a turn does
+not read the database. New events are queued per shard and written by one
+background thread per shard in a single WAL transaction every flush_interval
+seconds, instead of one transaction per turn through a single writer.
+Conversations are spread over the shard files by a stable hash of sender_id.
+
+Durability: events of the last flush_interval seconds (and never more than
+max_pending events per shard, after which save() writes inline) are only in
+memory and are lost if the process dies. With synchronous=NORMAL, committed
+transactions survive a process crash; an OS crash or power loss can also
+lose the last few commits.
+
+Long sessions are compacted: once the latest session holds more than
+snapshot_every events, everything but a recent tail of at least keep_events is
+moved into a compressed archive and replaced by a checkpoint (the session
+start plus SlotSet / ActiveLoop events restoring the state at the cut), so
+what retrieve() loads stays bounded. retrieve_full_tracker() still returns the
+complete history from the archives. Archives are zstd-compressed when the
+optional zstandard package is installed, zlib otherwise.
+
+With shared: true, several Rasa server processes can use the same files, one
+at a time per conversation under a cross-process lock store (see
+lock_store.py): save() writes through instead of batching, and a
+conversation held in memory is reloaded whenever its newest event on disk is
+not the one this process last saw, i.e. another process handled it since.
+
+Conversations whose sender_id starts with ephemeral_prefix (by default the
+'warmup-' ids of warmup.py) are kept in the memory tier only and never
+written, and any left on disk by earlier versions are deleted on start, so
+warming a server up leaves nothing behind in the store.
+
+Configure in endpoints.yml:
+
+    tracker_store:
+      type: stores.tracker_store.ShardedSQLiteTrackerStore
+      db_dir: trackers
+      shards: 8
+      snapshot_every: 200
+      keep_events: 50
+      shared: false
+      ephemeral_prefix: warmup-
+"""
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Text, Tuple
+
+from rasa.core.brokers.broker import EventBroker
+from rasa.core.tracker_store import TrackerStore
+from rasa.shared.core.domain import Domain
+from rasa.shared.core.events import ActionExecuted, ActiveLoop, SessionStarted, SlotSet, UserUttered
+from rasa.shared.core.trackers import DialogueStateTracker
+
+from tracing import TRACER
+from tracing.channel import record_saved_events
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARDS = 8
+DEFAULT_MEMORY_CAPACITY = 10000
+DEFAULT_FLUSH_INTERVAL_SECONDS = 0.2
+DEFAULT_MAX_PENDING_EVENTS = 5000
+DEFAULT_SNAPSHOT_EVERY_EVENTS = 200
+# More than the longest window the actions look back over (see actions/utils/conversation_summary.py)
+DEFAULT_KEEP_EVENTS = 50
+# Sender ids of the warm-up conversations opened by warmup.py
+DEFAULT_EPHEMERAL_PREFIX = 'warmup-'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender_id TEXT NOT NULL,
+    type_name TEXT NOT NULL,
+    timestamp REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_sender ON events (sender_id, id);
+CREATE TABLE IF NOT EXISTS snapshots (
+    sender_id TEXT PRIMARY KEY,
+    last_event_id INTEGER NOT NULL,
+    checkpoint TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS archives (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender_id TEXT NOT NULL,
+    last_event_id INTEGER NOT NULL,
+    codec TEXT NOT NULL,
+    events BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS archives_sender ON archives (sender_id, id);
+"""
+
+LATEST_SESSION_START_QUERY = "SELECT MAX(id) FROM events WHERE sender_id = ? AND type_name = ?"
+
+EVENTS_FROM_QUERY = "SELECT id, data FROM events WHERE sender_id = ? AND id >= ? ORDER BY id"
+
+SNAPSHOT_QUERY = "SELECT last_event_id, checkpoint FROM snapshots WHERE sender_id = ?"
+
+ARCHIVES_QUERY = "SELECT codec, events FROM archives WHERE sender_id = ? ORDER BY id"
+
+ALL_SESSIONS_QUERY = "SELECT data FROM events WHERE sender_id = ? ORDER BY id"
+
+INSERT_EVENT = "INSERT INTO events (sender_id, type_name, timestamp, data) VALUES (?, ?, ?, ?)"
+
+LAST_EVENT_ID_QUERY = "SELECT MAX(id) FROM events WHERE sender_id = ?"
+
+# (sender_id, type_name, timestamp, serialised event)
+EventRow = Tuple[Text, Text, Optional[float], Text]
+
+
+def _compress(codec: Text, events: List[Text]) -> bytes:
+    payload = ('[' + ','.join(events) + ']').encode('utf-8')
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor().compress(payload)
+    return zlib.compress(payload)
+
+
+def _decompress(codec: Text, blob: bytes) -> List[Text]:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Tracker history was archived with zstd; install the zstandard package to read it")
+        payload = zstandard.ZstdDecompressor().decompress(blob)
+    else:
+        payload = zlib.decompress(blob)
+    return [json.dumps(event) for event in json.loads(payload)]
+
+
+def shard_path(db_dir: Text, index: int) -> Text:
+    return os.path.join(db_dir, f'trackers-{index:02d}.db')
+
+
+def shard_index(sender_id: Text, shards: int) -> int:
+    # crc32 rather than hash(): the shard must be the same in every process and run
+    return zlib.crc32(sender_id.encode('utf-8')) % shards
+
+
+def _connect(path: Text) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute('PRAGMA busy_timeout=5000')
+    return connection
+
+
+class _Shard:
+    """One SQLite file with its write queue and writer thread."""
+
+    def __init__(self, path: Text, flush_interval: float):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        # Serialises writes to this file between the writer thread and inline flushes
+        self.write_lock = threading.Lock()
+        self.pending: List[EventRow] = []
+        # Per sender, events queued or being written; such senders are never evicted from memory
+        self.unflushed: Dict[Text, int] = {}
+        self.wake = threading.Event()
+        self.flushes = 0
+        self.flushed_events = 0
+        self.compactions = 0
+        self.archived_events = 0
+        self.writer = _connect(path)
+        self.writer.executescript(SCHEMA)
+        # Reads come from the event loop thread; WAL lets them run alongside the writer
+        self.reader = _connect(path)
+        self._thread_pid: Optional[int] = None
+
+    def ensure_writer_thread(self) -> None:
+        # Threads do not survive fork, so each process starts its own writers
+        if self._thread_pid != os.getpid():
+            self._thread_pid = os.getpid()
+            thread = threading.Thread(target=self._run, name=f'tracker-writer-{os.path.basename(self.path)}',
+                                      daemon=True)
+            thread.start()
+
+    def enqueue(self, rows: List[EventRow]) -> int:
+        with self.lock:
+            self.pending.extend(rows)
+            for row in rows:
+                self.unflushed[row[0]] = self.unflushed.get(row[0], 0) + 1
+            return len(self.pending)
+
+    def is_unflushed(self, sender_id: Text) -> bool:
+        with self.lock:
+            return sender_id in self.unflushed
+
+    def _run(self) -> None:
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error("Writing tracker events to %s failed, will retry: %s", self.path, e)
+
+    def flush(self) -> int:
+        """Write every queued event in one transaction. Returns the number written."""
+        with self.write_lock:
+            with self.lock:
+                batch, self.pending = self.pending, []
+            if not batch:
+                return 0
+            try:
+                self.writer.execute('BEGIN')
+                self.writer.executemany(INSERT_EVENT, batch)
+                self.writer.execute('COMMIT')
+            except sqlite3.Error:
+                if self.writer.in_transaction:
+                    self.writer.execute('ROLLBACK')
+                # Put the batch back in front of anything queued meanwhile, keeping event order
+                with self.lock:
+                    self.pending = batch + self.pending
+                raise
+            with self.lock:
+                for row in batch:
+                    remaining = self.unflushed[row[0]] - 1
+                    if remaining:
+                        self.unflushed[row[0]] = remaining
+                    else:
+                        del self.unflushed[row[0]]
+            self.flushes += 1
+            self.flushed_events += len(batch)
+            return len(batch)
+
+    def _latest_session(self, connection: sqlite3.Connection,
+                        sender_id: Text) -> Tuple[List[Text], List[Tuple[int, Text]]]:
+        """Checkpoint events and (id, data) rows of the latest session."""
+        (session_start,) = connection.execute(LATEST_SESSION_START_QUERY,
+                                              (sender_id, SessionStarted.type_name)).fetchone()
+        snapshot = connection.execute(SNAPSHOT_QUERY, (sender_id,)).fetchone()
+        if snapshot is not None and (session_start or 0) <= snapshot[0]:
+            # The latest session was compacted and no new session started since
+            last_event_id, checkpoint = snapshot
+            return json.loads(checkpoint), connection.execute(EVENTS_FROM_QUERY,
+                                                              (sender_id, last_event_id + 1)).fetchall()
+        return [], connection.execute(EVENTS_FROM_QUERY, (sender_id, session_start or 0)).fetchall()
+
+    def load(self, sender_id: Text, all_sessions: bool) -> List[Text]:
+        if all_sessions:
+            events = []
+            for codec, blob in self.reader.execute(ARCHIVES_QUERY, (sender_id,)):
+                events.extend(_decompress(codec, blob))
+            events.extend(data for (data,) in self.reader.execute(ALL_SESSIONS_QUERY, (sender_id,)))
+            return events
+        checkpoint, rows = self._latest_session(self.reader, sender_id)
+        return checkpoint + [data for _, data in rows]
+
+    def compact(self, sender_id: Text, keep_events: int, codec: Text,
+                build_checkpoint: Callable[[List[Text]], List[Text]]) -> Optional[List[Text]]:
+        """
+        Archive the sender's events before the recent tail and store a
+        checkpoint in their place. Returns the compacted latest session, or None
+        if there is no turn boundary to cut at. The sender must have no queued
+        events.
+        """
+        with self.write_lock:
+            checkpoint, rows = self._latest_session(self.writer, sender_id)
+            events = checkpoint + [data for _, data in rows]
+            cut = _cut_position(events, len(checkpoint), keep_events)
+            if cut is None:
+                return None
+            last_event_id = rows[cut - len(checkpoint) - 1][0]
+            new_checkpoint = build_checkpoint(events[:cut])
+            # Earlier sessions go into the archive too, keeping the events table to live tails
+            archived = [data for (data,) in self.writer.execute(
+                'SELECT data FROM events WHERE sender_id = ? AND id <= ? ORDER BY id', (sender_id, last_event_id))]
+            try:
+                self.writer.execute('BEGIN')
+                self.writer.execute('INSERT INTO archives (sender_id, last_event_id, codec, events) VALUES (?, ?, ?, ?)',
+                                    (sender_id, last_event_id, codec, _compress(codec, archived)))
+                self.writer.execute('DELETE FROM events WHERE sender_id = ? AND id <= ?', (sender_id, last_event_id))
+                self.writer.execute('INSERT OR REPLACE INTO snapshots (sender_id, last_event_id, checkpoint) '
+                                    'VALUES (?, ?, ?)', (sender_id, last_event_id, json.dumps(new_checkpoint)))
+                self.writer.execute('COMMIT')
+            except sqlite3.Error:
+                if self.writer.in_transaction:
+                    self.writer.execute('ROLLBACK')
+                raise
+            self.compactions += 1
+            self.archived_events += len(archived)
+            return new_checkpoint + events[cut:]
+
+    def delete_prefix(self, prefix: Text) -> int:
+        """Delete every conversation whose sender_id starts with prefix. Returns the number of events deleted."""
+        # A range rather than LIKE, so the sender_id indexes are used
+        bounds = (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        with self.write_lock:
+            try:
+                self.writer.execute('BEGIN')
+                deleted = self.writer.execute('DELETE FROM events WHERE sender_id >= ? AND sender_id < ?',
+                                              bounds).rowcount
+                self.writer.execute('DELETE FROM snapshots WHERE sender_id >= ? AND sender_id < ?', bounds)
+                self.writer.execute('DELETE FROM archives WHERE sender_id >= ? AND sender_id < ?', bounds)
+                self.writer.execute('COMMIT')
+            except sqlite3.Error:
+                if self.writer.in_transaction:
+                    self.writer.execute('ROLLBACK')
+                raise
+            return deleted
+
+    def last_event_id(self, sender_id: Text) -> Optional[int]:
+        return self.reader.execute(LAST_EVENT_ID_QUERY, (sender_id,)).fetchone()[0]
+
+    def keys(self) -> List[Text]:
+        return [sender_id for (sender_id,) in self.reader.execute(
+            'SELECT sender_id FROM events UNION SELECT sender_id FROM snapshots')]
+
+
+def _cut_position(events: List[Text], start: int, keep_events: int) -> Optional[int]:
+    """
+    Index at which to split events into archived head and kept tail: the
+    latest user turn (its preceding action_listen included) leaving at least
+    keep_events in the tail and at least one real event, at index start or
+    later, in the head.
+    """
+    for index in range(len(events) - keep_events, start, -1):
+        event = json.loads(events[index])
+        if event.get('event') != UserUttered.type_name:
+            continue
+        previous = json.loads(events[index - 1])
+        if (index - 1 > start and previous.get('event') == ActionExecuted.type_name
+                and previous.get('name') == 'action_listen'):
+            return index - 1
+        return index
+    return None
+
+
+class ShardedSQLiteTrackerStore(TrackerStore):
+    """
+    Tracker store over several SQLite files with an LRU memory tier.
+
+    The memory tier holds the serialised events of each conversation's latest
+    session, exactly what retrieve() returns, so saving only has to append the
+    events that are new since then. Compaction happens on retrieve(), so the
+    tracker handed out for a turn is already the compacted one.
+    """
+
+    def __init__(self, domain: Optional[Domain] = None, event_broker: Optional[EventBroker] = None,
+                 db_dir: Text = 'trackers', shards: int = DEFAULT_SHARDS,
+                 memory_capacity: int = DEFAULT_MEMORY_CAPACITY,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL_SECONDS,
+                 max_pending: int = DEFAULT_MAX_PENDING_EVENTS,
+                 snapshot_every: int = DEFAULT_SNAPSHOT_EVERY_EVENTS, keep_events: int = DEFAULT_KEEP_EVENTS,
+                 archive_codec: Text = 'zstd', shared: bool = False,
+                 ephemeral_prefix: Optional[Text] = DEFAULT_EPHEMERAL_PREFIX, **kwargs: Any) -> None:
+        os.makedirs(db_dir, exist_ok=True)
+        self.db_dir = db_dir
+        self.memory_capacity = int(memory_capacity)
+        self.max_pending = int(max_pending)
+        # 0 disables compaction
+        self.snapshot_every = int(snapshot_every)
+        self.keep_events = min(int(keep_events), self.snapshot_every)
+        if archive_codec == 'zstd' and zstandard is None:
+            logger.info("zstandard is not installed, archiving tracker history with zlib")
+            archive_codec = 'zlib'
+        if archive_codec not in ('zstd', 'zlib'):
+            raise ValueError(f"Unknown archive_codec '{archive_codec}', expected 'zstd' or 'zlib'")
+        self.archive_codec = archive_codec
+        self.shared = bool(shared)
+        self.ephemeral_prefix = ephemeral_prefix or None
+        self._shards = [_Shard(shard_path(db_dir, index), float(flush_interval)) for index in range(int(shards))]
+        if self.ephemeral_prefix:
+            deleted = sum(shard.delete_prefix(self.ephemeral_prefix) for shard in self._shards)
+            if deleted:
+                logger.info("Deleted %d stored events of '%s' conversations", deleted, self.ephemeral_prefix)
+        # sender_id -> serialised events of the latest session
+        self._memory: 'OrderedDict[Text, List[Text]]' = OrderedDict()
+        # In shared mode, sender_id -> id of the newest event on disk when the memory entry was made
+        self._versions: Dict[Text, Optional[int]] = {}
+        self.memory_stale = 0
+        self.memory_hits = 0
+        self.memory_misses = 0
+        atexit.register(self.flush)
+        super().__init__(domain, event_broker, **kwargs)
+
+    def _is_ephemeral(self, sender_id: Text) -> bool:
+        return self.ephemeral_prefix is not None and sender_id.startswith(self.ephemeral_prefix)
+
+    def _shard(self, sender_id: Text) -> _Shard:
+        return self._shards[shard_index(sender_id, len(self._shards))]
+
+    def _remember(self, sender_id: Text, events: List[Text]) -> None:
+        self._memory[sender_id] = events
+        self._memory.move_to_end(sender_id)
+        excess = len(self._memory) - self.memory_capacity
+        if excess <= 0:
+            return
+        # Evict the least recently used conversations whose events are all on disk
+        victims = []
+        for candidate in self._memory:
+            if len(victims) >= excess:
+                break
+            if candidate != sender_id and not self._shard(candidate).is_unflushed(candidate):
+                victims.append(candidate)
+        for victim in victims:
+            del self._memory[victim]
+            self._versions.pop(victim, None)
+
+    def _session_events(self, sender_id: Text) -> Optional[List[Text]]:
+        shard = self._shard(sender_id)
+        events = self._memory.get(sender_id)
+        version = shard.last_event_id(sender_id) if self.shared else None
+        if events is not None and version != self._versions.get(sender_id):
+            # Another process saved events for this conversation since
+            self.memory_stale += 1
+            events = None
+        if events is not None:
+            self._memory.move_to_end(sender_id)
+            self.memory_hits += 1
+            return events
+        self.memory_misses += 1
+        # Conversations with queued events are never evicted, so the file is up to date here
+        events = shard.load(sender_id, all_sessions=False)
+        if not events:
+            return None
+        if self.shared:
+            self._versions[sender_id] = version
+        self._remember(sender_id, events)
+        return events
+
+    def _tracker(self, sender_id: Text, events: List[Text]) -> DialogueStateTracker:
+        return DialogueStateTracker.from_dict(sender_id, [json.loads(event) for event in events],
+                                              self.domain.slots, self.max_event_history)
+
+    def _checkpoint(self, sender_id: Text, head: List[Text]) -> List[Text]:
+        """Events that restore the state reached at the end of head: its session start, slots and active loop."""
+        tracker = self._tracker(sender_id, head)
+        parsed = [json.loads(event) for event in head[:3]]
+        session_start = [index for index, event in enumerate(parsed) if event.get('event') == SessionStarted.type_name]
+        checkpoint = list(head[:session_start[0] + 1]) if session_start else []
+        timestamp = json.loads(head[-1]).get('timestamp')
+        state = [SlotSet(slot.name, slot.value, timestamp=timestamp)
+                 for slot in tracker.slots.values() if slot.value != slot.initial_value]
+        if tracker.active_loop_name:
+            state.append(ActiveLoop(tracker.active_loop_name, timestamp=timestamp))
+        return checkpoint + [json.dumps(event.as_dict()) for event in state]
+
+    def _compact(self, sender_id: Text, events: List[Text]) -> List[Text]:
+        shard = self._shard(sender_id)
+        if shard.is_unflushed(sender_id):
+            shard.flush()
+        compacted = shard.compact(sender_id, self.keep_events, self.archive_codec,
+                                  lambda head: self._checkpoint(sender_id, head))
+        if compacted is None:
+            return events
+        self._remember(sender_id, compacted)
+        return compacted
+
+    async def retrieve(self, sender_id: Text) -> Optional[DialogueStateTracker]:
+        """Tracker with the events of the latest conversation session, compacted if it grew too long."""
+        with TRACER.span('tracker_store.retrieve') as span:
+            events = self._session_events(sender_id)
+            if events is None:
+                return None
+            if self.snapshot_every and len(events) > self.snapshot_every:
+                events = self._compact(sender_id, events)
+            if span is not None:
+                span.set('events', len(events))
+            return self._tracker(sender_id, events)
+
+    async def retrieve_full_tracker(self, conversation_id: Text) -> Optional[DialogueStateTracker]:
+        """Tracker with the events of every session, archived ones included, read from disk after flushing."""
+        shard = self._shard(conversation_id)
+        if shard.is_unflushed(conversation_id):
+            shard.flush()
+        events = shard.load(conversation_id, all_sessions=True)
+        if not events:
+            return None
+        return self._tracker(conversation_id, events)
+
+    async def save(self, tracker: DialogueStateTracker) -> None:
+        """Queue the tracker's new events for the next batched write."""
+        with TRACER.span('tracker_store.save'):
+            await self._save(tracker)
+
+    async def _save(self, tracker: DialogueStateTracker) -> None:
+        sender_id = tracker.sender_id
+        stored = self._session_events(sender_id) or []
+        new_events = list(tracker.events)[len(stored):]
+        if not new_events:
+            return
+
+        ephemeral = self._is_ephemeral(sender_id)
+        if self.event_broker is not None and not ephemeral:
+            await self._stream_new_events(self.event_broker, new_events, sender_id)
+
+        rows: List[EventRow] = []
+        saved: List[Dict[Text, Any]] = []
+        session_events = list(stored)
+        for event in new_events:
+            data = event.as_dict()
+            serialised = json.dumps(data)
+            rows.append((sender_id, event.type_name, data.get('timestamp'), serialised))
+            saved.append(data)
+            if isinstance(event, SessionStarted):
+                # The memory tier, like retrieve(), only keeps the latest session
+                session_events = []
+            session_events.append(serialised)
+        if ephemeral:
+            # Memory only; evicted like any other conversation once it falls out of the LRU
+            self._remember(sender_id, session_events)
+            return
+        record_saved_events(saved)
+
+        shard = self._shard(sender_id)
+        shard.ensure_writer_thread()
+        pending = shard.enqueue(rows)
+        self._remember(sender_id, session_events)
+        if self.shared:
+            # The next turn of this conversation may be handled by another process
+            shard.flush()
+            self._versions[sender_id] = shard.last_event_id(sender_id)
+        elif pending >= self.max_pending:
+            # Bound what a crash can lose: write now rather than wait for the writer thread
+            shard.flush()
+        elif pending >= self.max_pending // 2:
+            shard.wake.set()
+
+    async def keys(self) -> Iterable[Text]:
+        self.flush()
+        keys = {sender_id for sender_id in self._memory if not self._is_ephemeral(sender_id)}
+        for shard in self._shards:
+            keys.update(shard.keys())
+        return keys
+
+    def flush(self) -> int:
+        """Write all queued events now, e.g. before shutdown. Returns the number written."""
+        return sum(shard.flush() for shard in self._shards)
+
+    def stats(self) -> Dict[Text, Any]:
+        return {
+            'memory_conversations': len(self._memory),
+            'memory_hits': self.memory_hits,
+            'memory_misses': self.memory_misses,
+            'memory_stale': self.memory_stale,
+            'pending_events': sum(len(shard.pending) for shard in self._shards),
+            'flushes': sum(shard.flushes for shard in self._shards),
+            'flushed_events': sum(shard.flushed_events for shard in self._shards),
+            'compactions': sum(shard.compactions for shard in self._shards),
+            'archived_events': sum(shard.archived_events for shard in self._shards),
+        }
@@ -0,0 +1,17 @@
+from .spans import (
+    TRACEPARENT_KEY,
+    TRACER,
+    Span,
+    Tracer,
+    format_traceparent,
+    parse_traceparent,
+)
+
+__all__ = [
+    'TRACEPARENT_KEY',
+    'TRACER',
+    'Span',
+    'Tracer',
+    'format_traceparent',
+    'parse_traceparent',
+]
@@ -0,0 +1,87 @@
+"""
+REST input channel that traces every turn on the Rasa server.
+
+Serves the same /webhooks/rest/webhook as Rasa's rest channel. Each message
+starts a 'turn' span (continuing the client's trace if its metadata carries a
+traceparent) and gets the span's traceparent in its metadata, so the action
+server can attach its spans to the turn. The tracker store adds its own spans
+and reports the events it saves; once the turn is done they are turned into
+spans for NLU and for each predicted action, from their event timestamps:
+'nlu' ends when the UserUttered event was logged, and 'predict_and_run:<action>'
+covers the policy prediction and the run of that action, webhook included.
+
+Configure in credentials.yml instead of `rest:`:
+
+    tracing.channel.TracedRestInput:
+"""
+
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Text
+
+from rasa.core.channels.channel import UserMessage
+from rasa.core.channels.rest import RestInput
+from sanic import Blueprint
+
+from .spans import TRACEPARENT_KEY, TRACER, Span
+
+SERVICE = 'rasa'
+
+# Events saved by the tracker store during the current turn
+_SAVED_EVENTS: ContextVar[Optional[List[Dict[Text, Any]]]] = ContextVar('turn_saved_events', default=None)
+
+
+def record_saved_events(events: List[Dict[Text, Any]]) -> None:
+    """Called by the tracker store with the serialised events it saves; a no-op outside a traced turn."""
+    saved = _SAVED_EVENTS.get()
+    if saved is not None:
+        saved.extend(events)
+
+
+def add_event_spans(turn: Span, events: List[Dict[Text, Any]]) -> None:
+    """Child spans of the current turn for NLU and each predicted action, delimited by the events' timestamps."""
+    retrieved = [span.end for span in turn.finished if span.name == 'tracker_store.retrieve']
+    cursor = max([turn.start] + retrieved[:1])
+    for event in events:
+        timestamp = event.get('timestamp') or cursor
+        if event.get('event') == 'user':
+            intent = (event.get('parse_data') or {}).get('intent') or {}
+            name, attributes = 'nlu', {'intent': intent.get('name'), 'confidence': intent.get('confidence')}
+        elif event.get('event') == 'action':
+            name = f"predict_and_run:{event.get('name')}"
+            attributes = {'policy': event.get('policy'), 'confidence': event.get('confidence')}
+        else:
+            continue
+        attributes['derived'] = True
+        span = TRACER.start_span(name, attributes=attributes, start=cursor)
+        TRACER.end_span(span, end=max(timestamp, cursor))
+        cursor = max(timestamp, cursor)
+
+
+class TracedRestInput(RestInput):
+
+    @classmethod
+    def name(cls) -> Text:
+        return 'rest'
+
+    def blueprint(self, on_new_message: Callable[[UserMessage], Awaitable[Any]]) -> Blueprint:
+        if not TRACER.enabled:
+            return super().blueprint(on_new_message)
+
+        async def traced_on_new_message(message: UserMessage) -> None:
+            metadata = dict(message.metadata or {})
+            turn = TRACER.start_trace('turn', metadata.get(TRACEPARENT_KEY), SERVICE,
+                                      {'sender_id': message.sender_id, 'message_id': message.message_id})
+            metadata[TRACEPARENT_KEY] = turn.traceparent
+            message.metadata = metadata
+            saved: List[Dict[Text, Any]] = []
+            token = _SAVED_EVENTS.set(saved)
+            try:
+                with TRACER.activate(turn):
+                    try:
+                        await on_new_message(message)
+                    finally:
+                        add_event_spans(turn, saved)
+            finally:
+                _SAVED_EVENTS.reset(token)
+
+        return super().blueprint(traced_on_new_message)
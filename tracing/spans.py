@@ -0,0 +1,200 @@
+"""
+Minimal span tracer shared by the Rasa server and the action server.
+
+A turn is one trace. Its id travels between processes as a W3C traceparent
+string ('00-<trace id>-<span id>-01') in the user message metadata, which
+Rasa forwards to the action server inside the tracker. Finished spans are
+appended as JSON lines to TRACE_FILE, one O_APPEND write per batch so both
+servers and all their workers can share the file. Tracing is off, and
+span() costs a context-variable lookup, when TRACE_FILE is not set.
+"""
+
+import json
+import logging
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE = os.environ.get('TRACE_FILE', '')
+
+# Message metadata key carrying the parent span across processes
+TRACEPARENT_KEY = 'traceparent'
+
+# (trace id, parent span id) of a span in another process
+RemoteParent = Tuple[str, str]
+
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+def new_span_id() -> str:
+    return secrets.token_hex(8)
+
+
+def format_traceparent(trace_id: str, span_id: str) -> str:
+    return f'00-{trace_id}-{span_id}-01'
+
+
+def parse_traceparent(value: Any) -> Optional[RemoteParent]:
+    """(trace id, span id) of a traceparent string, or None if it is missing or malformed."""
+    if not isinstance(value, str):
+        return None
+    parts = value.split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16)
+        int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2]
+
+
+class Span:
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'service', 'start', 'end', 'attributes',
+                 'local_root', 'finished')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], service: str,
+                 local_root: Optional['Span'] = None, attributes: Optional[Dict[str, Any]] = None,
+                 start: Optional[float] = None):
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.service = service
+        self.start = time.time() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes = dict(attributes or {})
+        # The outermost span of this trace in this process; its finished children are exported with it
+        self.local_root = local_root or self
+        self.finished: List['Span'] = []
+
+    @property
+    def traceparent(self) -> str:
+        return format_traceparent(self.trace_id, self.span_id)
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'service': self.service,
+            'pid': os.getpid(),
+            'start': self.start,
+            'end': self.end,
+            'duration_ms': round((self.end - self.start) * 1e3, 3),
+            'attributes': self.attributes,
+        }
+
+
+class Tracer:
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self.export_errors = 0
+        self._current: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+        self._fd: Optional[int] = None
+        self._fd_pid: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def current(self) -> Optional[Span]:
+        return self._current.get()
+
+    def start_span(self, name: str, parent: Optional[RemoteParent] = None, service: Optional[str] = None,
+                   attributes: Optional[Dict[str, Any]] = None, start: Optional[float] = None) -> Optional[Span]:
+        """
+        Start a span without making it current. Its parent is the remote parent if
+        given, else the current span; without either there is no trace to join and
+        nothing is recorded.
+        """
+        if not self.path:
+            return None
+        if parent is not None:
+            return Span(name, parent[0], parent[1], service or 'unknown', attributes=attributes, start=start)
+        current = self._current.get()
+        if current is None:
+            return None
+        return Span(name, current.trace_id, current.span_id, service or current.service, current.local_root,
+                    attributes, start)
+
+    def start_trace(self, name: str, traceparent: Any = None, service: str = 'unknown',
+                    attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+        """Root span of a new trace, or a child of traceparent when the caller sent a valid one."""
+        if not self.path:
+            return None
+        parent = parse_traceparent(traceparent)
+        if parent is None:
+            return Span(name, new_trace_id(), None, service, attributes=attributes)
+        return self.start_span(name, parent, service, attributes)
+
+    def end_span(self, span: Optional[Span], end: Optional[float] = None) -> None:
+        if span is None or span.end is not None:
+            return
+        span.end = time.time() if end is None else end
+        root = span.local_root
+        if root.end is None:
+            root.finished.append(span)
+            return
+        if span is root:
+            batch, root.finished = root.finished + [span], []
+        else:
+            # A child that outlived its local root
+            batch = [span]
+        self._export(batch)
+
+    @contextmanager
+    def activate(self, span: Optional[Span]) -> Iterator[Optional[Span]]:
+        """Make span current for the enclosed block and end it afterwards."""
+        if span is None:
+            yield None
+            return
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set('error', type(e).__name__)
+            raise
+        finally:
+            self._current.reset(token)
+            self.end_span(span)
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[RemoteParent] = None, service: Optional[str] = None,
+             attributes: Optional[Dict[str, Any]] = None) -> Iterator[Optional[Span]]:
+        """Child span of parent or of the current span around the enclosed block; yields None if not tracing."""
+        if not self.path:
+            yield None
+            return
+        with self.activate(self.start_span(name, parent, service, attributes)) as span:
+            yield span
+
+    def _export(self, spans: List[Span]) -> None:
+        data = ''.join(json.dumps(span.as_dict(), separators=(',', ':'), default=str) + '\n' for span in spans)
+        try:
+            if self._fd_pid != os.getpid():
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                self._fd_pid = os.getpid()
+            # One O_APPEND write per batch keeps lines from different processes whole
+            os.write(self._fd, data.encode('utf-8'))
+        except OSError as e:
+            self.export_errors += 1
+            logger.warning("Could not append to trace file %s: %s", self.path, e)
+
+
+TRACER = Tracer()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Warm-up of a running Rasa server before it is reported ready.
+
+The first messages a fresh Rasa process handles pay for TensorFlow graph
+tracing and the first DIET/TED inference. This replays a few utterances per
+intent from data/nlu.yml and testing/data/test_data.yml through NLU
+(/model/parse) and through whole conversations on the REST webhook (core
+plus the action server), then opens fresh conversations until a first turn
+is no slower than WARMUP_TOLERANCE times the median first turn so far. All
+warm-up messages carry metadata {'warmup': true} (see
+actions/utils/warmup.py) and use 'warmup-' sender ids, which the actions
+treat as warm-up even without the metadata and the tracker store
+(stores/tracker_store.py) keeps in memory only.
+
+app.py runs it after every (re)start of the Rasa server; it can also be run
+against a server by hand:
+
+    python warmup.py --url http://localhost:7860
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import yaml
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+NLU_PATHS = [
+    os.path.join(PROJECT_DIR, 'data', 'nlu.yml'),
+    os.path.join(PROJECT_DIR, 'testing', 'data', 'test_data.yml'),
+]
+
+# [text](entity) and [text]{"entity": ...} annotations in NLU examples
+ANNOTATION = re.compile(r'\[([^\]]+)\](?:\([^)]*\)|\{[^}]*\})')
+
+EXAMPLES_PER_INTENT = 3
+PROBE_TEXT_INTENT = 'greet'
+# A first turn at most this much slower than the median first turn counts as warm
+WARMUP_TOLERANCE = 1.2
+MIN_PROBES = 3
+MAX_PROBES = 10
+REQUEST_TIMEOUT_SECONDS = 30.0
+WARMUP_SENDER_PREFIX = 'warmup-'
+
+
+def load_utterances(paths: List[str] = NLU_PATHS, per_intent: int = EXAMPLES_PER_INTENT) -> Dict[str, List[str]]:
+    """Up to per_intent examples of every intent, taken from each file in turn, annotations reduced to their text."""
+    utterances: Dict[str, List[str]] = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            nlu = (yaml.safe_load(f) or {}).get('nlu', [])
+        for item in nlu:
+            if 'intent' not in item:
+                continue
+            lines = [ANNOTATION.sub(r'\1', line.strip()[2:].strip()) for line in item.get('examples', '').splitlines()
+                     if line.strip().startswith('- ')]
+            examples = utterances.setdefault(item['intent'], [])
+            examples.extend(line for line in lines[:per_intent] if line not in examples)
+    return utterances
+
+
+def warmup_sender() -> str:
+    return f'{WARMUP_SENDER_PREFIX}{uuid.uuid4().hex[:12]}'
+
+
+async def send(session: aiohttp.ClientSession, url: str, sender: str, text: str) -> float:
+    """Post one message to the REST webhook; returns the latency in ms."""
+    payload = {'sender': sender, 'message': text, 'metadata': {'warmup': True}}
+    started = time.perf_counter()
+    async with session.post(f'{url}/webhooks/rest/webhook', json=payload) as response:
+        await response.read()
+        response.raise_for_status()
+    return (time.perf_counter() - started) * 1e3
+
+
+async def parse(session: aiohttp.ClientSession, url: str, text: str) -> None:
+    async with session.post(f'{url}/model/parse', json={'text': text}) as response:
+        await response.read()
+        response.raise_for_status()
+
+
+async def warm_up_rasa(url: str, session: Optional[aiohttp.ClientSession] = None) -> Dict[str, Any]:
+    """Warm a running Rasa server up; returns the timings, including cold and warm first-turn latency."""
+    if session is None:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS)) as session:
+            return await warm_up_rasa(url, session)
+
+    utterances = load_utterances()
+    probe_text = (utterances.get(PROBE_TEXT_INTENT) or [next(iter(utterances.values()))[0]])[0]
+    started = time.perf_counter()
+    failures = 0
+
+    cold_ms = await send(session, url, warmup_sender(), probe_text)
+
+    for examples in utterances.values():
+        for text in examples:
+            try:
+                await parse(session, url, text)
+            except aiohttp.ClientError:
+                failures += 1
+
+    # One conversation per intent, so core predicts (and the action server runs) on real histories
+    for examples in utterances.values():
+        sender = warmup_sender()
+        for text in examples:
+            try:
+                await send(session, url, sender, text)
+            except aiohttp.ClientError:
+                failures += 1
+
+    probes: List[float] = []
+    converged = False
+    while len(probes) < MAX_PROBES:
+        probes.append(await send(session, url, warmup_sender(), probe_text))
+        if len(probes) >= MIN_PROBES and probes[-1] <= statistics.median(probes) * WARMUP_TOLERANCE:
+            converged = True
+            break
+
+    return {
+        'duration_ms': round((time.perf_counter() - started) * 1e3, 1),
+        'utterances': sum(len(examples) for examples in utterances.values()),
+        'intents': len(utterances),
+        'failures': failures,
+        'cold_first_turn_ms': round(cold_ms, 1),
+        'warm_first_turn_ms': round(probes[-1], 1),
+        'steady_first_turn_ms': round(statistics.median(probes), 1),
+        'probes': len(probes),
+        'converged': converged,
+    }
+
+
+def describe(report: Dict[str, Any]) -> str:
+    text = (f"Warm-up took {report['duration_ms'] / 1e3:.1f}s ({report['utterances']} utterances, "
+            f"{report['failures']} failed): first turn {report['cold_first_turn_ms']:.0f} ms cold, "
+            f"{report['warm_first_turn_ms']:.0f} ms after warm-up (steady {report['steady_first_turn_ms']:.0f} ms)")
+    if not report['converged']:
+        text += f"; first-turn latency still above steady state after {report['probes']} probes"
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=f"http://localhost:{os.environ.get('PORT', '7860')}")
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = asyncio.run(warm_up_rasa(args.url.rstrip('/')))
+    print(json.dumps(report, indent=2) if args.json else describe(report))
+
+
+if __name__ == '__main__':
+    main()